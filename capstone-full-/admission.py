@@ -0,0 +1,219 @@
+"""Admission control: per-route concurrency limits and priority classes.
+
+Every request is put in a priority class before it runs:
+
+    critical     POS and stock writes (POST/PUT/DELETE by default)
+    interactive  ordinary page reads
+    analytics    heavy dashboard aggregations, listed per app
+
+Each class has its own concurrency limit, so analytics can never occupy the
+slots (threads, DB connections) that writes need. When a class is full a
+request waits in that class's bounded queue; when the queue is full, the
+wait times out, or a higher class has requests waiting, it is rejected with
+503 and Retry-After instead. Heavy routes can also get their own, tighter
+limit on top of their class.
+
+    admission = AdmissionController()
+    admission.init_app(app, classes={"/api/sales/overview": "analytics"},
+                       route_limits={"/api/sales/overview": 2})
+
+Limits come from ADMISSION_<CLASS>_LIMIT / _QUEUE / _TIMEOUT_MS, e.g.
+ADMISSION_ANALYTICS_LIMIT=2. Counters are served at /api/admission/stats.
+"""
+import os
+import threading
+import time
+
+from flask import g, jsonify, request
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+EXEMPT_PATHS = ("/api/health", "/api/health/live", "/api/health/ready", "/api/admission/stats")
+
+# name -> (limit, queue, queue timeout ms, Retry-After s); highest priority first
+DEFAULT_CLASSES = {
+    "critical": (32, 64, 5000, 1),
+    "interactive": (16, 32, 2000, 1),
+    "analytics": (4, 8, 500, 5),
+}
+
+
+class Limiter:
+    """Counting semaphore with a bounded, timed wait queue and counters"""
+
+    def __init__(self, name, limit, max_queue=0, timeout_ms=0, retry_after=1):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout_ms / 1000
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_queue = 0
+
+    def acquire(self, may_queue=True):
+        """True once a slot is held; False if shed (caller answers 503)"""
+        with self._cond:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                self.admitted += 1
+                return True
+            if not may_queue or self.queued >= self.max_queue:
+                self.rejected += 1
+                return False
+
+            self.queued += 1
+            self.peak_queue = max(self.peak_queue, self.queued)
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.in_flight >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_queue": self.max_queue,
+                "peak_queue": self.peak_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+def _class_from_env(name, defaults):
+    limit, queue, timeout_ms, retry_after = defaults
+    prefix = f"ADMISSION_{name.upper()}_"
+    return Limiter(
+        name,
+        int(os.getenv(prefix + "LIMIT", limit)),
+        int(os.getenv(prefix + "QUEUE", queue)),
+        float(os.getenv(prefix + "TIMEOUT_MS", timeout_ms)),
+        retry_after,
+    )
+
+
+class AdmissionController:
+
+    def __init__(self, classes=None):
+        classes = classes or DEFAULT_CLASSES
+        # Insertion order is priority order
+        self.classes = {name: _class_from_env(name, spec) for name, spec in classes.items()}
+        self.routes = {}
+        self.rules = {}
+
+    def classify(self, method, rule):
+        """Priority class for a request: explicit rule, else writes are critical"""
+        for key in (f"{method} {rule}", rule):
+            if key in self.rules:
+                return self.rules[key]
+        return "critical" if method in WRITE_METHODS else "interactive"
+
+    def _higher_waiting(self, name):
+        for other, limiter in self.classes.items():
+            if other == name:
+                return False
+            if limiter.queued:
+                return True
+        return False
+
+    def admit(self, method, rule):
+        """
+        Take the route and class slots for a request. Returns the held
+        limiters, or the Limiter that shed it.
+        """
+        held = []
+        route = self.routes.get(rule)
+        name = self.classify(method, rule)
+        cls = self.classes[name]
+        # Lower classes don't queue while a higher class is waiting for capacity
+        may_queue = not self._higher_waiting(name)
+        for limiter in (route, cls):
+            if limiter is None:
+                continue
+            if not limiter.acquire(may_queue):
+                self.release(held)
+                return limiter if limiter is cls else _RouteShed(limiter, cls)
+            held.append(limiter)
+        return held
+
+    def release(self, held):
+        for limiter in reversed(held):
+            limiter.release()
+
+    def stats(self):
+        return {
+            "classes": {name: limiter.stats() for name, limiter in self.classes.items()},
+            "routes": {rule: dict(limiter.stats(), priority=self.classify("GET", rule))
+                       for rule, limiter in self.routes.items()},
+        }
+
+    def init_app(self, app, classes=None, route_limits=None):
+        """
+        `classes` maps "/rule" or "METHOD /rule" to a class name,
+        `route_limits` maps "/rule" to its own concurrency limit.
+        """
+        for key, name in (classes or {}).items():
+            if name not in self.classes:
+                raise ValueError(f"Unknown priority class: {name}")
+            self.rules[key] = name
+        for rule, limit in (route_limits or {}).items():
+            self.routes[rule] = Limiter(rule, limit, max_queue=limit, timeout_ms=200)
+
+        @app.before_request
+        def _admit():
+            if request.url_rule is None or request.path in EXEMPT_PATHS:
+                return None
+            result = self.admit(request.method, request.url_rule.rule)
+            if isinstance(result, list):
+                g.admission_held = result
+                return None
+            return _shed_response(result)
+
+        @app.teardown_request
+        def _release(exc=None):
+            held = g.pop("admission_held", None)
+            if held:
+                self.release(held)
+
+        @app.route("/api/admission/stats")
+        def admission_stats():
+            return jsonify(self.stats())
+
+        return self
+
+
+class _RouteShed:
+    """Rejection by a route limit, reported with the class's Retry-After"""
+
+    def __init__(self, route, cls):
+        self.name = cls.name
+        self.route = route.name
+        self.retry_after = cls.retry_after
+
+
+def _shed_response(limiter):
+    body = {"error": "Server busy, please retry", "priority": limiter.name}
+    if isinstance(limiter, _RouteShed):
+        body["route"] = limiter.route
+    return jsonify(body), 503, {"Retry-After": str(limiter.retry_after)}
@@ -0,0 +1,95 @@
+"""Benchmark JSON responses for large row sets.
+
+    python bench_json.py [--rows 10000] [--repeat 20]
+
+Builds a GET /api/inventory-style payload of MySQL-shaped rows (Decimal
+stock levels and costs, DATE and DATETIME columns) and times turning it
+into a response body:
+  * loop + flask     the old path: per-row float()/strftime conversion in
+                     the handler, then Flask's default encoder
+  * stdlib provider  json_provider with the stdlib encoder
+  * orjson provider  json_provider with orjson (skipped when not installed)
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_provider import FastJSONProvider
+
+
+def make_rows(count):
+    today = date.today()
+    now = datetime.now().replace(microsecond=0)
+    return [{
+        "item_id": i,
+        "item_name": f"Item {i}",
+        "stock_level": Decimal(f"{random.uniform(0, 10):.2f}"),
+        "capacity": Decimal("10.00"),
+        "category": "perishable",
+        "status": "active",
+        "unit_cost": Decimal(f"{random.uniform(0.5, 20):.2f}"),
+        "version": 1,
+        "expiry_date": today + timedelta(days=random.randint(-3, 30)),
+        "created_at": now - timedelta(days=random.randint(0, 365)),
+        "updated_at": now,
+        "stock_percent": Decimal(f"{random.uniform(0, 100):.2f}"),
+    } for i in range(count)]
+
+
+def loop_and_flask(rows):
+    """What handlers did before: convert every row, then encode"""
+    converted = []
+    for row in rows:
+        item = dict(row)
+        for key in ("stock_level", "capacity", "unit_cost", "stock_percent"):
+            item[key] = float(item[key])
+        item["expiry_date"] = item["expiry_date"].strftime("%Y-%m-%d")
+        item["created_at"] = item["created_at"].strftime("%Y-%m-%d %H:%M:%S")
+        item["updated_at"] = item["updated_at"].strftime("%Y-%m-%d %H:%M:%S")
+        converted.append(item)
+    return json.dumps(converted, default=DefaultJSONProvider.default, sort_keys=True,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def timed(name, encode, rows, repeat):
+    body = encode(rows)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(rows)
+    per_call = (time.perf_counter() - started) / repeat
+    print(f"{name:<16} {per_call * 1000:8.2f} ms/response   {len(rows) / per_call:10.0f} rows/s   {len(body):>9} bytes")
+    return body
+
+
+class _App:
+    debug = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="rows per response")
+    parser.add_argument("--repeat", type=int, default=20, help="responses to encode per variant")
+    args = parser.parse_args()
+
+    random.seed(42)
+    rows = make_rows(args.rows)
+    provider = FastJSONProvider(_App())
+    fast = json_provider.orjson
+
+    baseline = timed("loop + flask", loop_and_flask, rows, args.repeat)
+    json_provider.orjson = None
+    results = [timed("stdlib provider", provider.dumps_bytes, rows, args.repeat)]
+    json_provider.orjson = fast
+    if fast is None:
+        print("orjson provider  skipped (pip install orjson to include it)")
+    else:
+        results.append(timed("orjson provider", provider.dumps_bytes, rows, args.repeat))
+
+    for body in results:
+        assert json.loads(body) == json.loads(baseline), "providers must produce the same document"
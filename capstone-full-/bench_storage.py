@@ -0,0 +1,154 @@
+"""Benchmark the storage backends on the same dashboard workload.
+
+    python bench_storage.py [--rows 50000] [--reads 200] [--threads 4]
+
+Runs against tuned SQLite, untuned SQLite (plain sqlite3.connect per query)
+and, when DB_HOST is set and reachable, MySQL. Each backend gets the same
+seeded sales/inventory data (MySQL: in a scratch schema, BENCH_DB_NAME,
+dropped afterwards), then:
+  * reads   - the dashboard panel queries, from several threads at once
+  * inserts - single-row sale inserts, one commit each
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import storage
+
+BENCH_SCHEMA = os.getenv("BENCH_DB_NAME", "gastrotrack_bench")
+ITEMS = ["Latte", "PBJ", "Pancake", "Matcha", "Club Sandwich", "Soup", "Salad", "Cocoa"]
+
+
+def panel_queries(dialect):
+    """The read queries behind the dashboard panels, in the given dialect"""
+    sale_day = dialect.date("sale_date")
+    days_left = dialect.days_until("expiry_date")
+    return [
+        f"SELECT item_name, {sale_day} AS sale_date, SUM(quantity) AS total_qty "
+        f"FROM sales GROUP BY item_name, {sale_day} ORDER BY sale_date",
+        "SELECT item_name, SUM(quantity) AS total_qty FROM sales GROUP BY item_name ORDER BY total_qty DESC",
+        "SELECT item_name, stock_level, capacity FROM inventory",
+        f"SELECT item_name, {days_left} AS days_left FROM inventory WHERE {days_left} <= 7",
+        f"SELECT {sale_day} AS date, SUM(price * quantity) AS total FROM sales "
+        f"WHERE sale_date >= {dialect.days_ago(7)} GROUP BY {sale_day}",
+    ]
+
+
+def seed(conn, dialect, rows):
+    today = date.today()
+    sales = [
+        (random.choice(ITEMS), random.randint(1, 5), 4.5, (today - timedelta(days=random.randint(0, 365))).isoformat())
+        for _ in range(rows)
+    ]
+    dialect.executemany(conn, "INSERT INTO sales (item_name, quantity, price, sale_date) VALUES (%s, %s, %s, %s)", sales)
+    inventory = [
+        (f"Item {i}", random.uniform(0, 10), 10.0, (today + timedelta(days=random.randint(-3, 30))).isoformat())
+        for i in range(500)
+    ]
+    dialect.executemany(conn, "INSERT INTO inventory (item_name, stock_level, capacity, expiry_date) VALUES (%s, %s, %s, %s)", inventory)
+    conn.commit()
+
+
+def run(name, connect, dialect, reads, threads, inserts):
+    queries = panel_queries(dialect)
+
+    def read_once(_):
+        conn = connect()
+        try:
+            for query in queries:
+                dialect.fetchall(conn, query)
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(read_once, range(reads)))
+    read_secs = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(inserts):
+        conn = connect()
+        try:
+            dialect.execute(conn, "INSERT INTO sales (item_name, quantity, price, sale_date) VALUES (%s, %s, %s, %s)",
+                            (random.choice(ITEMS), 1, 4.5, date.today().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+    insert_secs = time.perf_counter() - started
+
+    print(f"{name:<16} reads: {reads / read_secs:8.1f} dashboards/s   "
+          f"inserts: {inserts / insert_secs:8.1f} rows/s")
+
+
+def bench_sqlite(args):
+    dialect = storage.get_dialect("sqlite")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, tuned in (("sqlite (tuned)", True), ("sqlite (default)", False)):
+            path = os.path.join(tmp, f"{'tuned' if tuned else 'plain'}.db")
+            conn = storage.connect_sqlite(path, reuse=False)
+            storage.init_sqlite_schema(conn)
+            seed(conn, dialect, args.rows)
+            if not tuned:
+                # Persisted in the file; switching it needs an exclusive lock, so not per reader thread
+                conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+
+            if tuned:
+                connect = lambda path=path: storage.connect_sqlite(path)
+            else:
+                connect = lambda path=path: sqlite3.connect(path)
+            run(name, connect, dialect, args.reads, args.threads, args.inserts)
+
+
+def bench_mysql(args):
+    if not os.getenv("DB_HOST"):
+        print("mysql            skipped (set DB_HOST/DB_USER/DB_PASS/DB_NAME to include it)")
+        return
+    import mysql.connector
+
+    config = {
+        "host": os.getenv("DB_HOST"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASS"),
+    }
+    database = os.getenv("DB_NAME", "gastrotrack")
+    dialect = storage.get_dialect("mysql")
+    try:
+        conn = mysql.connector.connect(**config)
+    except mysql.connector.Error as err:
+        print(f"mysql            skipped ({err})")
+        return
+    # Seeded rows and inserts go to a scratch schema with empty copies of
+    # the tables, dropped afterwards; the real database is only read for DDL
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_SCHEMA}")
+        cursor.execute(f"CREATE DATABASE {BENCH_SCHEMA}")
+        for table in ("sales", "inventory"):
+            cursor.execute(f"CREATE TABLE {BENCH_SCHEMA}.{table} LIKE {database}.{table}")
+        conn.database = BENCH_SCHEMA
+        seed(conn, dialect, args.rows)
+        run("mysql", lambda: mysql.connector.connect(database=BENCH_SCHEMA, **config), dialect,
+            args.reads, args.threads, args.inserts)
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_SCHEMA}")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="sales rows to seed")
+    parser.add_argument("--reads", type=int, default=200, help="dashboard loads to run")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent readers")
+    parser.add_argument("--inserts", type=int, default=500, help="single-row inserts to run")
+    args = parser.parse_args()
+
+    random.seed(42)
+    bench_sqlite(args)
+    bench_mysql(args)
@@ -0,0 +1,199 @@
+"""Sales rollups for category drill-downs and top/bottom item lists.
+
+Two small tables are kept current on every sale insert, in the same
+transaction as the sale rows, separately for each site:
+
+    item_sales_totals       all-time quantity/revenue per (site, item name),
+                            indexed by (site_id, quantity, item_name) and
+                            (site_id, category_id, quantity, item_name)
+    category_monthly_sales  quantity/revenue per (site, category, YYYY-MM)
+
+Top-N and bottom-N items are read from both ends of those indexes with
+ORDER BY ... LIMIT, and a category's 12-month trend is one primary-key range
+scan, so a drill-down costs a few index lookups however much sales history
+(live or archived) there is.
+
+    python category_stats.py rebuild    # backfill from sales + the archive
+
+All functions take an open connection and leave the commit to the caller.
+"""
+from collections import defaultdict
+from datetime import date
+
+from sales_archive import archive as sales_archive
+from sites import DEFAULT_SITE_ID
+
+TREND_MONTHS = 12
+
+
+def _month_key(value):
+    """YYYY-MM for a date/datetime or an ISO date string"""
+    return str(value)[:7]
+
+
+def _last_months(count, today=None):
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1
+    return [f"{i // 12:04d}-{i % 12 + 1:02d}" for i in range(index - count + 1, index + 1)]
+
+
+def _apply(conn, dialect, items, months):
+    """Add {(site, name): [qty, revenue]} and {(site, name, month): [qty, revenue]} to the rollups"""
+    if not items:
+        return 0
+    names = sorted({name for _, name in items})
+    placeholders = ", ".join(["%s"] * len(names))
+    categories = {row["item_name"]: row["category_id"] for row in dialect.fetchall(conn, f"""
+        SELECT item_name, category_id FROM menu_items WHERE item_name IN ({placeholders})
+    """, tuple(names))}
+
+    # Sorted so concurrent writers lock rows in the same order
+    dialect.executemany(
+        conn,
+        dialect.upsert_add("item_sales_totals", ("site_id", "item_name"), ("quantity", "revenue"),
+                           replace=("category_id",)),
+        [(site_id, name, categories.get(name), qty, round(revenue, 2))
+         for (site_id, name), (qty, revenue) in sorted(items.items())])
+
+    by_category = defaultdict(lambda: [0, 0.0])
+    for (site_id, name, month), (qty, revenue) in months.items():
+        if categories.get(name) is not None:
+            total = by_category[(site_id, categories[name], month)]
+            total[0] += qty
+            total[1] += revenue
+    if by_category:
+        dialect.executemany(
+            conn,
+            dialect.upsert_add("category_monthly_sales", ("site_id", "category_id", "month"), ("quantity", "revenue")),
+            [(site_id, cat, month, qty, round(revenue, 2))
+             for (site_id, cat, month), (qty, revenue) in sorted(by_category.items())])
+    return len(items)
+
+
+def record_sales(conn, dialect, sales, site_id=DEFAULT_SITE_ID):
+    """
+    Fold new sales of one site into the rollups. `sales` are (item_name,
+    quantity, sale_date[, price]) rows, as inserted into the sales table.
+    """
+    items = defaultdict(lambda: [0, 0.0])
+    months = defaultdict(lambda: [0, 0.0])
+    for sale in sales:
+        qty = int(sale[1])
+        revenue = qty * float(sale[3] or 0) if len(sale) > 3 else 0.0
+        for total in (items[(site_id, sale[0])], months[(site_id, sale[0], _month_key(sale[2]))]):
+            total[0] += qty
+            total[1] += revenue
+    return _apply(conn, dialect, items, months)
+
+
+def rebuild(conn, dialect, archive=sales_archive):
+    """Recompute both rollups from the archive plus the live sales table"""
+    items = defaultdict(lambda: [0, 0.0])
+    months = defaultdict(lambda: [0, 0.0])
+    for key, (qty, revenue) in archive.item_month_totals().items():
+        months[key] = [qty, revenue]
+
+    start = archive.live_start()
+    live, params = ("sale_date >= %s", (start.isoformat(),)) if start else ("1 = 1", ())
+    month = dialect.bucket_start("sale_date", "month")
+    rows = dialect.fetchall(conn, f"""
+        SELECT site_id, item_name, {month} AS month, SUM(quantity) AS quantity, SUM(price * quantity) AS revenue
+        FROM sales
+        WHERE {live} AND item_name IS NOT NULL
+        GROUP BY site_id, item_name, {month}
+    """, params)
+    for row in rows:
+        total = months[(row["site_id"], row["item_name"], _month_key(row["month"]))]
+        total[0] += int(row["quantity"])
+        total[1] += float(row["revenue"] or 0)
+
+    for (site_id, name, _), (qty, revenue) in months.items():
+        items[(site_id, name)][0] += qty
+        items[(site_id, name)][1] += revenue
+
+    dialect.execute(conn, "DELETE FROM category_monthly_sales")
+    dialect.execute(conn, "DELETE FROM item_sales_totals")
+    return _apply(conn, dialect, items, months)
+
+
+# --- Reads ---
+def ranked_items(conn, dialect, limit=3, category_id=None, best=True, site_id=DEFAULT_SITE_ID):
+    """
+    A site's `limit` best (or worst) selling items by quantity, best first
+    either way, read straight off the rollup index.
+    """
+    where, params = ("AND category_id = %s", (category_id,)) if category_id is not None else ("", ())
+    direction = "DESC" if best else "ASC"
+    rows = dialect.fetchall(conn, f"""
+        SELECT item_name, quantity AS total_qty, revenue
+        FROM item_sales_totals
+        WHERE site_id = %s {where}
+        ORDER BY quantity {direction}, item_name {direction}
+        LIMIT %s
+    """, (site_id,) + params + (int(limit),))
+    return rows if best else rows[::-1]
+
+
+def category_details(conn, dialect, category_name, limit=5, months=TREND_MONTHS, today=None,
+                     site_id=DEFAULT_SITE_ID):
+    """A site's totals, top/bottom items and monthly trend of one category (None if unknown)"""
+    found = dialect.fetchall(conn, "SELECT id, category_name FROM menu_categories WHERE category_name = %s",
+                             (category_name,))
+    if not found:
+        return None
+    category = found[0]
+
+    totals = dialect.fetchall(conn, """
+        SELECT COUNT(*) AS items, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+        FROM item_sales_totals
+        WHERE site_id = %s AND category_id = %s
+    """, (site_id, category["id"]))[0]
+
+    labels = _last_months(months, today)
+    trend = {row["month"]: row for row in dialect.fetchall(conn, """
+        SELECT month, quantity, revenue
+        FROM category_monthly_sales
+        WHERE site_id = %s AND category_id = %s AND month >= %s AND month <= %s
+    """, (site_id, category["id"], labels[0], labels[-1]))}
+
+    def product(row):
+        return {"name": row["item_name"], "sales": row["total_qty"], "revenue": row["revenue"]}
+
+    return {
+        "name": category["category_name"],
+        "total_sales": totals["revenue"] or 0,
+        "items_sold": totals["quantity"] or 0,
+        "products_sold": totals["items"],
+        "top_products": [product(r) for r in ranked_items(conn, dialect, limit, category["id"],
+                                                          site_id=site_id)],
+        "bottom_products": [product(r) for r in ranked_items(conn, dialect, limit, category["id"], best=False,
+                                                             site_id=site_id)],
+        "monthly_labels": labels,
+        "monthly_trend": [trend[m]["revenue"] if m in trend else 0 for m in labels],
+        "monthly_quantity": [trend[m]["quantity"] if m in trend else 0 for m in labels],
+    }
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    import storage
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python category_stats.py rebuild")
+    backend = storage.get_backend()
+    dialect = storage.get_dialect(backend)
+    router = storage.create_router(backend, {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASS", ""),
+        "database": os.getenv("DB_NAME", "gastrotrack"),
+    })
+    conn = router.connect(readonly=False)
+    try:
+        count = rebuild(conn, dialect)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Rebuilt sales rollups for {count} item(s)")
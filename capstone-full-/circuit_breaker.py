@@ -0,0 +1,322 @@
+"""Circuit breaker around database access, with stale reads while it is open.
+
+    closed     connections and queries run normally; DB_BREAKER_FAILURES
+               consecutive availability errors (refused/lost connections,
+               timeouts) open the breaker
+    open       nothing touches the database for DB_BREAKER_RESET seconds:
+               GET /api/... routes answer with their last good response,
+               marked stale, and everything else fails fast with 503
+    half-open  after the reset time the next request is let through as a
+               probe; success closes the breaker, failure reopens it
+
+Connections handed out by the router are wrapped so query errors count
+too, and every query runs under a time limit (MySQL MAX_EXECUTION_TIME,
+a progress-handler deadline on SQLite) so a slow database trips the
+breaker instead of piling up threads.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context, jsonify, request
+
+FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURES", 5))
+RESET_TIMEOUT = float(os.getenv("DB_BREAKER_RESET", 10))  # seconds
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 3))  # seconds
+QUERY_TIMEOUT_MS = int(os.getenv("DB_QUERY_TIMEOUT_MS", 5000))
+STALE_ENTRIES = int(os.getenv("DB_STALE_ENTRIES", 256))
+EXEMPT_PATHS = ("/api/health", "/api/health/live", "/api/health/ready", "/api/admission/stats")
+
+# MySQL errnos that mean "database unavailable" rather than "bad query":
+# 2002/2003 can't connect, 2006 gone away, 2013 lost connection,
+# 3024 MAX_EXECUTION_TIME exceeded, 1040 too many connections
+MYSQL_UNAVAILABLE = {1040, 2002, 2003, 2006, 2013, 3024}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """The breaker is open; the database is not being called"""
+
+
+def is_unavailable(err):
+    """True for errors that say the database is down or too slow"""
+    if isinstance(err, CircuitOpen):
+        return True
+    if isinstance(err, sqlite3.OperationalError):
+        message = str(err)
+        return "locked" in message or "interrupted" in message or "unable to open" in message
+    errno = getattr(err, "errno", None)
+    if errno in MYSQL_UNAVAILABLE:
+        return True
+    return type(err).__name__ in ("InterfaceError", "OperationalError") and errno is None
+
+
+class CircuitBreaker:
+
+    def __init__(self, name="database", failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """True while calls would be refused (open and not due, or a probe is running)"""
+        with self._lock:
+            if self.state == OPEN:
+                return self.clock() - self.opened_at < self.reset_timeout
+            return self.state == HALF_OPEN and self.probing
+
+    def allow(self):
+        """May a call go to the database now? Moves open -> half-open when due."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.probing = False
+
+    def retry_after(self):
+        with self._lock:
+            remaining = self.reset_timeout - (self.clock() - self.opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+    # --- Connections ---
+    def connect(self, connect):
+        """Open a connection through the breaker and wrap it"""
+        if not self.allow():
+            _flag_request()
+            raise CircuitOpen(f"{self.name} circuit is open")
+        try:
+            conn = connect()
+        except Exception as err:
+            if is_unavailable(err):
+                self.record_failure()
+                _flag_request()
+            else:
+                self._end_probe()
+            raise
+        self._reachable()
+        return GuardedConnection(conn, self)
+
+    def _reachable(self):
+        # A successful connect is enough to close a half-open breaker; query
+        # failures still count from here on
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.failures = 0
+                self.probing = False
+
+    def _end_probe(self):
+        with self._lock:
+            self.probing = False
+
+
+def _flag_request():
+    """Let the stale-response hook know this request failed on the database"""
+    if has_app_context():
+        g.db_unavailable = True
+
+
+class GuardedConnection:
+    """Connection proxy whose cursors report query outcomes to the breaker"""
+
+    def __init__(self, conn, breaker):
+        self._conn = conn
+        self._breaker = breaker
+        self._deadline = None
+        self._timed = hasattr(conn, "set_progress_handler")  # sqlite3
+        if self._timed:
+            import storage
+            storage.set_progress_handler(conn, self._check_deadline)
+        else:
+            _limit_mysql_session(conn)
+
+    def _check_deadline(self):
+        return 1 if self._deadline is not None and time.monotonic() > self._deadline else 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def cursor(self, *args, **kwargs):
+        return GuardedCursor(self._conn.cursor(*args, **kwargs), self)
+
+    def execute(self, *args):
+        return self._run(self._conn.execute, *args)
+
+    def _run(self, fn, *args):
+        if self._timed:
+            self._deadline = time.monotonic() + QUERY_TIMEOUT_MS / 1000
+        try:
+            result = fn(*args)
+        except Exception as err:
+            if is_unavailable(err):
+                self._breaker.record_failure()
+                _flag_request()
+            raise
+        finally:
+            self._deadline = None
+        self._breaker.record_success()
+        return result
+
+
+class GuardedCursor:
+
+    def __init__(self, cursor, conn):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)  # e.g. row_factory
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, *args):
+        self._conn._run(self._cursor.execute, *args)
+        return self
+
+    def executemany(self, *args):
+        self._conn._run(self._cursor.executemany, *args)
+        return self
+
+    def fetchone(self):
+        return self._conn._run(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._conn._run(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._conn._run(self._cursor.fetchall)
+
+
+def _limit_mysql_session(conn):
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {QUERY_TIMEOUT_MS}")
+        cursor.close()
+    except Exception:
+        pass  # MariaDB / old MySQL: rely on the connect and read timeouts
+
+
+# --- Stale responses ---
+class StaleResponses:
+    """Last good JSON body per GET /api/... URL, replayed while the DB is away"""
+
+    def __init__(self, breaker, max_entries=STALE_ENTRIES):
+        self.breaker = breaker
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # full path -> (body, stored at)
+        self._lock = threading.Lock()
+        self.served = 0
+
+    def remember(self, key, body):
+        with self._lock:
+            self._entries[key] = (body, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def replay(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self.served += 1
+        body, stored_at = entry
+        age = int(time.time() - stored_at)
+        return body, 200, {
+            "Content-Type": "application/json",
+            "X-Stale": "true",
+            "Age": str(age),
+            "Warning": '110 - "Response is Stale"',
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "served": self.served}
+
+    def init_app(self, app):
+        def guarded():
+            return (request.path.startswith("/api/") and request.path not in EXEMPT_PATHS
+                    and not request.path.startswith("/api/admin/") and request.url_rule is not None)
+
+        def key():
+            # script_root carries a mount prefix such as /sites/<id>
+            return request.script_root + request.full_path
+
+        @app.before_request
+        def _fail_fast():
+            if not guarded() or not self.breaker.is_open():
+                return None
+            if request.method == "GET":
+                stale = self.replay(key())
+                if stale is not None:
+                    return stale
+            return (jsonify({"error": "Database unavailable, please retry"}), 503,
+                    {"Retry-After": str(self.breaker.retry_after())})
+
+        @app.after_request
+        def _remember(response):
+            if not guarded() or request.method != "GET":
+                return response
+            if response.status_code == 200 and response.mimetype == "application/json":
+                self.remember(key(), response.get_data())
+            elif response.status_code >= 500 and g.get("db_unavailable"):
+                stale = self.replay(key())
+                if stale is not None:
+                    return app.make_response(stale)
+            return response
+
+        return self
@@ -1,10 +1,27 @@
+  // --- 0. Initial Load: every panel in one request ---
+  const API_BASE = "http://127.0.0.1:5000";
+  const bootstrapPanels = fetch(`${API_BASE}/api/dashboard/bootstrap`)
+    .then(res => res.ok ? res.json() : {})
+    .catch(() => ({}));
+
+  // First call per panel is served from the bootstrap payload;
+  // later refreshes go to the panel's own route.
+  async function loadPanel(name, path) {
+    const panels = await bootstrapPanels;
+    if (name in panels) {
+      const data = panels[name];
+      delete panels[name];
+      return data;
+    }
+    const res = await fetch(`${API_BASE}${path}`);
+    if (!res.ok) throw new Error(`Failed to fetch ${name}`);
+    return res.json();
+  }
+
   // --- 1. Load Sales Data from Backend ---
   async function loadSalesData() {
     try {
-      const res = await fetch("http://127.0.0.1:5000/api/sales"); // Flask endpoint
-      if (!res.ok) throw new Error("Failed to fetch sales data");
-      const data = await res.json();
-      return data;
+      return await loadPanel("sales", "/api/sales"); // Flask endpoint
     } catch (err) {
       console.error("Error loading sales data:", err);
       return { labels: [], datasets: [] };
@@ -103,8 +120,7 @@
   // --- 4. Load and Display Menu Performance ---
   async function updateMenuPerformance() {
     try {
-      const res = await fetch("http://127.0.0.1:5000/api/menu_performance");
-      const data = await res.json();
+      const data = await loadPanel("menu_performance", "/api/menu_performance");
       
       // Get list containers
       const topList = document.getElementById("top3-list");
@@ -137,9 +153,7 @@
   // --- 5. Load and Display Inventory Overview ---
   async function loadInventoryOverview() {
     try {
-      const response = await fetch('http://127.0.0.1:5000/api/inventory');
-      if (!response.ok) throw new Error('Failed to fetch inventory data');
-      const data = await response.json();
+      const data = await loadPanel("inventory", "/api/inventory");
 
       const card = document.getElementById('inventory-card');
       if (!card) return;
@@ -167,8 +181,7 @@
     const container = document.getElementById("suggestionsContainer");
 
     try {
-      const res = await fetch("http://127.0.0.1:5000/api/suggestions");
-      const data = await res.json();
+      const data = await loadPanel("suggestions", "/api/suggestions");
 
       if (data.length === 0) {
         container.innerHTML = "<p class='muted'>No suggestions available.</p>";
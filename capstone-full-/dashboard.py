@@ -2,12 +2,40 @@ from flask import Flask, render_template, jsonify, request
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
 from contextlib import contextmanager
-import sqlite3
+import os
+from concurrent.futures import ThreadPoolExecutor
 import random
 from datetime import datetime
-
-app = Flask(__name__)
+from itertools import groupby
+
+import category_stats
+import json_provider
+import sites
+import stock_ledger
+import storage
+from admission import AdmissionController
+from circuit_breaker import StaleResponses
+from health import HealthMonitor, admission_report, breaker_report
+from profiler import SamplingProfiler
+from sales_archive import live_filter
+from shared_cache import SharedCache
+from storage import format_date
+from timeseries import parse_range, sales_series
+from write_buffer import CommitTimeout, GroupCommitBuffer, QueueFull
+
+app = Flask(__name__, template_folder=".")  # dashboard.html sits next to the app
 CORS(app)
+json_provider.init_app(app)  # Decimal/date-aware jsonify, orjson when installed
+# POST /api/sales (the POS) is critical by default; chart reads are analytics
+admission = AdmissionController().init_app(app, classes={
+    "GET /api/sales": "analytics",
+    "/api/sales/series": "analytics",
+    "/api/sales_summary": "analytics",
+    "/api/menu_performance": "analytics",
+    "/api/dashboard/bootstrap": "analytics",
+    "/api/demand_forecast": "analytics",
+    "/api/predicted_demand": "analytics",
+}, route_limits={"/api/menu_performance": 2, "/api/dashboard/bootstrap": 4})
 
 def validate_sale(data):
     errors = []
@@ -16,19 +44,17 @@ def validate_sale(data):
     if not isinstance(data.get("qty"), int) or data["qty"] < 1:
         errors.append("Quantity must be a positive number")
     try:
-        datetime.strptime(data.get("date", ""), "%Y-%m-%d")
+        day = datetime.strptime(data.get("date", ""), "%Y-%m-%d").date()
     except ValueError:
         errors.append("Invalid date format (use YYYY-MM-DD)")
+    else:
+        # Archived months are read from column files only; a row added
+        # to the live table there would never be counted
+        live_start = site_router.archive().live_start()
+        if live_start and day < live_start:
+            errors.append(f"Sales before {live_start.isoformat()} are archived and can't be added")
     return errors
 
-@app.route("/api/sales", methods=["GET", "POST"])
-def api_sales():
-    if request.method == "POST":
-        data = request.get_json() or {}
-        errors = validate_sale(data)
-        if errors:
-            return jsonify({"errors": errors}), 400
-        
 @app.errorhandler(Exception)
 def handle_error(e):
     code = 500
@@ -39,12 +65,40 @@ def handle_error(e):
 # ==========================
 # DATABASE CONNECTION
 # ==========================
+# Embedded SQLite (DB_PATH) by default; DB_BACKEND=mysql uses DB_HOST etc.
+DB_BACKEND = storage.get_backend(default="sqlite")
+dialect = storage.get_dialect(DB_BACKEND)
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASS", ""),
+    "database": os.getenv("DB_NAME", "gastrotrack")
+}
+# Comma-separated read-only copies in DB_REPLICA_PATHS / DB_REPLICA_HOSTS
+db_router = storage.create_router(DB_BACKEND, DB_CONFIG).init_app(app)
+stale_responses = None
+if db_router.breaker is not None:
+    # While the DB is down: GETs replay their last good response, writes fail fast
+    stale_responses = StaleResponses(db_router.breaker).init_app(app)
+# Liveness/readiness answered from a background DB probe (see health.py)
+health = HealthMonitor(db_router).init_app(app)
+health.add_component("admission", admission_report(admission))
+health.add_component("breaker", breaker_report(db_router, stale_responses))
+# Admin-only sampling profiler (PROFILER_TOKEN); a no-op until started
+profiler = SamplingProfiler().init_app(app)
+# Every route is also served per location under /sites/<id>/ (see sites.py)
+site_router = sites.create_site_router(DB_BACKEND, DB_CONFIG, db_router).init_app(app)
+# Panels shared by all workers on the host (SHARED_CACHE_PATH); logging a
+# sale also depletes stock, so it invalidates both
+shared_cache = SharedCache().init_app(app, write_tags=lambda: sites.tags("sales", "inventory"))
+health.add_component("shared_cache", shared_cache.stats)
+
+
 @contextmanager
-def get_db_connection():
+def get_db_connection(readonly=None, site_id=None):
     conn = None
     try:
-        conn = sqlite3.connect("gastrotrack.db")
-        conn.row_factory = sqlite3.Row
+        conn = site_router.connect(readonly, site_id)
         yield conn
     finally:
         if conn:
@@ -56,16 +110,16 @@ def get_db_connection():
 @app.route("/dashboard")
 def dashboard():
     # Fetch chart data from DB (example logic)
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
-        SELECT item_name, MONTHNAME(sale_date) AS month, SUM(quantity) AS total_sold
-        FROM sales
-        GROUP BY item_name, MONTHNAME(sale_date)
-        ORDER BY month;
-    """)
-    rows = cursor.fetchall()
+    month = dialect.month_name("sale_date")
+    condition, params = sites.site_filter()
+    with get_db_connection() as conn:
+        rows = dialect.fetchall(conn, f"""
+            SELECT item_name, {month} AS month, SUM(quantity) AS total_sold
+            FROM sales
+            WHERE {condition}
+            GROUP BY item_name, {month}
+            ORDER BY month;
+        """, params)
 
     chart_data = {}
     for row in rows:
@@ -74,89 +128,327 @@ def dashboard():
         qty = row["total_sold"]
         chart_data.setdefault(item, {})[month] = qty
 
-    cursor.close()
-    conn.close()
-
     return render_template("dashboard.html", chart_data=chart_data)
 
 
+# ==========================
+# DASHBOARD PANELS
+# Each loader takes an open connection so the bootstrap endpoint can
+# build every panel over a single connection.
+# ==========================
+def load_sales_panel(conn):
+    """Per-item daily quantities shaped for Chart.js."""
+    sale_day = dialect.date("sale_date")
+    source = site_router.archive()
+    condition, params = sites.site_filter()
+    live, live_params = live_filter(source=source)
+    sales = dialect.fetchall(conn, f"""
+        SELECT item_name,
+               {sale_day} AS sale_date,
+               SUM(quantity) AS total_qty
+        FROM sales
+        WHERE {condition} AND {live}
+        GROUP BY item_name, {sale_day}
+        ORDER BY sale_date ASC
+    """, params + live_params)
+
+    # Closed months come from the columnar archive
+    totals = source.item_day_totals(site_id=sites.current())
+    for r in sales:
+        totals[(r["item_name"], format_date(r["sale_date"]))] += r["total_qty"]
+
+    if not totals:
+        return {"labels": [], "datasets": []}
+
+    labels = sorted(set(day for _, day in totals))
+    items = sorted(set(item for item, _ in totals))
+
+    datasets = [{
+        "label": item,
+        "data": [totals.get((item, label), 0) for label in labels]
+    } for item in items]
+
+    return {"labels": labels, "datasets": datasets}
+
+
+def load_menu_performance_panel(conn):
+    """Names of the top 3 and bottom 3 menu items by quantity sold."""
+    top3 = category_stats.ranked_items(conn, dialect, 3, site_id=sites.current())
+
+    if not top3:
+        return {
+            "top3": ["No data"] * 3,
+            "bottom3": ["No data"] * 3
+        }
+
+    bottom3 = category_stats.ranked_items(conn, dialect, 3, best=False, site_id=sites.current())
+    return {
+        "top3": [row["item_name"] for row in top3],
+        "bottom3": [row["item_name"] for row in bottom3]
+    }
+
+
+def load_inventory_panel(conn):
+    """Stock level of every inventory item as a percentage of capacity."""
+    condition, params = sites.site_filter()
+    return dialect.fetchall(conn, f"""
+        SELECT item_name AS name,
+               CASE WHEN capacity > 0 THEN ROUND(stock_level * 100.0 / capacity, 1) ELSE 0 END AS percent
+        FROM inventory
+        WHERE {condition}
+    """, params)
+
+
+def load_demand_forecast_panel(conn):
+    """Simple random demand predictions for up to 4 menu items."""
+    # Pull item names dynamically (4 random from sales or inventory)
+    condition, params = sites.site_filter()
+    rows = dialect.fetchall(conn, f"""
+        SELECT DISTINCT item_name FROM sales WHERE {condition} ORDER BY {dialect.random()} LIMIT 4;
+    """, params)
+    if not rows:
+        rows = dialect.fetchall(conn, f"""
+            SELECT DISTINCT item_name FROM inventory WHERE {condition} ORDER BY {dialect.random()} LIMIT 4;
+        """, params)
+
+    # Simulated demand forecast between -30% and +30%
+    return {row["item_name"]: random.randint(-30, 30) for row in rows}
+
+
+def load_expiry_alerts_panel(conn):
+    """Inventory items expiring within the next 7 days."""
+    days_left = dialect.days_until("expiry_date")
+    condition, params = sites.site_filter()
+    return dialect.fetchall(conn, f"""
+        SELECT item_name,
+               {days_left} AS days_left
+        FROM inventory
+        WHERE {condition} AND {days_left} <= 7
+        ORDER BY days_left ASC;
+    """, params)
+
+
+def load_predicted_demand_panel(conn=None):
+    """
+    Temporary static 7‑day percentage change predictions.
+    Replace with real ML output later.
+    """
+    return [
+        {"item": "Latte", "change": 0.15},
+        {"item": "PBJ", "change": -0.05},
+        {"item": "Pancake", "change": -0.30}
+    ]
+
+
+def load_suggestions_panel(conn=None):
+    return {
+        "items": [
+            {"message": "Increase prep batch of Chicken Soup", "action": "High lunch demand"},
+            {"message": "Reduce lettuce ordering", "action": "Lower sale volume"},
+            {"message": "Promote pasta set", "action": "High conversion rate"}
+        ]
+    }
+
+
+# name -> (loader, needs_db)
+PANELS = {
+    "sales": (load_sales_panel, True),
+    "menu_performance": (load_menu_performance_panel, True),
+    "inventory": (load_inventory_panel, True),
+    "demand_forecast": (load_demand_forecast_panel, True),
+    "expiry_alerts": (load_expiry_alerts_panel, True),
+    "predicted_demand": (load_predicted_demand_panel, False),
+    "suggestions": (load_suggestions_panel, False),
+}
+
+# Panels kept in the shared cache, with the writes that invalidate them
+PANEL_TAGS = {
+    "sales": ("sales",),
+    "menu_performance": ("sales",),
+    "inventory": ("inventory",),
+    "expiry_alerts": ("inventory",),
+}
+
+
+def panel_key(name):
+    return f"dashboard:panel:{sites.current()}:{name}"
+
+
+def load_panel(name, conn):
+    """A DB panel of the current site through the shared cache (computed by one worker at a time)"""
+    loader = PANELS[name][0]
+    if name not in PANEL_TAGS or not shared_cache.enabled:
+        return loader(conn)
+
+    def compute():
+        # Stored for every worker, so built from the primary, never a lagging replica
+        with get_db_connection(readonly=shared_cache.compute_readonly) as primary:
+            return loader(primary)
+    return shared_cache.get_or_compute(panel_key(name), compute, tags=sites.tags(*PANEL_TAGS[name]))
+
+
+def cached_panel(name):
+    """A DB panel, opening a connection only when the cache can't answer"""
+    cached = shared_cache.peek(panel_key(name))
+    if cached is not None:
+        return cached
+    with get_db_connection() as conn:
+        return load_panel(name, conn)
+
+
+# ==========================
+# ROUTE: DASHBOARD BOOTSTRAP
+# (everything the dashboard needs on first load, in one request)
+# ==========================
+@app.route("/api/dashboard/bootstrap")
+def dashboard_bootstrap():
+    """
+    Build every dashboard panel in one response.
+
+    DB panels share a single connection and run back to back (a DB
+    connection can't be used from several threads); panels that don't touch
+    the database run concurrently on a thread pool meanwhile. A failing
+    panel is reported under "errors" without failing the others.
+    Use ?panels=sales,inventory to request a subset.
+    """
+    wanted = request.args.get("panels")
+    names = [n for n in wanted.split(",") if n in PANELS] if wanted else list(PANELS)
+
+    payload = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = {
+            name: pool.submit(PANELS[name][0])
+            for name in names if not PANELS[name][1]
+        }
+
+        for name in names:
+            if name in PANEL_TAGS:
+                cached = shared_cache.peek(panel_key(name))
+                if cached is not None:
+                    payload[name] = cached
+
+        db_panels = [name for name in names if PANELS[name][1] and name not in payload]
+        if db_panels:
+            try:
+                with get_db_connection() as conn:
+                    for name in db_panels:
+                        try:
+                            payload[name] = load_panel(name, conn)
+                        except Exception as e:
+                            errors[name] = str(e)
+            except Exception as e:
+                errors.update({name: str(e) for name in db_panels if name not in payload})
+
+        for name, future in futures.items():
+            try:
+                payload[name] = future.result()
+            except Exception as e:
+                errors[name] = str(e)
+
+    if errors:
+        payload["errors"] = errors
+    return jsonify(payload)
+
+
 # ==========================
 # ROUTE: GET + POST SALES DATA
 # (used by Chart.js + Quick Log Sale modal)
 # ==========================
 
+INSERT_SALE_SQL = "INSERT INTO sales (site_id, item_name, quantity, sale_date) VALUES (%s, %s, %s, %s)"
+
+
+def insert_sales(rows):
+    """
+    Write a batch of (site_id, item_name, quantity, sale_date) rows, the
+    matching ingredient depletion and the sales rollups; one commit per
+    site, as sites may live in different databases. The ingest buffer hands
+    over one site at a time, so a failing site can't fail the others' rows.
+    """
+    for site_id, group in groupby(sorted(rows, key=lambda row: row[0]), key=lambda row: row[0]):
+        group = list(group)
+        sales = [row[1:] for row in group]
+        with get_db_connection(readonly=False, site_id=site_id) as conn:
+            dialect.executemany(conn, INSERT_SALE_SQL, group)
+            stock_ledger.deplete_for_sales(conn, dialect, sales, site_id=site_id)
+            category_stats.record_sales(conn, dialect, sales, site_id=site_id)
+            conn.commit()
+
+
+# Opt-in buffered ingest: sale inserts are group-committed every
+# SALES_FLUSH_MS or SALES_FLUSH_ROWS rows, whichever comes first.
+sales_buffer = None
+if os.getenv("SALES_BUFFERED_INGEST") == "1":
+    sales_buffer = GroupCommitBuffer(
+        insert_sales,
+        max_rows=int(os.getenv("SALES_FLUSH_ROWS", 100)),
+        max_latency_ms=float(os.getenv("SALES_FLUSH_MS", 10)),
+        max_queue=int(os.getenv("SALES_QUEUE_DEPTH", 1000)),
+        submit_timeout=float(os.getenv("SALES_COMMIT_TIMEOUT", 30)),
+        name="sales-ingest",
+        partition=lambda row: row[0]  # one transaction per site
+    )
+
+    def sales_buffer_report():
+        stats = sales_buffer.stats()
+        # A full queue means POST /api/sales is already answering 503
+        return dict(stats, ready=stats["queue_depth"] < stats["max_queue"])
+    health.add_component("sales_ingest", sales_buffer_report)
+
+
 @app.route("/api/sales", methods=["GET", "POST"])
 def api_sales():
     """Handle sales data operations with proper error handling."""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            if request.method == "POST":
-                data = request.get_json() or {}
-                errors = validate_sale(data)
-                if errors:
-                    return jsonify({"errors": errors}), 400
-
-                dish = data.get("dish")
-                qty = int(data.get("qty", 0))
-                date = data.get("date", datetime.now().strftime("%Y-%m-%d"))
-
-                cursor.execute(
-                    "INSERT INTO sales (item_name, quantity, sale_date) VALUES (?, ?, ?)",
-                    (dish, qty, date)
-                )
-                conn.commit()
-                return jsonify({"status": "success", "message": f"Added {qty}x {dish} on {date}"})
-
-            # GET request - fetch sales data
-            sales = cursor.execute("""
-                SELECT item_name,
-                       sale_date,
-                       SUM(quantity) AS total_qty
-                FROM sales
-                GROUP BY item_name, sale_date
-                ORDER BY sale_date ASC
-            """).fetchall()
-
-            if not sales:
-                return jsonify({"labels": [], "datasets": []})
-
-            labels = sorted(list(set(row["sale_date"] for row in sales)))
-            items = sorted(list(set(row["item_name"] for row in sales)))
-
-            datasets = [{
-                "label": item,
-                "data": [
-                    next((r["total_qty"] for r in sales 
-                          if r["item_name"] == item and r["sale_date"] == label), 0)
-                    for label in labels
-                ]
-            } for item in items]
-
-            return jsonify({"labels": labels, "datasets": datasets})
-
+        if request.method == "POST":
+            data = request.get_json() or {}
+            errors = validate_sale(data)
+            if errors:
+                return jsonify({"errors": errors}), 400
+
+            dish = data.get("dish")
+            qty = int(data.get("qty", 0))
+            date = data.get("date", datetime.now().strftime("%Y-%m-%d"))
+
+            if sales_buffer is not None:
+                # Returns once the group commit holding this row is durable
+                sales_buffer.submit((sites.current(), dish, qty, date))
+            else:
+                insert_sales([(sites.current(), dish, qty, date)])
+            return jsonify({"status": "success", "message": f"Added {qty}x {dish} on {date}"})
+
+        # GET request - fetch sales data
+        return jsonify(cached_panel("sales"))
+
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except CommitTimeout as e:
+        # Not retryable blindly: the row may still be committed
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    # Reorganize data for Chart.js
-    labels = sorted(list(set([row["sale_date"] for row in sales])))
-    items = sorted(list(set([row["item_name"] for row in sales])))
-
-    datasets = []
-    for item in items:
-        qty_data = []
-        for label in labels:
-            match = next((r["total_qty"] for r in sales if r["item_name"] == item and r["sale_date"] == label), 0)
-            qty_data.append(match)
-        datasets.append({
-            "label": item,
-            "data": qty_data
-        })
-
-    return jsonify({
-        "labels": labels,
-        "datasets": datasets
-    })
+
+
+@app.route("/api/sales/series")
+def api_sales_series():
+    """Gap-filled, downsampled sales series (see timeseries.sales_series)."""
+    try:
+        start, end, bucket, points, metric = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with get_db_connection() as conn:
+        return jsonify(sales_series(conn, dialect, start, end, bucket, points, metric,
+                                    site_id=sites.current(), source=site_router.archive()))
+
+
+@app.route("/api/sales/ingest/stats")
+def sales_ingest_stats():
+    """Flush size, latency and queue depth of the buffered sale ingest."""
+    if sales_buffer is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(sales_buffer.stats(), enabled=True))
 
 # ==========================
 # ROUTE: SALES SUMMARY
@@ -164,19 +456,9 @@ def api_sales():
 @app.route("/api/sales_summary")
 def api_sales_summary():
     """Return only top 3 and bottom 3 items."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT item_name, SUM(quantity) AS total_qty
-        FROM sales
-        GROUP BY item_name
-        ORDER BY total_qty DESC
-    """)
-    totals = cur.fetchall()
-    conn.close()
-
-    top3 = [dict(row) for row in totals[:3]]
-    bottom3 = [dict(row) for row in totals[-3:]]
+    with get_db_connection() as conn:
+        top3 = category_stats.ranked_items(conn, dialect, 3, site_id=sites.current())
+        bottom3 = category_stats.ranked_items(conn, dialect, 3, best=False, site_id=sites.current())
     return jsonify({"top3": top3, "bottom3": bottom3})
 
 
@@ -187,21 +469,7 @@ def api_sales_summary():
 def demand_forecast():
     """Generates simple random demand predictions for menu items."""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-
-    # Pull item names dynamically (4 random from sales or inventory)
-    cursor.execute("SELECT DISTINCT item_name FROM sales ORDER BY RANDOM() LIMIT 4;")
-    items = [row["item_name"] for row in cursor.fetchall()]
-
-    if not items:
-        cursor.execute("SELECT DISTINCT item_name FROM inventory ORDER BY RANDOM() LIMIT 4;")
-        items = [row["item_name"] for row in cursor.fetchall()]
-
-    conn.close()
-
-    # Simulated demand forecast between -30% and +30%
-    forecast = {item: random.randint(-30, 30) for item in items}
-    return jsonify(forecast)
+        return jsonify(load_demand_forecast_panel(conn))
 
 
 # ==========================
@@ -209,16 +477,7 @@ def demand_forecast():
 # ==========================
 @app.route("/api/predicted_demand")
 def predicted_demand():
-    """
-    Temporary static 7‑day percentage change predictions.
-    Replace with real ML output later.
-    """
-    predictions = [
-        {"item": "Latte", "change": 0.15},
-        {"item": "PBJ", "change": -0.05},
-        {"item": "Pancake", "change": -0.30}
-    ]
-    return jsonify(predictions)
+    return jsonify(load_predicted_demand_panel())
 
 
 # ==========================
@@ -228,29 +487,7 @@ def predicted_demand():
 def menu_performance():
     """Return top and bottom performing menu items with error handling."""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT item_name, SUM(quantity) as total_qty
-                FROM sales
-                GROUP BY item_name
-                ORDER BY total_qty DESC
-            """)
-            items = cursor.fetchall()
-
-            if not items:
-                return jsonify({
-                    "top3": ["No data"] * 3,
-                    "bottom3": ["No data"] * 3
-                })
-
-            top3 = [dict(row)["item_name"] for row in items[:3]]
-            bottom3 = [dict(row)["item_name"] for row in items[-3:]]
-
-            return jsonify({
-                "top3": top3,
-                "bottom3": bottom3
-            })
+        return jsonify(cached_panel("menu_performance"))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -261,78 +498,31 @@ def menu_performance():
 @app.route("/api/inventory")
 def get_inventory():
     """Return inventory status with stock percentages."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        items = cursor.execute("SELECT item_name, stock_level, capacity FROM inventory").fetchall()
-
-    inventory = []
-    
-    for i in items:
-        percent = round((i["stock_level"] / i["capacity"]) * 100, 1) if i["capacity"] else 0
-        inventory.append({
-            "name": i["item_name"],
-            "percent": percent
-        })
-    return jsonify(inventory)
-
-# ==========================
-# ROUTE: DEMAND FORECAST
-# ==========================
-@app.route("/api/demand_forecast")
-def demand_forecast():
-    return jsonify({
-        "Chicken Breast": 12,
-        "Tomatoes": -8,
-        "Cheddar Cheese": 5
-    })
+    return jsonify(cached_panel("inventory"))
 
 # ==========================
 # ROUTE: EXPIRY ALERTS
 # ==========================
 @app.route("/api/expiry_alerts")
 def expiry_alerts():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT item_name,
-               DATEDIFF(expiry_date, CURDATE()) AS days_left
-        FROM inventory
-        WHERE DATEDIFF(expiry_date, CURDATE()) <= 7
-        ORDER BY days_left ASC;
-    """)
-    data = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify(data)
+    return jsonify(cached_panel("expiry_alerts"))
 
 # ==========================
 # ROUTE: SUGGESTIONS
 # ==========================
 @app.route("/api/suggestions")
 def suggestions():
-    return jsonify({
-        "items": [
-            {"message": "Increase prep batch of Chicken Soup", "action": "High lunch demand"},
-            {"message": "Reduce lettuce ordering", "action": "Lower sale volume"},
-            {"message": "Promote pasta set", "action": "High conversion rate"}
-        ]
-    })
+    return jsonify(load_suggestions_panel())
 
 
 
 def init_db():
     """Initialize the database with required tables."""
-    with get_db_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                item_name TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                sale_date DATE NOT NULL
-            )
-        """)
-        conn.commit()
+    # MySQL schema is managed by gastrotrackdb.sql
+    if DB_BACKEND == "sqlite":
+        with get_db_connection(readonly=False) as conn:
+            storage.init_sqlite_schema(conn)
 
 if __name__ == "__main__":
     init_db()  # Initialize database tables
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
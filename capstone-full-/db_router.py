@@ -0,0 +1,197 @@
+"""Read/write routing between a primary database and read replicas.
+
+GET/HEAD requests are sent to a replica whose replication lag is within
+`max_lag`; everything else goes to the primary. After a write the client
+gets a short-lived cookie, and its reads stay on the primary until any
+replica we would use is guaranteed to have caught up (read-your-writes).
+With no replicas configured every connection goes to the primary.
+"""
+import itertools
+import os
+import threading
+import time
+
+from flask import has_request_context, request
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+WRITE_COOKIE = "db_last_write"
+MAX_REPLICA_LAG = float(os.getenv("DB_MAX_REPLICA_LAG", 5))  # seconds
+LAG_CHECK_INTERVAL = float(os.getenv("DB_LAG_CHECK_INTERVAL", 2))  # seconds
+
+
+class Replica:
+    """A read replica: how to connect to it and how to measure its lag"""
+
+    def __init__(self, name, connect, lag=None):
+        self.name = name
+        self.connect = connect
+        self.lag = lag  # lag() -> seconds behind the primary, None if unknown
+        self.last_lag = None
+        self.checked_at = 0.0
+
+
+class DatabaseRouter:
+    """Pick the primary or a replica connection for the current request"""
+
+    def __init__(self, connect_primary, replicas=(), max_lag=MAX_REPLICA_LAG,
+                 lag_check_interval=LAG_CHECK_INTERVAL, breaker=None):
+        self.connect_primary = connect_primary
+        self.breaker = breaker  # CircuitBreaker guarding the primary, optional
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._rotation = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def connect(self, readonly=None):
+        """
+        Open a connection. readonly=None decides from the current request:
+        safe methods read from a replica unless this client just wrote.
+        """
+        if readonly is None:
+            readonly = self._request_is_read()
+        if readonly:
+            replica = self._pick_replica()
+            if replica is not None:
+                try:
+                    return replica.connect()
+                except Exception as err:
+                    print(f"Replica {replica.name} unavailable, using primary: {err}")
+                    self._mark_down(replica)
+        if self.breaker is not None:
+            return self.breaker.connect(self.connect_primary)
+        return self.connect_primary()
+
+    def _request_is_read(self):
+        if not has_request_context() or request.method not in READ_METHODS:
+            return False
+        try:
+            last_write = float(request.cookies.get(WRITE_COOKIE, 0))
+        except ValueError:
+            last_write = 0.0
+        # Any replica we route to is at most max_lag behind, so once that much
+        # time has passed since this client's last write they can see it.
+        return time.time() - last_write > self.max_lag
+
+    def _pick_replica(self):
+        if not self.replicas:
+            return None
+        with self._lock:
+            order = [self.replicas[next(self._rotation)] for _ in self.replicas]
+        for replica in order:
+            if self._claim_probe(replica):
+                self._probe(replica)
+            with self._lock:
+                lag = replica.last_lag
+            if lag is not None and lag <= self.max_lag:
+                return replica
+        return None
+
+    def _claim_probe(self, replica):
+        """True if the lag reading is stale and this thread should refresh it"""
+        now = time.monotonic()
+        with self._lock:
+            if now - replica.checked_at < self.lag_check_interval:
+                return False
+            # Other threads keep using the cached reading until ours is in
+            replica.checked_at = now
+            return True
+
+    def _probe(self, replica):
+        # A network round trip, so never under the lock
+        try:
+            lag = replica.lag() if replica.lag else 0.0
+        except Exception:
+            lag = None
+        with self._lock:
+            replica.last_lag = lag
+
+    def _mark_down(self, replica):
+        with self._lock:
+            replica.last_lag = None
+            replica.checked_at = time.monotonic()
+
+    def status(self):
+        """Last known lag of each replica (None = down or not replicating)"""
+        return {r.name: r.last_lag for r in self.replicas}
+
+    def init_app(self, app):
+        """Stamp clients that write so their next reads see the write"""
+        @app.after_request
+        def remember_write(response):
+            if request.method not in READ_METHODS and response.status_code < 400:
+                response.set_cookie(WRITE_COOKIE, f"{time.time():.3f}",
+                                    max_age=int(self.max_lag) + 1, httponly=True)
+            return response
+        return self
+
+
+# --- SQLite helpers ---
+def _last_write(path):
+    """mtime of a SQLite file, counting its WAL; raises if the file is missing"""
+    written = os.path.getmtime(path)
+    try:
+        return max(written, os.path.getmtime(path + "-wal"))
+    except OSError:
+        return written
+
+
+def sqlite_replica_lag(primary_path, replica_path):
+    """
+    Return a lag() probe for a SQLite replica kept up to date by copying the
+    primary file (.backup, litestream restore, rsync): the seconds between
+    the primary's last write and the replica's last refresh. A missing
+    replica file raises, so the router skips it.
+    """
+    def lag():
+        return max(0.0, _last_write(primary_path) - _last_write(replica_path))
+    return lag
+
+
+# --- MySQL helpers ---
+def mysql_replica_lag(connect):
+    """Return a lag() probe reading Seconds_Behind_Source from a replica"""
+    def lag():
+        conn = connect()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Exception:
+                cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22 / MariaDB
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        seconds = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return None if seconds is None else float(seconds)
+    return lag
+
+
+def mysql_router(config, replica_hosts=None, breaker=None):
+    """
+    Router for a MySQL primary described by `config` (connect kwargs) and
+    replicas listed as "host[:port],host[:port]" in replica_hosts or the
+    DB_REPLICA_HOSTS environment variable.
+    """
+    import mysql.connector
+
+    from circuit_breaker import CONNECT_TIMEOUT
+
+    config = dict(config)
+    config.setdefault("connection_timeout", CONNECT_TIMEOUT)  # fail fast when the host is down
+    replica_hosts = replica_hosts if replica_hosts is not None else os.getenv("DB_REPLICA_HOSTS", "")
+    replicas = []
+    for entry in filter(None, (h.strip() for h in replica_hosts.split(","))):
+        host, _, port = entry.partition(":")
+        replica_config = dict(config, host=host)
+        if port:
+            replica_config["port"] = int(port)
+
+        def connect(cfg=replica_config):
+            return mysql.connector.connect(**cfg)
+        replicas.append(Replica(entry, connect, mysql_replica_lag(connect)))
+
+    return DatabaseRouter(lambda: mysql.connector.connect(**config), replicas, breaker=breaker)
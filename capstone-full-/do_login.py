@@ -1,9 +1,17 @@
-from flask import Flask, request, redirect, session
+from flask import Flask, request, redirect, session, jsonify
 import urllib.parse
 import mysql.connector
 
+import json_provider
+import session_store
+from static_cache import create_static_cache
+from user_cache import UserIndex, find_login_user, require_role, USER_BY_ID_SQL
+
 app = Flask(__name__)
 app.secret_key = 'super_secret_key'  # used for Flask session encryption
+json_provider.init_app(app)
+session_store.init_app(app)  # session data lives server-side, the cookie only holds an id
+static_cache = create_static_cache(app)  # pages and assets served from memory
 
 # --- Configuration ---
 DEMO_MODE = True  # Change to False to use MySQL
@@ -15,6 +23,29 @@ DB_CONFIG = {
 }
 
 
+# The one account of demo mode
+DEMO_USER = {'id': 'adminsaOjack32', 'username': 'admin', 'display_name': 'Saojack', 'role': 'Admin'}
+
+
+def load_user(uid):
+    """Fetch a single user profile for the user index"""
+    if DEMO_MODE:
+        # No users table: re-serve the demo account once its cached profile expires
+        return DEMO_USER if uid == DEMO_USER['id'] else None
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(USER_BY_ID_SQL, (uid,))
+        row = cursor.fetchone()
+        cursor.close()
+        return row
+    finally:
+        conn.close()
+
+
+user_index = UserIndex(load_user)
+
+
 @app.route('/do_login', methods=['POST'])
 def do_login():
     user = request.form.get('user', '').strip()
@@ -27,8 +58,10 @@ def do_login():
     if DEMO_MODE:
         # --- Demo user without DB ---
         if user == 'admin' and password == '1234':
-            session['uid'] = 'adminsaOjack32'
-            session['uname'] = 'Saojack'
+            profile = user_index.remember(DEMO_USER)
+            session_store.regenerate()  # never log in under an id chosen before login
+            session['uid'] = profile['id']
+            session['uname'] = profile['display_name']
             return redirect('/dashboard')
         else:
             err_msg = urllib.parse.quote("Incorrect password or username\nplease try again.")
@@ -38,18 +71,16 @@ def do_login():
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT id, username, password_hash, display_name FROM users WHERE username=%s OR email=%s LIMIT 1",
-            (user, user)
-        )
-        row = cursor.fetchone()
+        row = find_login_user(cursor, user)
 
         if row:
             # You can use bcrypt or werkzeug.security.check_password_hash for real hashing
             import bcrypt
             if bcrypt.checkpw(password.encode('utf-8'), row['password_hash'].encode('utf-8')):
-                session['uid'] = str(row['id'])
-                session['uname'] = row['display_name'] or row['username']
+                profile = user_index.remember(row)
+                session_store.regenerate()  # never log in under an id chosen before login
+                session['uid'] = profile['id']
+                session['uname'] = profile['display_name']
                 return redirect('/dashboard')
 
         err_msg = urllib.parse.quote("Incorrect password or username\nplease try again.")
@@ -69,8 +100,8 @@ def do_login():
 
 @app.route('/loginpage')
 def login_page():
-    # Load your HTML frontend
-    return open('loginpage.html', encoding='utf-8').read()
+    # Serve the HTML frontend from the in-memory cache
+    return static_cache.page('loginpage.html')
 
 
 @app.route('/dashboard')
@@ -81,5 +112,18 @@ def dashboard():
     return f"<h1>Welcome, {uname}!</h1><p>You are logged in as {session['uid']}.</p>"
 
 
+@app.route('/api/me')
+@require_role(user_index)
+def current_user():
+    """Return the logged-in user's cached profile (no DB round trip)"""
+    return jsonify(user_index.get(session['uid']))
+
+
+@app.route('/logout')
+def logout():
+    session.clear()
+    return redirect('/loginpage')
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -43,22 +43,24 @@ CREATE TABLE menu_inventory (
     FOREIGN KEY (item_id) REFERENCES inventory(item_id) ON DELETE CASCADE
 );
 
+-- sales and waste are partitioned by month (partitions.py), so their date
+-- column is part of the primary key and they carry no foreign keys
 CREATE TABLE sales (
-    sale_id INT AUTO_INCREMENT PRIMARY KEY,
+    sale_id INT AUTO_INCREMENT,
     menu_id INT,
     quantity INT CHECK (quantity > 0),
     total_cost DECIMAL(10,2),
-    sale_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (menu_id) REFERENCES menu(menu_id)
+    sale_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (sale_id, sale_date)
 );
 
 CREATE TABLE waste (
-    waste_id INT AUTO_INCREMENT PRIMARY KEY,
+    waste_id INT AUTO_INCREMENT,
     item_id INT,
     quantity INT CHECK (quantity > 0),
     reason VARCHAR(255),
-    date_logged DATETIME DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (item_id) REFERENCES inventory(item_id)
+    date_logged DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (waste_id, date_logged)
 );
 
 CREATE TABLE demand_prediction (
@@ -92,6 +94,188 @@ ADD COLUMN IF NOT EXISTS is_active TINYINT(1) DEFAULT 1;
 ALTER TABLE inventory
 ADD COLUMN IF NOT EXISTS status ENUM('active','disabled') DEFAULT 'active';
 
+-- Login looks users up by username, then by email; each lookup needs its own index
+ALTER TABLE users
+ADD COLUMN IF NOT EXISTS email VARCHAR(255) NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email);
+
+-- Menu tables and sales columns read by sales_api.py / dashboard.py
+-- (gastrotrackdb_sqlite.sql holds the same layout for the embedded backend)
+CREATE TABLE IF NOT EXISTS menu_categories (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    category_name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS menu_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    item_name VARCHAR(100) NOT NULL,
+    category_id INT,
+    color_code VARCHAR(20),
+    price DECIMAL(10,2) DEFAULT 0.00,
+    INDEX idx_menu_items_category (category_id),
+    FOREIGN KEY (category_id) REFERENCES menu_categories(id)
+);
+
+ALTER TABLE sales
+ADD COLUMN IF NOT EXISTS item_id INT NULL,
+ADD COLUMN IF NOT EXISTS item_name VARCHAR(100) NULL,
+ADD COLUMN IF NOT EXISTS price DECIMAL(10,2) DEFAULT 0.00;
+
+CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_item_date ON sales (item_name, sale_date);
+CREATE INDEX IF NOT EXISTS idx_menu_categories_name ON menu_categories (category_name);
+CREATE INDEX IF NOT EXISTS idx_menu_items_name ON menu_items (item_name);
+
+-- Sales rollups kept current on insert (category_stats.py); drill-downs
+-- read top/bottom items and the monthly trend from these, never from sales.
+-- Backfill with: python category_stats.py rebuild
+CREATE TABLE IF NOT EXISTS item_sales_totals (
+    site_id INT NOT NULL DEFAULT 1,
+    item_name VARCHAR(100) NOT NULL,
+    category_id INT NULL,
+    quantity BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (site_id, item_name),
+    INDEX idx_item_sales_totals_site_qty (site_id, quantity, item_name),
+    INDEX idx_item_sales_totals_site_category_qty (site_id, category_id, quantity, item_name)
+);
+
+CREATE TABLE IF NOT EXISTS category_monthly_sales (
+    site_id INT NOT NULL DEFAULT 1,
+    category_id INT NOT NULL,
+    month CHAR(7) NOT NULL,
+    quantity BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (site_id, category_id, month),
+    FOREIGN KEY (category_id) REFERENCES menu_categories(id)
+);
+
+-- Replenishment (replenishment.py): supplier lead time per ingredient
+-- (NULL = REORDER_LEAD_TIME_DAYS) and recipe lookups by sold item
+ALTER TABLE inventory
+ADD COLUMN IF NOT EXISTS lead_time_days DECIMAL(5,1) NULL;
+
+-- Row version for compare-and-set edits; every write to a row bumps it
+ALTER TABLE inventory
+ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 1;
+
+CREATE INDEX IF NOT EXISTS idx_menu_inventory_menu ON menu_inventory (menu_id);
+
+-- Recipes belong to the menu the app sells from (menu_items, as sales.item_id
+-- and the SQLite schema do), not the legacy menu table. Existing recipes are
+-- moved over by dish name while the old key is still in place, so running
+-- this again is a no-op.
+SET FOREIGN_KEY_CHECKS = 0;
+UPDATE menu_inventory r
+JOIN menu m ON m.menu_id = r.menu_id
+JOIN menu_items mi ON mi.item_name = m.menu_name
+SET r.menu_id = mi.id
+WHERE EXISTS (
+    SELECT 1 FROM information_schema.REFERENTIAL_CONSTRAINTS
+    WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'menu_inventory' AND REFERENCED_TABLE_NAME = 'menu'
+);
+SET FOREIGN_KEY_CHECKS = 1;
+
+ALTER TABLE menu_inventory
+DROP FOREIGN KEY IF EXISTS menu_inventory_ibfk_1,
+ADD CONSTRAINT fk_menu_inventory_menu_item FOREIGN KEY IF NOT EXISTS (menu_id)
+    REFERENCES menu_items(id) ON DELETE CASCADE;
+CREATE INDEX IF NOT EXISTS idx_waste_date ON waste (date_logged);
+
+-- Append-only stock ledger (stock_ledger.py). Every stock_level change is
+-- also a signed movement; daily snapshots bound point-in-time replays.
+CREATE TABLE IF NOT EXISTS stock_movements (
+    movement_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT NOT NULL,
+    kind ENUM('restock','sale','waste','adjust') NOT NULL,
+    quantity DECIMAL(10,2) NOT NULL,
+    note VARCHAR(255),
+    created_at DATETIME NOT NULL,
+    INDEX idx_stock_movements_item_time (item_id, created_at),
+    CONSTRAINT fk_stock_movements_item FOREIGN KEY (item_id) REFERENCES inventory(item_id) ON DELETE RESTRICT
+);
+
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    item_id INT NOT NULL,
+    snapshot_at DATETIME NOT NULL,
+    stock_level DECIMAL(10,2) NOT NULL,
+    PRIMARY KEY (item_id, snapshot_at),
+    CONSTRAINT fk_stock_snapshots_item FOREIGN KEY (item_id) REFERENCES inventory(item_id) ON DELETE RESTRICT
+);
+
+-- The ledger is history: deleting an ingredient must not erase it
+-- (disable the ingredient instead). Replaces the ON DELETE CASCADE keys
+-- of databases created before.
+ALTER TABLE stock_movements
+DROP FOREIGN KEY IF EXISTS stock_movements_ibfk_1,
+ADD CONSTRAINT fk_stock_movements_item FOREIGN KEY IF NOT EXISTS (item_id)
+    REFERENCES inventory(item_id) ON DELETE RESTRICT;
+
+ALTER TABLE stock_snapshots
+DROP FOREIGN KEY IF EXISTS stock_snapshots_ibfk_1,
+ADD CONSTRAINT fk_stock_snapshots_item FOREIGN KEY IF NOT EXISTS (item_id)
+    REFERENCES inventory(item_id) ON DELETE RESTRICT;
+
+-- Monthly range partitions (partitions.py). MySQL needs the partitioning
+-- column in every unique key and rejects foreign keys on partitioned
+-- tables. After this, create the partitions with:
+-- python partitions.py maintain (then daily from cron)
+ALTER TABLE sales
+DROP FOREIGN KEY IF EXISTS sales_ibfk_1,
+MODIFY sale_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+DROP PRIMARY KEY,
+ADD PRIMARY KEY (sale_id, sale_date);
+
+ALTER TABLE waste
+DROP FOREIGN KEY IF EXISTS waste_ibfk_1,
+MODIFY date_logged DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+DROP PRIMARY KEY,
+ADD PRIMARY KEY (waste_id, date_logged);
+
+-- Locations (sites.py). Sales, waste and inventory rows belong to one
+-- site, existing rows to site 1; every site-scoped query leads with
+-- site_id. Sites may also live in a database of their own (SITE_DB_HOSTS),
+-- which gets this same schema.
+CREATE TABLE IF NOT EXISTS sites (
+    site_id INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL
+);
+
+INSERT IGNORE INTO sites (site_id, name) VALUES (1, 'Main');
+
+ALTER TABLE sales
+ADD COLUMN IF NOT EXISTS site_id INT NOT NULL DEFAULT 1;
+
+ALTER TABLE waste
+ADD COLUMN IF NOT EXISTS site_id INT NOT NULL DEFAULT 1;
+
+ALTER TABLE inventory
+ADD COLUMN IF NOT EXISTS site_id INT NOT NULL DEFAULT 1;
+
+CREATE INDEX IF NOT EXISTS idx_sales_site_date ON sales (site_id, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_site_item_date ON sales (site_id, item_name, sale_date);
+CREATE INDEX IF NOT EXISTS idx_waste_site_date ON waste (site_id, date_logged);
+CREATE INDEX IF NOT EXISTS idx_inventory_site_status_name ON inventory (site_id, status, item_name);
+
+-- Rollups created before sites existed: key them by site, then refill
+-- with python category_stats.py rebuild
+ALTER TABLE item_sales_totals
+ADD COLUMN IF NOT EXISTS site_id INT NOT NULL DEFAULT 1 FIRST,
+DROP PRIMARY KEY,
+ADD PRIMARY KEY (site_id, item_name),
+DROP INDEX IF EXISTS idx_item_sales_totals_qty,
+DROP INDEX IF EXISTS idx_item_sales_totals_category_qty;
+
+CREATE INDEX IF NOT EXISTS idx_item_sales_totals_site_qty ON item_sales_totals (site_id, quantity, item_name);
+CREATE INDEX IF NOT EXISTS idx_item_sales_totals_site_category_qty
+    ON item_sales_totals (site_id, category_id, quantity, item_name);
+
+ALTER TABLE category_monthly_sales
+ADD COLUMN IF NOT EXISTS site_id INT NOT NULL DEFAULT 1 FIRST,
+DROP PRIMARY KEY,
+ADD PRIMARY KEY (site_id, category_id, month);
+
 -- ===== SAMPLE DATA FOR TESTING =====
 INSERT INTO inventory (item_name, stock_level, capacity, category, status) VALUES
 ('Milk', 7.0, 10.0, 'perishable', 'active'),
@@ -0,0 +1,132 @@
+-- Embedded (SQLite) schema. Mirrors the columns the apps use from
+-- gastrotrackdb.sql; created by storage.init_sqlite_schema(). A site with a
+-- database of its own (SITE_DB_PATHS, see sites.py) gets the same schema.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT UNIQUE,
+    password_hash TEXT NOT NULL DEFAULT '',
+    display_name TEXT,
+    role TEXT NOT NULL DEFAULT 'Staff' CHECK (role IN ('Admin','Staff')),
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Locations; sales, waste and inventory rows belong to one (sites.py)
+CREATE TABLE IF NOT EXISTS sites (
+    site_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+INSERT OR IGNORE INTO sites (site_id, name) VALUES (1, 'Main');
+
+CREATE TABLE IF NOT EXISTS inventory (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id INTEGER NOT NULL DEFAULT 1,
+    item_name TEXT NOT NULL,
+    quantity INTEGER DEFAULT 0 CHECK (quantity >= 0),
+    stock_level REAL DEFAULT 0.00 CHECK (stock_level >= 0),
+    capacity REAL DEFAULT 0.00 CHECK (capacity >= 0),
+    category TEXT DEFAULT 'perishable' CHECK (category IN ('perishable','semi-perishable')),
+    unit_cost REAL DEFAULT 0.00 CHECK (unit_cost >= 0),
+    expiry_date TEXT,
+    lead_time_days REAL,
+    is_active INTEGER DEFAULT 1,
+    status TEXT DEFAULT 'active' CHECK (status IN ('active','disabled')),
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_status_name ON inventory (status, item_name);
+CREATE INDEX IF NOT EXISTS idx_inventory_site_status_name ON inventory (site_id, status, item_name);
+CREATE INDEX IF NOT EXISTS idx_inventory_expiry ON inventory (expiry_date);
+
+CREATE TABLE IF NOT EXISTS menu_categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_menu_categories_name ON menu_categories (category_name);
+
+CREATE TABLE IF NOT EXISTS menu_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_name TEXT NOT NULL,
+    category_id INTEGER REFERENCES menu_categories(id),
+    color_code TEXT,
+    price REAL DEFAULT 0.00
+);
+CREATE INDEX IF NOT EXISTS idx_menu_items_category ON menu_items (category_id);
+CREATE INDEX IF NOT EXISTS idx_menu_items_name ON menu_items (item_name);
+
+-- Recipe: ingredient usage per sold menu item
+CREATE TABLE IF NOT EXISTS menu_inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    menu_id INTEGER REFERENCES menu_items(id) ON DELETE CASCADE,
+    item_id INTEGER REFERENCES inventory(item_id) ON DELETE CASCADE,
+    quantity_used REAL CHECK (quantity_used > 0)
+);
+CREATE INDEX IF NOT EXISTS idx_menu_inventory_menu ON menu_inventory (menu_id);
+
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id INTEGER NOT NULL DEFAULT 1,
+    item_id INTEGER REFERENCES menu_items(id),
+    item_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    price REAL DEFAULT 0.00,
+    sale_date TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_item_date ON sales (item_name, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_site_date ON sales (site_id, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sales_site_item_date ON sales (site_id, item_name, sale_date);
+
+-- Sales rollups kept current on insert, per site (category_stats.py)
+CREATE TABLE IF NOT EXISTS item_sales_totals (
+    site_id INTEGER NOT NULL DEFAULT 1,
+    item_name TEXT NOT NULL,
+    category_id INTEGER,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (site_id, item_name)
+);
+CREATE INDEX IF NOT EXISTS idx_item_sales_totals_site_qty ON item_sales_totals (site_id, quantity, item_name);
+CREATE INDEX IF NOT EXISTS idx_item_sales_totals_site_category_qty
+    ON item_sales_totals (site_id, category_id, quantity, item_name);
+
+CREATE TABLE IF NOT EXISTS category_monthly_sales (
+    site_id INTEGER NOT NULL DEFAULT 1,
+    category_id INTEGER NOT NULL REFERENCES menu_categories(id),
+    month TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (site_id, category_id, month)
+);
+
+CREATE TABLE IF NOT EXISTS waste (
+    waste_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site_id INTEGER NOT NULL DEFAULT 1,
+    item_id INTEGER REFERENCES inventory(item_id),
+    quantity INTEGER CHECK (quantity > 0),
+    reason TEXT,
+    date_logged TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_waste_date ON waste (date_logged);
+CREATE INDEX IF NOT EXISTS idx_waste_site_date ON waste (site_id, date_logged);
+
+-- Append-only stock ledger (stock_ledger.py); RESTRICT so deleting an
+-- ingredient can't erase its history
+CREATE TABLE IF NOT EXISTS stock_movements (
+    movement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL REFERENCES inventory(item_id) ON DELETE RESTRICT,
+    kind TEXT NOT NULL CHECK (kind IN ('restock','sale','waste','adjust')),
+    quantity REAL NOT NULL,
+    note TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_item_time ON stock_movements (item_id, created_at);
+
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    item_id INTEGER NOT NULL REFERENCES inventory(item_id) ON DELETE RESTRICT,
+    snapshot_at TEXT NOT NULL,
+    stock_level REAL NOT NULL,
+    PRIMARY KEY (item_id, snapshot_at)
+);
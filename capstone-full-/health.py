@@ -0,0 +1,177 @@
+"""Liveness and readiness endpoints.
+
+    /api/health/live   the process is up and serving; no I/O at all
+    /api/health/ready  whether this worker should get traffic, answered
+                       from state gathered in the background:
+                         database   last result of a SELECT 1 probe that a
+                                    daemon thread runs every
+                                    HEALTH_PROBE_INTERVAL seconds
+                         scheduler  how late that thread woke up (a worker
+                                    starved of CPU/GIL shows up here first)
+                         components pool/admission saturation, cache state,
+                                    write queues, registered by each app
+    /api/health        kept for existing probes; same answer as ready
+
+Load-balancer probes never open a connection, however often they poll.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import jsonify
+
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 5))  # seconds
+MAX_PROBE_AGE = float(os.getenv("HEALTH_MAX_PROBE_AGE", 3 * PROBE_INTERVAL))
+MAX_SCHEDULER_LAG_MS = float(os.getenv("HEALTH_MAX_SCHEDULER_LAG_MS", 1000))
+
+
+class HealthMonitor:
+
+    def __init__(self, router=None, interval=PROBE_INTERVAL, max_probe_age=MAX_PROBE_AGE,
+                 max_scheduler_lag_ms=MAX_SCHEDULER_LAG_MS, clock=time.monotonic):
+        self.router = router
+        self.interval = interval
+        self.max_probe_age = max_probe_age
+        self.max_scheduler_lag_ms = max_scheduler_lag_ms
+        self.clock = clock
+        self.started_at = time.time()
+        self.components = {}
+        self.probe = {"ok": None, "checked_at": None, "latency_ms": None, "error": None}
+        self.scheduler_lag_ms = 0.0
+        self._probed_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add_component(self, name, report):
+        """
+        report() -> dict, read on every readiness call so it must be cheap
+        (in-memory counters only). A "ready": False entry fails readiness.
+        """
+        self.components[name] = report
+        return self
+
+    # --- Background probe ---
+    def probe_once(self):
+        started = self.clock()
+        result = {"ok": True, "error": None}
+        try:
+            conn = self.router.connect(readonly=False)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as err:
+            result = {"ok": False, "error": str(err)}
+        finished = self.clock()
+        result["latency_ms"] = round((finished - started) * 1000, 2)
+        result["checked_at"] = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.probe = result
+            self._probed_at = finished
+        return result
+
+    def _run(self):
+        expected = self.clock()
+        while True:
+            self.scheduler_lag_ms = round(max(0.0, self.clock() - expected) * 1000, 2)
+            self.probe_once()
+            expected = self.clock() + self.interval
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start the probe thread once per process"""
+        with self._lock:
+            if self._thread is None and self.router is not None:
+                self._thread = threading.Thread(target=self._run, name="health-probe", daemon=True)
+                self._thread.start()
+        return self
+
+    # --- Reports ---
+    def readiness(self):
+        """(ready, report) from cached state only"""
+        with self._lock:
+            probe = dict(self.probe)
+            probed_at = self._probed_at
+        reasons = []
+
+        if self.router is not None:
+            age = None if probed_at is None else round(self.clock() - probed_at, 2)
+            probe["age_s"] = age
+            if age is None:
+                reasons.append("database not probed yet")
+            elif age > self.max_probe_age:
+                reasons.append("database probe is stale")
+            elif not probe["ok"]:
+                reasons.append("database probe failed")
+        if self.scheduler_lag_ms > self.max_scheduler_lag_ms:
+            reasons.append("scheduler lagging")
+
+        components = {}
+        for name, report in self.components.items():
+            try:
+                components[name] = report()
+            except Exception as err:
+                components[name] = {"ready": False, "error": str(err)}
+            if components[name].get("ready") is False:
+                reasons.append(f"{name} not ready")
+
+        report = {
+            "status": "ready" if not reasons else "not_ready",
+            "reasons": reasons,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "database": probe if self.router is not None else None,
+            "scheduler": {"lag_ms": self.scheduler_lag_ms, "probe_interval_s": self.interval},
+            "components": components,
+        }
+        return not reasons, report
+
+    def init_app(self, app):
+        @app.before_request
+        def _start_probe():
+            if self._thread is None:
+                self.start()
+
+        @app.route("/api/health/live")
+        def health_live():
+            return jsonify({"status": "alive"})
+
+        @app.route("/api/health/ready")
+        def health_ready():
+            ready, report = self.readiness()
+            return jsonify(report), 200 if ready else 503
+
+        @app.route("/api/health")
+        def health_check():
+            """Existing probe URL; answers like /api/health/ready"""
+            return health_ready()
+
+        return self
+
+
+# --- Component reports ---
+def admission_report(admission):
+    """Concurrency slots in use per priority class (the request 'pool')"""
+    def report():
+        classes = admission.stats()["classes"]
+        return {
+            name: {"in_flight": c["in_flight"], "limit": c["limit"], "queued": c["queued"],
+                   "saturation": round(c["in_flight"] / c["limit"], 2) if c["limit"] else None}
+            for name, c in classes.items()
+        }
+    return report
+
+
+def breaker_report(router, stale_responses=None):
+    def report():
+        breaker = router.breaker.stats() if router.breaker is not None else {"state": "disabled"}
+        # Informational: an open breaker already shows up as a failed probe
+        result = dict(breaker, replicas=router.status())
+        if stale_responses is not None:
+            result["stale_responses"] = stale_responses.stats()
+        return result
+    return report
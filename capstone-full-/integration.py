@@ -0,0 +1,375 @@
+"""Run every route of the three apps against a seeded database, within budgets.
+
+    python integration.py [--days 120] [--time-factor 1.0] [--json]
+
+Seeds a fresh SQLite file (two sites, menu, recipes, inventory, stock
+ledger, `--days` of sales and waste, the closed months compacted into the
+sales archive), imports dashboard, sales_api and inventory against it and
+sends the requests in CHECKS, covering every route ("{item_id}" in a path
+is the id an earlier write of the same app answered with). Each check has
+a budget:
+
+    queries   SQL statements run (BEGIN/COMMIT/SAVEPOINT/PRAGMA not counted)
+    ksteps    thousands of SQLite VM instructions those statements ran
+              (progress handler): every row visited counts, whether a
+              full scan or an index range walked it
+    ms        wall time of the request, best of REPEATS for reads
+
+The run fails (exit status 1) when a check goes over any of its budgets,
+answers with another status than expected, or when a route has no check.
+test_integration.py runs it in a subprocess, as the apps read their
+configuration at import. INTEGRATION_TIME_FACTOR (or --time-factor) scales
+the time budgets for slow machines.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+APPS = ("dashboard", "sales_api", "inventory")
+REPEATS = 3
+TIME_FACTOR = float(os.getenv("INTEGRATION_TIME_FACTOR", 1))
+PROFILER_TOKEN = "integration"
+COUNTED = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+EXEMPT_ENDPOINTS = ("static",)  # Flask's own static folder; the apps serve files through static_cache
+
+Budget = namedtuple("Budget", "queries ksteps ms")
+Check = namedtuple("Check", "method path budget body status headers", defaults=(None, 200, None))
+
+ADMIN = {"X-Admin-Token": PROFILER_TOKEN}
+TODAY = date.today()
+
+
+def _days(count):
+    return (TODAY - timedelta(days=count)).isoformat()
+
+
+# Reads first, then writes, then the profiler (its sampling slows whatever runs next).
+# ksteps budgets are about twice the seeded run's: the live/archived split of
+# sales moves with the date
+CHECKS = {
+    "dashboard": [
+        Check("GET", "/dashboard", Budget(1, 500, 150)),
+        Check("GET", "/api/dashboard/bootstrap", Budget(6, 400, 150)),
+        Check("GET", "/api/sales", Budget(1, 400, 100)),
+        Check("GET", "/sites/2/api/sales", Budget(2, 300, 100)),
+        Check("GET", f"/api/sales/series?from={_days(90)}&bucket=day", Budget(1, 300, 100)),
+        Check("GET", "/api/sales_summary", Budget(2, 1, 50)),
+        Check("GET", "/api/menu_performance", Budget(2, 1, 50)),
+        Check("GET", "/api/demand_forecast", Budget(1, 75, 100)),
+        Check("GET", "/api/predicted_demand", Budget(0, 0, 50)),
+        Check("GET", "/api/inventory", Budget(1, 2, 50)),
+        Check("GET", "/api/expiry_alerts", Budget(1, 1, 50)),
+        Check("GET", "/api/suggestions", Budget(0, 0, 50)),
+        Check("GET", "/api/sales/ingest/stats", Budget(0, 0, 50)),
+        Check("GET", "/api/admission/stats", Budget(0, 0, 50)),
+        Check("GET", "/api/health", Budget(0, 0, 50)),
+        Check("GET", "/api/health/live", Budget(0, 0, 50)),
+        Check("GET", "/api/health/ready", Budget(0, 0, 50)),
+        Check("GET", "/sites/9/api/sales", Budget(0, 0, 50), status=404),
+        Check("POST", "/api/sales", Budget(9, 1, 100), body={"dish": "Latte", "qty": 2, "date": TODAY.isoformat()}),
+        Check("POST", "/sites/2/api/sales", Budget(9, 1, 100),
+              body={"dish": "Pancake", "qty": 1, "date": TODAY.isoformat()}),
+        Check("POST", "/api/sales", Budget(0, 0, 50), body={"dish": "", "qty": 0}, status=400),
+    ],
+    "sales_api": [
+        Check("GET", "/", Budget(0, 0, 50)),
+        Check("GET", "/assets/dashboard.css", Budget(0, 0, 50)),
+        Check("GET", "/api/sales", Budget(5, 25, 100)),
+        Check("GET", "/api/sales/overview", Budget(1, 40, 100)),
+        Check("GET", f"/api/sales/series?from={_days(180)}&bucket=week", Budget(1, 400, 150)),
+        Check("GET", "/api/sales/categories/Coffee", Budget(5, 1, 100)),
+        Check("GET", "/api/sales/categories/Unknown", Budget(1, 1, 50), status=404),
+        Check("GET", f"/api/sales/rollup?from={_days(60)}", Budget(3, 500, 200)),
+        Check("GET", "/api/sales/realtime", Budget(0, 0, 50)),
+        Check("GET", "/api/sales/export", Budget(0, 0, 50)),
+        Check("GET", "/api/admission/stats", Budget(0, 0, 50)),
+        Check("GET", "/api/health", Budget(0, 0, 50)),
+        Check("GET", "/api/health/live", Budget(0, 0, 50)),
+        Check("GET", "/api/health/ready", Budget(0, 0, 50)),
+    ],
+    "inventory": [
+        Check("GET", "/inventory", Budget(0, 0, 50)),
+        Check("GET", "/assets/inventory.js", Budget(0, 0, 50)),
+        Check("GET", "/api/inventory", Budget(1, 2, 50)),
+        Check("GET", "/sites/2/api/inventory", Budget(2, 2, 50)),
+        Check("GET", "/api/inventory/1/movements", Budget(2, 1, 50)),
+        Check("GET", f"/api/inventory/stock-at?at={_days(10)}", Budget(2, 5, 100)),
+        Check("GET", "/api/inventory/low-stock", Budget(4, 400, 150)),
+        Check("GET", "/api/inventory/purchase-order/draft", Budget(3, 400, 150)),
+        Check("GET", "/api/admission/stats", Budget(0, 0, 50)),
+        Check("GET", "/api/health", Budget(0, 0, 50)),
+        Check("GET", "/api/health/live", Budget(0, 0, 50)),
+        Check("GET", "/api/health/ready", Budget(0, 0, 50)),
+        Check("POST", "/api/inventory", Budget(1, 1, 50), body={"item_name": "Oat Milk", "capacity": 12}, status=201),
+        Check("PUT", "/api/inventory/2", Budget(2, 1, 50), body={"capacity": 25}),
+        Check("POST", "/api/inventory/restock", Budget(3, 1, 50), body={"item_id": 2, "quantity": 5}),
+        Check("POST", "/sites/2/api/inventory/restock", Budget(1, 1, 50), body={"item_id": 2, "quantity": 5},
+              status=404),
+        Check("POST", "/api/inventory/waste", Budget(4, 1, 50), body={"item_id": 3, "quantity": 1, "reason": "spilt"},
+              status=201),
+        Check("POST", "/api/inventory/batch", Budget(6, 1, 100), body={"operations": [
+            {"op": "restock", "item_id": 4, "quantity": 3},
+            {"op": "restock", "item_id": 5, "quantity": 3},
+            {"op": "update", "item_id": 6, "capacity": 30},
+        ]}),
+        Check("POST", "/api/inventory/7/disable", Budget(1, 1, 50)),
+        Check("POST", "/api/inventory/7/enable", Budget(1, 1, 50)),
+        # The ingredient added above; each child table's foreign key check traces as one more statement
+        Check("DELETE", "/api/inventory/{item_id}", Budget(4, 1, 50)),
+        Check("POST", "/api/admin/profiler/start", Budget(0, 0, 50), body={"requests": 1}, status=202, headers=ADMIN),
+        Check("GET", "/api/admin/profiler", Budget(0, 0, 50), headers=ADMIN),
+        Check("POST", "/api/admin/profiler/stop", Budget(0, 0, 50), headers=ADMIN),
+        Check("GET", "/api/admin/profiler/result", Budget(0, 0, 50), headers=ADMIN),
+    ],
+}
+# The profiler routes are the same in all three apps; one app is enough
+CHECKS_SHARED = {("dashboard", "/api/admin/profiler"), ("sales_api", "/api/admin/profiler")}
+
+
+# --- Seed data ---
+CATEGORIES = {"Coffee": ["Latte", "Cappuccino", "Mocha"], "Breakfast": ["Pancake", "PBJ"],
+              "Lunch": ["Club Sandwich", "Soup", "Salad"]}
+INGREDIENTS = ["Milk", "Espresso Beans", "Cocoa", "Flour", "Eggs", "Bread", "Peanut Butter", "Jam",
+               "Chicken", "Lettuce", "Tomato", "Stock"]
+
+
+def seed(conn, dialect, archive, days=120, rng=None):
+    """Fill an empty schema with `days` of activity at two sites; returns row counts"""
+    import category_stats
+    import stock_ledger
+    from stock_ledger import Movement
+
+    rng = rng or random.Random(47)
+    dialect.execute(conn, "INSERT INTO sites (site_id, name) VALUES (2, 'Harbour')")
+    menu = []
+    for category, items in CATEGORIES.items():
+        _, category_id = dialect.execute(conn, "INSERT INTO menu_categories (category_name) VALUES (%s)", (category,))
+        for name in items:
+            price = round(rng.uniform(3, 12), 2)
+            _, item_id = dialect.execute(conn, """
+                INSERT INTO menu_items (item_name, category_id, color_code, price) VALUES (%s, %s, %s, %s)
+            """, (name, category_id, f"#{rng.randrange(0x1000000):06x}", price))
+            menu.append((item_id, name, price))
+
+    stock = {}
+    for site_id in (1, 2):
+        for name in INGREDIENTS:
+            capacity = float(rng.choice((20, 50, 100)))
+            _, item_id = dialect.execute(conn, """
+                INSERT INTO inventory (site_id, item_name, stock_level, capacity, category, unit_cost,
+                                       expiry_date, lead_time_days)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, (site_id, name, round(capacity * rng.uniform(0.1, 0.9), 1), capacity,
+                  rng.choice(("perishable", "semi-perishable")), round(rng.uniform(0.5, 8), 2),
+                  (TODAY + timedelta(days=rng.randint(-2, 40))).isoformat(), rng.choice((1, 2, 3))))
+            stock.setdefault(site_id, []).append(item_id)
+        for menu_id, _, _ in menu:
+            for item_id in rng.sample(stock[site_id], 2):
+                dialect.execute(conn, "INSERT INTO menu_inventory (menu_id, item_id, quantity_used) VALUES (%s, %s, %s)",
+                                (menu_id, item_id, round(rng.uniform(0.05, 0.5), 2)))
+
+    sales, waste = [], []
+    for age in range(days, -1, -1):
+        day = TODAY - timedelta(days=age)
+        for site_id in (1, 2):
+            for _ in range(rng.randint(40, 80)):
+                item_id, name, price = rng.choice(menu)
+                at = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(6 * 60, 22 * 60))
+                sales.append((site_id, item_id, name, rng.randint(1, 4), price, at.strftime("%Y-%m-%d %H:%M:%S")))
+            if rng.random() < 0.3:
+                waste.append((site_id, rng.choice(stock[site_id]), rng.randint(1, 3), "expired",
+                              f"{day.isoformat()} 21:00:00"))
+        if day.weekday() == 0:
+            at = datetime.combine(day, datetime.min.time()) + timedelta(hours=7)
+            stock_ledger.record_only(conn, dialect, [Movement(item_id, "restock", rng.randint(5, 20), "weekly delivery")
+                                                     for item_id in stock[1] + stock[2]], at=at)
+    dialect.executemany(conn, """
+        INSERT INTO sales (site_id, item_id, item_name, quantity, price, sale_date) VALUES (%s, %s, %s, %s, %s, %s)
+    """, sales)
+    dialect.executemany(conn, """
+        INSERT INTO waste (site_id, item_id, quantity, reason, date_logged) VALUES (%s, %s, %s, %s, %s)
+    """, waste)
+    stock_ledger.snapshot(conn, dialect, datetime.combine(TODAY - timedelta(days=30), datetime.min.time()))
+    conn.commit()
+
+    archive.compact(conn, dialect, today=TODAY)
+    category_stats.rebuild(conn, dialect, archive)
+    conn.commit()
+    return {"sales": len(sales), "waste": len(waste), "menu_items": len(menu), "inventory": sum(map(len, stock.values()))}
+
+
+# --- Measuring ---
+class QueryRecorder:
+    """Collects the statements run, and the VM steps spent, on every SQLite connection while active"""
+
+    def __init__(self, steps_per_tick):
+        self.steps_per_tick = steps_per_tick  # VM instructions between tick() calls
+        self.statements = []
+        self.ticks = 0
+        self.active = False
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        conn.set_trace_callback(self._trace)
+
+    def _trace(self, statement):
+        if not self.active:
+            return
+        words = statement.lstrip().split(None, 1)
+        if words and words[0].upper() in COUNTED:
+            with self._lock:
+                self.statements.append(statement)
+
+    def tick(self):
+        if self.active:
+            with self._lock:
+                self.ticks += 1
+
+    def start(self):
+        with self._lock:
+            self.statements = []
+            self.ticks = 0
+        self.active = True
+
+    def stop(self):
+        """(statements, thousands of VM steps) since start()"""
+        self.active = False
+        with self._lock:
+            return list(self.statements), self.ticks * self.steps_per_tick // 1000
+
+
+def _measure(client, recorder, check, path):
+    recorder.start()
+    started = time.perf_counter()
+    response = client.open(path, method=check.method, json=check.body, headers=check.headers)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    statements, ksteps = recorder.stop()
+    return response.status_code, response.get_json(silent=True), len(statements), ksteps, elapsed_ms
+
+
+def run_checks(name, app, recorder, time_factor=TIME_FACTOR):
+    """Results of CHECKS[name] against app, plus the routes no check reaches"""
+    adapter = app.url_map.bind("localhost")
+    covered = set()
+    results = []
+    created = {}  # ids answered by earlier writes, for "{item_id}" in later paths
+    client = app.test_client()
+    for check in CHECKS[name]:
+        full_path = check.path.format_map(created)
+        path = full_path.split("?")[0]
+        if path.startswith("/sites/"):
+            path = "/" + path.split("/", 3)[3]
+        endpoint, _ = adapter.match(path, method=check.method)
+        covered.add((endpoint, check.method))
+
+        runs = [_measure(client, recorder, check, full_path)]
+        if check.method == "GET" and runs[0][0] == check.status:
+            runs += [_measure(client, recorder, check, full_path) for _ in range(REPEATS - 1)]
+        status, body = runs[0][:2]
+        if check.method != "GET" and isinstance(body, dict):
+            created.update((key, value) for key, value in body.items() if key.endswith("_id"))
+        queries = max(r[2] for r in runs)
+        ksteps = max(r[3] for r in runs)
+        ms = min(r[4] for r in runs)
+
+        failures = []
+        if status != check.status:
+            failures.append(f"status {status}, expected {check.status}")
+        if queries > check.budget.queries:
+            failures.append(f"{queries} queries > {check.budget.queries}")
+        if ksteps > check.budget.ksteps:
+            failures.append(f"{ksteps}k VM steps > {check.budget.ksteps}k")
+        if ms > check.budget.ms * time_factor:
+            failures.append(f"{ms:.1f} ms > {check.budget.ms * time_factor:.0f}")
+        results.append({"app": name, "method": check.method, "path": check.path, "status": status,
+                        "queries": queries, "ksteps": ksteps, "ms": round(ms, 2),
+                        "budget": check.budget._asdict(), "failures": failures})
+
+    uncovered = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint in EXEMPT_ENDPOINTS:
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (rule.endpoint, method) in covered:
+                continue
+            if rule.rule.startswith("/api/admin/profiler") and (name, "/api/admin/profiler") in CHECKS_SHARED:
+                continue
+            uncovered.append(f"{name}: {method} {rule.rule}")
+    return results, uncovered
+
+
+def run(days=120, time_factor=TIME_FACTOR, workdir=None):
+    """Seed a database in workdir (a temporary one by default), import the apps and run every check"""
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = workdir or tmp
+        db_path = os.path.join(workdir, "integration.db")
+        os.environ.update({
+            "DB_BACKEND": "sqlite",
+            "DB_PATH": db_path,
+            "DB_REPLICA_PATHS": "",
+            "SITE_DB_PATHS": "",
+            "SALES_ARCHIVE_DIR": os.path.join(workdir, "archive"),
+            "SHARED_CACHE_PATH": "",
+            "SALES_BUFFERED_INGEST": "0",
+            "HEALTH_PROBE_INTERVAL": "3600",
+            "PROFILER_TOKEN": PROFILER_TOKEN,
+        })
+        import storage
+        from sales_archive import archive
+
+        dialect = storage.get_dialect("sqlite")
+        conn = storage.connect_sqlite(db_path, reuse=False)
+        storage.init_sqlite_schema(conn)
+        seeded = seed(conn, dialect, archive, days)
+        conn.close()
+
+        recorder = QueryRecorder(storage.PROGRESS_STEPS)
+        storage.on_connect(recorder.attach)
+        storage.on_progress(recorder.tick)
+        results, uncovered = [], []
+        for name in APPS:
+            module = importlib.import_module(name)
+            client = module.app.test_client()
+            client.get("/api/health/live")  # starts the health probe thread
+            deadline = time.monotonic() + 5
+            while module.health.probe["checked_at"] is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            app_results, app_uncovered = run_checks(name, module.app, recorder, time_factor)
+            results += app_results
+            uncovered += app_uncovered
+    return {"seeded": seeded, "results": results, "uncovered": uncovered,
+            "failed": sum(bool(r["failures"]) for r in results) + len(uncovered)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--time-factor", type=float, default=TIME_FACTOR)
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.days, args.time_factor)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"seeded {report['seeded']}")
+        print(f"{'':4} {'route':58} {'status':>6} {'queries':>9} {'ksteps':>11} {'ms':>14}")
+        for r in report["results"]:
+            budget = r["budget"]
+            print(f"{'FAIL' if r['failures'] else 'ok':4} {r['app'] + ' ' + r['method'] + ' ' + r['path']:58.58} "
+                  f"{r['status']:>6} {r['queries']:>4}/{budget['queries']:<4} {r['ksteps']:>5}/{budget['ksteps']:<5} "
+                  f"{r['ms']:>6.1f}/{budget['ms'] * args.time_factor:<6.0f}")
+            for failure in r["failures"]:
+                print(f"       {failure}")
+        for route in report["uncovered"]:
+            print(f"FAIL {route} has no check")
+        print(f"{report['failed']} failed")
+    sys.exit(1 if report["failed"] else 0)
@@ -54,6 +54,7 @@ async function loadIngredientsDropdown(selectId) {
       option.dataset.capacity = item.capacity;
       option.dataset.category = item.category || '';
       option.dataset.status = item.status || 'active';
+      option.dataset.version = item.version;
       select.appendChild(option);
     });
   } catch (err) {
@@ -180,13 +181,23 @@ document.getElementById('editForm').addEventListener('submit', async (e) => {
   const stock_level = parseFloat(document.getElementById('currentStock').value);
   const capacity = parseFloat(document.getElementById('requiredStock').value);
   const category = document.getElementById('category').value;
+  const select = document.getElementById('editIngredient');
+  const version = parseInt(select.options[select.selectedIndex].dataset.version, 10);
 
   try {
     const res = await fetch(`http://127.0.0.1:5000/api/inventory/${ingredientId}`, {
       method: 'PUT',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ stock_level, capacity, category })
+      body: JSON.stringify({ stock_level, capacity, category, version })
     });
+    if (res.status === 409) {
+      // Someone else saved this item first; reload their values instead of overwriting them
+      alert('This ingredient was changed on another device. The latest values have been loaded.');
+      await loadIngredientsDropdown('editIngredient');
+      select.value = ingredientId;
+      select.dispatchEvent(new Event('change'));
+      return;
+    }
     if (!res.ok) throw new Error('Failed to update');
     
     alert('Ingredient updated successfully! ✅');
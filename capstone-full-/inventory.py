@@ -1,28 +1,79 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, jsonify, request
 from flask_cors import CORS
-import mysql.connector
 from datetime import datetime
 
+import json_provider
+import sites
+import stock_ledger
+import storage
+from admission import AdmissionController
+from circuit_breaker import StaleResponses
+from health import HealthMonitor, admission_report, breaker_report
+from inventory_batch import BatchError, BatchFailed, VersionConflict, WriteContention, apply_batch, update_item
+from profiler import SamplingProfiler
+from replenishment import DEFAULT_REVIEW_DAYS, DEFAULT_SERVICE_LEVEL, DEFAULT_WINDOW_DAYS, draft_purchase_order
+from shared_cache import SharedCache
+from static_cache import create_static_cache
+from stock_ledger import Movement
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend requests
+json_provider.init_app(app)  # Decimal/date-aware jsonify, orjson when installed
+static_cache = create_static_cache(app)  # pages and assets served from memory
+# Restocks and edits are critical by default; planning reports are analytics
+admission = AdmissionController().init_app(app, classes={
+    "/api/inventory/purchase-order/draft": "analytics",
+    "/api/inventory/stock-at": "analytics",
+}, route_limits={"/api/inventory/purchase-order/draft": 1})
 
 # --- MySQL Connection ---
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="gastrotrack"
-    )
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",
+    "database": "gastrotrack"
+}
+# MySQL by default; DB_BACKEND=sqlite runs on the embedded DB_PATH file
+DB_BACKEND = storage.get_backend()
+dialect = storage.get_dialect(DB_BACKEND)
+# GET routes read from DB_REPLICA_HOSTS / DB_REPLICA_PATHS when set; writes go to the primary
+db_router = storage.create_router(DB_BACKEND, DB_CONFIG).init_app(app)
+stale_responses = None
+if db_router.breaker is not None:
+    # While the DB is down: GETs replay their last good response, writes fail fast
+    stale_responses = StaleResponses(db_router.breaker).init_app(app)
+# Liveness/readiness answered from a background DB probe (see health.py)
+health = HealthMonitor(db_router).init_app(app)
+health.add_component("admission", admission_report(admission))
+health.add_component("breaker", breaker_report(db_router, stale_responses))
+health.add_component("static_cache", static_cache.stats)
+# Admin-only sampling profiler (PROFILER_TOKEN); a no-op until started
+profiler = SamplingProfiler().init_app(app)
+# Every route is also served per location under /sites/<id>/ (see sites.py)
+site_router = sites.create_site_router(DB_BACKEND, DB_CONFIG, db_router).init_app(app)
+# Planning aggregates shared by all workers on the host (SHARED_CACHE_PATH)
+shared_cache = SharedCache().init_app(app, write_tags=lambda: sites.tags("inventory"))
+health.add_component("shared_cache", shared_cache.stats)
+
+def get_db_connection(readonly=None):
+    return site_router.connect(readonly)
+
+
+def owned_by_site(conn, item_id):
+    """Whether item_id is an ingredient of the current site"""
+    condition, params = sites.site_filter()
+    return bool(dialect.fetchall(conn, f"SELECT 1 AS found FROM inventory WHERE item_id = %s AND {condition}",
+                                 (item_id,) + params))
 
 # --- Fetch All Inventory (Active & Disabled) ---
 @app.route("/api/inventory", methods=["GET"])
 def get_inventory():
     """Return all inventory data as JSON with stock levels and status"""
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = dialect.cursor(conn)
+    condition, params = sites.site_filter()
 
-    query = """
+    query = f"""
         SELECT 
             item_id, 
             item_name, 
@@ -31,28 +82,21 @@ def get_inventory():
             COALESCE(category, 'perishable') AS category,
             COALESCE(status, 'active') AS status,
             unit_cost,
+            version,
             expiry_date,
             created_at,
-            updated_at
+            updated_at,
+            CASE WHEN capacity > 0 THEN ROUND(stock_level * 100.0 / capacity, 2) ELSE 0 END AS stock_percent
         FROM inventory
+        WHERE {condition}
         ORDER BY status ASC, item_name ASC
     """
-    cursor.execute(query)
+    cursor.execute(dialect.sql(query), params)
     items = cursor.fetchall()
 
     cursor.close()
     conn.close()
 
-    # Compute stock percentage for frontend
-    for item in items:
-        capacity = float(item.get("capacity", 0))
-        stock = float(item.get("stock_level", 0))
-        item["stock_percent"] = round((stock / capacity) * 100, 2) if capacity > 0 else 0
-        
-        # Format dates if present
-        if item.get("expiry_date"):
-            item["expiry_date"] = item["expiry_date"].strftime("%Y-%m-%d")
-
     return jsonify(items)
 
 
@@ -70,12 +114,13 @@ def add_ingredient():
 
     query = """
         INSERT INTO inventory 
-        (item_name, stock_level, capacity, category, unit_cost, status)
-        VALUES (%s, %s, %s, %s, %s, 'active')
+        (site_id, item_name, stock_level, capacity, category, unit_cost, status)
+        VALUES (%s, %s, %s, %s, %s, %s, 'active')
     """
     
     try:
-        cursor.execute(query, (
+        cursor.execute(dialect.sql(query), (
+            sites.current(),
             data["item_name"],
             data.get("stock_level", 0),
             data.get("capacity", 0),
@@ -93,7 +138,7 @@ def add_ingredient():
             "item_id": new_id
         }), 201
         
-    except mysql.connector.Error as err:
+    except storage.DB_ERRORS as err:
         cursor.close()
         conn.close()
         return jsonify({"error": str(err)}), 500
@@ -102,39 +147,39 @@ def add_ingredient():
 # --- Update Ingredient ---
 @app.route("/api/inventory/<int:item_id>", methods=["PUT"])
 def update_ingredient(item_id):
-    """Update an existing ingredient"""
+    """
+    Update an existing ingredient. Send the `version` from GET /api/inventory
+    (or an If-Match header); if the row changed since, nothing is written and
+    409 comes back with the current row. Without a version the last write
+    wins and never gets a 409.
+    """
     data = request.json
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    version = data.get("version", request.headers.get("If-Match"))
+    try:
+        version = int(str(version).strip('"')) if version is not None else None
+    except ValueError:
+        return jsonify({"error": "version must be a number"}), 400
 
-    query = """
-        UPDATE inventory 
-        SET stock_level = %s, 
-            capacity = %s, 
-            category = %s,
-            updated_at = NOW()
-        WHERE item_id = %s
-    """
-    
+    conn = get_db_connection()
     try:
-        cursor.execute(query, (
-            data.get("stock_level"),
-            data.get("capacity"),
-            data.get("category"),
-            item_id
-        ))
+        new_version = update_item(conn, dialect, item_id, data, version, site_id=sites.current())
+        if new_version is None:
+            return jsonify({"error": "Ingredient not found"}), 404
         conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({"message": "Ingredient updated successfully"})
-        
-    except mysql.connector.Error as err:
-        cursor.close()
-        conn.close()
+        return jsonify({"message": "Ingredient updated successfully", "version": new_version})
+
+    except VersionConflict as conflict:
+        conn.rollback()
+        return jsonify({"error": str(conflict), "current": conflict.current}), 409
+    except WriteContention as err:
+        # Only versioned edits conflict; a blind one just comes back later
+        conn.rollback()
+        return jsonify({"error": str(err)}), 503, {"Retry-After": "1"}
+    except storage.DB_ERRORS as err:
+        conn.rollback()
         return jsonify({"error": str(err)}), 500
+    finally:
+        conn.close()
 
 
 # --- Log Restock ---
@@ -147,29 +192,117 @@ def log_restock():
         return jsonify({"error": "item_id and quantity are required"}), 400
     
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Update stock level by adding the restocked quantity
-    query = """
-        UPDATE inventory 
-        SET stock_level = stock_level + %s,
-            updated_at = NOW()
-        WHERE item_id = %s
-    """
-    
     try:
-        cursor.execute(query, (data["quantity"], data["item_id"]))
+        if not owned_by_site(conn, data["item_id"]):
+            return jsonify({"error": "Ingredient not found"}), 404
+        stock_ledger.record(conn, dialect, [
+            Movement(data["item_id"], "restock", data["quantity"], data.get("note"))
+        ])
         conn.commit()
-        
-        cursor.close()
-        conn.close()
-        
         return jsonify({"message": "Restock logged successfully"})
         
-    except mysql.connector.Error as err:
-        cursor.close()
+    except storage.DB_ERRORS as err:
+        conn.rollback()
+        return jsonify({"error": str(err)}), 500
+    finally:
         conn.close()
+
+
+# --- Log Waste ---
+@app.route("/api/inventory/waste", methods=["POST"])
+def log_waste():
+    """Log wasted stock and take it off the stock level"""
+    data = request.json or {}
+
+    if not data.get("item_id") or not data.get("quantity"):
+        return jsonify({"error": "item_id and quantity are required"}), 400
+
+    conn = get_db_connection()
+    try:
+        if not owned_by_site(conn, data["item_id"]):
+            return jsonify({"error": "Ingredient not found"}), 404
+        dialect.execute(conn, f"""
+            INSERT INTO waste (site_id, item_id, quantity, reason, date_logged)
+            VALUES (%s, %s, %s, %s, {dialect.now()})
+        """, (sites.current(), data["item_id"], data["quantity"], data.get("reason")))
+        stock_ledger.record(conn, dialect, [
+            Movement(data["item_id"], "waste", -float(data["quantity"]), data.get("reason"))
+        ])
+        conn.commit()
+        return jsonify({"message": "Waste logged successfully"}), 201
+
+    except storage.DB_ERRORS as err:
+        conn.rollback()
         return jsonify({"error": str(err)}), 500
+    finally:
+        conn.close()
+
+
+# --- Stock History ---
+@app.route("/api/inventory/<int:item_id>/movements", methods=["GET"])
+def get_movements(item_id):
+    """Latest ledger entries for one ingredient"""
+    limit = min(request.args.get("limit", 100, type=int), 1000)
+    conn = get_db_connection()
+    try:
+        if not owned_by_site(conn, item_id):
+            return jsonify({"error": "Ingredient not found"}), 404
+        movements = stock_ledger.history(conn, dialect, item_id, limit)
+    finally:
+        conn.close()
+    return jsonify(movements)
+
+
+@app.route("/api/inventory/stock-at", methods=["GET"])
+def get_stock_at():
+    """Stock levels as of ?at=YYYY-MM-DD[ HH:MM:SS] (optionally one ?item_id)"""
+    try:
+        at = datetime.fromisoformat(request.args["at"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "at must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"}), 400
+    if len(request.args["at"]) == 10:
+        at = at.replace(hour=23, minute=59, second=59)  # a bare date means end of that day
+
+    conn = get_db_connection()
+    try:
+        levels = stock_ledger.stock_at(conn, dialect, at, request.args.get("item_id", type=int),
+                                       site_id=sites.current())
+    finally:
+        conn.close()
+    return jsonify({"at": at.strftime(stock_ledger.TIMESTAMP_FORMAT),
+                    "stock": [{"item_id": item, "stock_level": level} for item, level in sorted(levels.items())]})
+
+
+# --- Batch Mutations ---
+@app.route("/api/inventory/batch", methods=["POST"])
+def batch_mutate():
+    """
+    Apply a list of restock/update/enable/disable/delete operations in one
+    transaction (see inventory_batch.py). "mode": "atomic" (default) or
+    "best_effort".
+    """
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode", "atomic")
+    if mode not in ("atomic", "best_effort"):
+        return jsonify({"error": "mode must be atomic or best_effort"}), 400
+
+    conn = get_db_connection(readonly=False)
+    try:
+        results, applied = apply_batch(conn, dialect, data.get("operations"), atomic=mode == "atomic",
+                                       db_errors=storage.DB_ERRORS, site_id=sites.current())
+    except BatchError as err:
+        return jsonify({"error": str(err)}), 400
+    except BatchFailed as err:
+        status = 409 if err.conflict else 500
+        return jsonify({"error": str(err), "mode": mode, "applied": 0, "results": err.results}), status
+    finally:
+        conn.close()
+
+    failed = len(results) - applied
+    body = {"mode": mode, "applied": applied, "failed": failed, "results": results}
+    if mode == "atomic" and failed:
+        return jsonify(body), 400
+    return jsonify(body)
 
 
 # --- Disable Ingredient ---
@@ -179,15 +312,15 @@ def disable_ingredient(item_id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = """
+    query = f"""
         UPDATE inventory 
         SET status = 'disabled',
-            updated_at = NOW()
-        WHERE item_id = %s
+            updated_at = {dialect.now()}
+        WHERE item_id = %s AND site_id = %s
     """
     
     try:
-        cursor.execute(query, (item_id,))
+        cursor.execute(dialect.sql(query), (item_id, sites.current()))
         conn.commit()
         
         cursor.close()
@@ -195,7 +328,7 @@ def disable_ingredient(item_id):
         
         return jsonify({"message": "Ingredient disabled successfully"})
         
-    except mysql.connector.Error as err:
+    except storage.DB_ERRORS as err:
         cursor.close()
         conn.close()
         return jsonify({"error": str(err)}), 500
@@ -208,15 +341,15 @@ def enable_ingredient(item_id):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = """
+    query = f"""
         UPDATE inventory 
         SET status = 'active',
-            updated_at = NOW()
-        WHERE item_id = %s
+            updated_at = {dialect.now()}
+        WHERE item_id = %s AND site_id = %s
     """
     
     try:
-        cursor.execute(query, (item_id,))
+        cursor.execute(dialect.sql(query), (item_id, sites.current()))
         conn.commit()
         
         cursor.close()
@@ -224,7 +357,7 @@ def enable_ingredient(item_id):
         
         return jsonify({"message": "Ingredient re-enabled successfully"})
         
-    except mysql.connector.Error as err:
+    except storage.DB_ERRORS as err:
         cursor.close()
         conn.close()
         return jsonify({"error": str(err)}), 500
@@ -233,14 +366,14 @@ def enable_ingredient(item_id):
 # --- Permanently Delete Ingredient ---
 @app.route("/api/inventory/<int:item_id>", methods=["DELETE"])
 def delete_ingredient(item_id):
-    """Permanently delete an ingredient from database"""
+    """Permanently delete an ingredient that has no stock history"""
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = "DELETE FROM inventory WHERE item_id = %s"
+    query = "DELETE FROM inventory WHERE item_id = %s AND site_id = %s"
     
     try:
-        cursor.execute(query, (item_id,))
+        cursor.execute(dialect.sql(query), (item_id, sites.current()))
         conn.commit()
         
         if cursor.rowcount == 0:
@@ -253,7 +386,14 @@ def delete_ingredient(item_id):
         
         return jsonify({"message": "Ingredient permanently deleted"})
         
-    except mysql.connector.Error as err:
+    except storage.INTEGRITY_ERRORS:
+        # The stock ledger keeps its history (ON DELETE RESTRICT)
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return jsonify({"error": "Ingredient has stock history; disable it instead"}), 409
+
+    except storage.DB_ERRORS as err:
         cursor.close()
         conn.close()
         return jsonify({"error": str(err)}), 500
@@ -262,54 +402,82 @@ def delete_ingredient(item_id):
 # --- Get Low Stock Items ---
 @app.route("/api/inventory/low-stock", methods=["GET"])
 def get_low_stock():
-    """Get items with stock level below 30% capacity"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    query = """
-        SELECT 
-            item_id, 
-            item_name, 
-            stock_level,
-            capacity,
-            category,
-            ROUND((stock_level / capacity) * 100, 2) AS stock_percent
-        FROM inventory
-        WHERE status = 'active'
-          AND capacity > 0
-          AND (stock_level / capacity) < 0.3
-        ORDER BY stock_percent ASC
     """
-    
-    cursor.execute(query)
-    items = cursor.fetchall()
+    Get items at or below their reorder point. Items without usage history
+    fall back to the old rule: stock level below 30% capacity.
+    """
+    conn = get_db_connection()
+    condition, params = sites.site_filter()
+    try:
+        plan = draft_purchase_order(conn, dialect, site_id=sites.current())
+        items = dialect.fetchall(conn, f"""
+            SELECT 
+                item_id, 
+                item_name, 
+                stock_level,
+                capacity,
+                category,
+                ROUND((stock_level / capacity) * 100, 2) AS stock_percent
+            FROM inventory
+            WHERE {condition}
+              AND status = 'active'
+              AND capacity > 0
+            ORDER BY stock_percent ASC
+        """, params)
+    finally:
+        conn.close()
 
-    cursor.close()
-    conn.close()
+    reorder = {line["item_id"]: line for line in plan["lines"]}
+    low = []
+    for item in items:
+        line = reorder.get(item["item_id"])
+        if line:
+            item["reorder_point"] = line["reorder_point"]
+            item["suggested_order"] = line["order_quantity"]
+            low.append(item)
+        elif item["item_id"] in plan["without_history"] and float(item["stock_percent"]) < 30:
+            low.append(item)
+    return jsonify(low)
+
+
+# --- Draft Purchase Order ---
+@app.route("/api/inventory/purchase-order/draft", methods=["GET"])
+def get_purchase_order_draft():
+    """Suggested restock quantities for every active SKU (see replenishment.py)"""
+    try:
+        window = int(request.args.get("window", DEFAULT_WINDOW_DAYS))
+        service_level = float(request.args.get("service_level", DEFAULT_SERVICE_LEVEL))
+        review_days = float(request.args.get("review_days", DEFAULT_REVIEW_DAYS))
+    except ValueError:
+        return jsonify({"error": "window, service_level and review_days must be numbers"}), 400
+    if not 1 <= window <= 365 or not 0.5 <= service_level < 1 or review_days < 0:
+        return jsonify({"error": "window must be 1-365 days, service_level in [0.5, 1)"}), 400
+
+    site_id = sites.current()
+
+    def load():
+        conn = get_db_connection(shared_cache.compute_readonly)  # cached plans come from the primary
+        try:
+            plan = draft_purchase_order(conn, dialect, window, site_id, service_level=service_level,
+                                        review_days=review_days)
+        finally:
+            conn.close()
+        plan.pop("without_history")
+        return plan
 
-    return jsonify(items)
+    try:
+        key = f"inventory:purchase-order:{site_id}:{window}:{service_level}:{review_days}"
+        plan = shared_cache.get_or_compute(key, load, tags=sites.tags("inventory", "sales"))
+    except storage.DB_ERRORS as err:
+        return jsonify({"error": str(err)}), 500
+    return jsonify(plan)
 
 
 # --- Frontend Route (Optional) ---
 @app.route("/inventory")
 def inventory_page():
-    """Render inventory management page"""
-    return render_template("inventory.html")
-
-
-# --- Health Check ---
-@app.route("/api/health", methods=["GET"])
-def health_check():
-    """Check if API and database connection are working"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-        conn.close()
-        return jsonify({"status": "healthy", "database": "connected"})
-    except Exception as e:
-        return jsonify({"status": "unhealthy", "error": str(e)}), 500
+    """Serve inventory management page"""
+    return static_cache.page("inventory.html")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+"""Inventory mutations: compare-and-set edits and batches.
+
+Absolute edits (`update_item`) are optimistic: the caller sends the row
+`version` it read and the UPDATE only matches if nobody wrote the row since,
+otherwise VersionConflict carries the current row. Relative stock changes
+(restocks) never need a version; see stock_ledger.
+
+A batch is a list of operations applied in order inside one transaction:
+
+    {"op": "restock", "item_id": 3, "quantity": 5, "note": "delivery 118"}
+    {"op": "update",  "item_id": 3, "stock_level": 8, "capacity": 10, "category": "perishable", "version": 4}
+    {"op": "enable" | "disable" | "delete", "item_id": 3}
+
+Consecutive operations of the same kind run as one statement group
+(executemany, or a single IN (...) statement), so restocking sixty items
+after a delivery is a handful of statements and one commit.
+
+With `atomic` the batch is all-or-nothing: any invalid operation rejects
+the whole batch before anything is written, and a database error rolls
+everything back. Otherwise (best effort) invalid operations are skipped
+and a failing group is retried one operation at a time behind savepoints,
+so only the operations that actually fail are left out.
+"""
+from itertools import groupby
+
+import stock_ledger
+from stock_ledger import Movement
+
+OPERATIONS = ("restock", "update", "enable", "disable", "delete")
+MAX_OPERATIONS = 1000
+
+
+class BatchError(Exception):
+    """The batch as a whole is malformed (not a list, too long)"""
+
+
+class BatchFailed(Exception):
+    """The batch hit a database error or a version conflict and was rolled back"""
+
+    def __init__(self, results, error):
+        super().__init__(str(error))
+        self.results = results
+        self.conflict = isinstance(error, VersionConflict)
+
+
+class WriteContention(Exception):
+    """An unversioned write lost the race for its row on every retry; nothing was written"""
+
+
+class VersionConflict(Exception):
+    """The row changed since the caller read `version`"""
+
+    def __init__(self, current):
+        super().__init__("Ingredient was changed by someone else; reload and retry")
+        self.current = current
+
+
+def update_item(conn, dialect, item_id, changes, version=None, retries=3, site_id=None):
+    """
+    Update capacity/category/stock_level of one item. With `version` the
+    write only happens if the row still has that version, else
+    VersionConflict. Without it the write is last-writer-wins and never
+    conflicts (WriteContention if it keeps losing races); such a write owns
+    its transaction, which is rolled back between retries. Returns the new
+    version, or None if the item doesn't exist (at `site_id`, if given).
+    """
+    only_site, site_params = ("AND site_id = %s", (site_id,)) if site_id is not None else ("", ())
+    level = changes.get("stock_level")
+    for _ in range(retries):
+        rows = dialect.fetchall(conn, f"""
+            SELECT item_id, stock_level, capacity, category, version FROM inventory WHERE item_id = %s {only_site}
+        """, (item_id,) + site_params)
+        if not rows:
+            return None
+        current = rows[0]
+        if version is not None and current["version"] != version:
+            raise VersionConflict(current)
+
+        # No row lock: both statements compare-and-set on the version just
+        # read. The ledger delta comes first and is computed from the row
+        # itself (as stock_ledger.set_levels does), so it is exactly the
+        # stock this write replaces, or nothing if the row moved on
+        if level is not None:
+            dialect.execute(conn, f"""
+                INSERT INTO stock_movements (item_id, kind, quantity, note, created_at)
+                SELECT item_id, 'adjust', %s - stock_level, %s, {dialect.now()}
+                FROM inventory
+                WHERE item_id = %s AND version = %s AND stock_level <> %s
+            """, (level, changes.get("note"), item_id, current["version"], level))
+        rowcount, _ = dialect.execute(conn, f"""
+            UPDATE inventory
+            SET stock_level = COALESCE(%s, stock_level),
+                capacity = COALESCE(%s, capacity),
+                category = COALESCE(%s, category),
+                version = version + 1,
+                updated_at = {dialect.now()}
+            WHERE item_id = %s AND version = %s
+        """, (level, changes.get("capacity"), changes.get("category"), item_id, current["version"]))
+        if rowcount:
+            return current["version"] + 1
+        if version is not None:
+            raise VersionConflict(dialect.fetchall(conn, """
+                SELECT item_id, stock_level, capacity, category, version FROM inventory WHERE item_id = %s
+            """, (item_id,))[0])
+        # An unconditional write lost a race. Roll back, so the re-read sees
+        # the committed row rather than this transaction's (REPEATABLE READ) snapshot
+        conn.rollback()
+    raise WriteContention(f"Ingredient {item_id} is being changed concurrently; please retry")
+
+
+def validate(operations, existing):
+    """Per-operation error message (None = valid); `existing` is the set of known item ids"""
+    errors = []
+    for op in operations:
+        if not isinstance(op, dict):
+            errors.append("operation must be an object")
+            continue
+        kind, item_id = op.get("op"), op.get("item_id")
+        if kind not in OPERATIONS:
+            errors.append(f"op must be one of {', '.join(OPERATIONS)}")
+        elif not isinstance(item_id, int):
+            errors.append("item_id is required")
+        elif item_id not in existing:
+            errors.append("Ingredient not found")
+        elif kind == "restock" and not _positive(op.get("quantity")):
+            errors.append("quantity must be a positive number")
+        elif kind == "update" and op.get("stock_level") is not None and not _positive(op["stock_level"], zero=True):
+            errors.append("stock_level must be a non-negative number")
+        else:
+            errors.append(None)
+    return errors
+
+
+def _positive(value, zero=False):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return False
+    return value >= 0 if zero else value > 0
+
+
+def _apply_group(conn, dialect, kind, ops):
+    """Run one run of same-kind operations as set-based statements"""
+    ids = [op["item_id"] for op in ops]
+    if kind == "restock":
+        stock_ledger.record(conn, dialect, [
+            Movement(op["item_id"], "restock", op["quantity"], op.get("note")) for op in ops
+        ])
+    elif kind == "update":
+        checked = [op for op in ops if op.get("version") is not None]
+        for op in checked:
+            update_item(conn, dialect, op["item_id"], op, op["version"])
+        blind = [op for op in ops if op.get("version") is None]
+        if blind:
+            dialect.executemany(conn, f"""
+                UPDATE inventory
+                SET capacity = COALESCE(%s, capacity),
+                    category = COALESCE(%s, category),
+                    version = version + 1,
+                    updated_at = {dialect.now()}
+                WHERE item_id = %s
+            """, [(op.get("capacity"), op.get("category"), op["item_id"]) for op in blind])
+            levels = [(op["item_id"], op["stock_level"], op.get("note")) for op in blind
+                      if op.get("stock_level") is not None]
+            if levels:
+                stock_ledger.set_levels(conn, dialect, levels)
+    else:
+        placeholders = ", ".join(["%s"] * len(ids))
+        if kind == "delete":
+            query = f"DELETE FROM inventory WHERE item_id IN ({placeholders})"
+            params = tuple(ids)
+        else:
+            query = (f"UPDATE inventory SET status = %s, version = version + 1, updated_at = {dialect.now()} "
+                     f"WHERE item_id IN ({placeholders})")
+            params = ("active" if kind == "enable" else "disabled",) + tuple(ids)
+        dialect.execute(conn, query, params)
+
+
+def apply_batch(conn, dialect, operations, atomic=True, db_errors=(Exception,), site_id=None):
+    """
+    Apply `operations` and commit. Returns (results, applied) where results
+    holds {"index", "op", "item_id", "status", "error"?} per operation.
+    With `site_id`, items of other sites count as not found.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("operations must be a non-empty list")
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f"at most {MAX_OPERATIONS} operations per batch")
+
+    ids = {op.get("item_id") for op in operations if isinstance(op, dict) and isinstance(op.get("item_id"), int)}
+    existing = set()
+    if ids:
+        placeholders = ", ".join(["%s"] * len(ids))
+        only_site, site_params = ("AND site_id = %s", (site_id,)) if site_id is not None else ("", ())
+        rows = dialect.fetchall(conn, f"SELECT item_id FROM inventory WHERE item_id IN ({placeholders}) {only_site}",
+                                tuple(ids) + site_params)
+        existing = {row["item_id"] for row in rows}
+
+    errors = validate(operations, existing)
+    results = [
+        {"index": i, "op": op.get("op") if isinstance(op, dict) else None,
+         "item_id": op.get("item_id") if isinstance(op, dict) else None, "status": "ok"}
+        for i, op in enumerate(operations)
+    ]
+    for result, error in zip(results, errors):
+        if error:
+            result.update(status="error", error=error)
+
+    if atomic and any(errors):
+        for result in results:
+            if result["status"] == "ok":
+                result["status"] = "not_applied"
+        return results, 0
+
+    valid = [(i, op) for i, op in enumerate(operations) if errors[i] is None]
+    db_errors = tuple(db_errors) + (VersionConflict,)
+    run = []
+    if not atomic and not conn.in_transaction:
+        # Savepoints must nest inside one transaction; releasing a savepoint
+        # that opened the transaction would commit it (SQLite)
+        dialect.execute(conn, "BEGIN")
+    try:
+        for kind, run in groupby(valid, key=lambda pair: pair[1]["op"]):
+            run = list(run)
+            if atomic:
+                _apply_group(conn, dialect, kind, [op for _, op in run])
+                continue
+            try:
+                dialect.execute(conn, "SAVEPOINT batch_group")
+                _apply_group(conn, dialect, kind, [op for _, op in run])
+                dialect.execute(conn, "RELEASE SAVEPOINT batch_group")
+            except db_errors:
+                # Find the culprits: retry the group one operation at a time
+                dialect.execute(conn, "ROLLBACK TO SAVEPOINT batch_group")
+                for i, op in run:
+                    try:
+                        dialect.execute(conn, "SAVEPOINT batch_op")
+                        _apply_group(conn, dialect, kind, [op])
+                        dialect.execute(conn, "RELEASE SAVEPOINT batch_op")
+                    except db_errors as err:
+                        dialect.execute(conn, "ROLLBACK TO SAVEPOINT batch_op")
+                        results[i].update(status="error", error=str(err))
+        conn.commit()
+    except db_errors as err:
+        conn.rollback()
+        for result in results:
+            if result["status"] == "ok":
+                result["status"] = "not_applied"
+        for i, _ in run:
+            results[i].update(status="error", error=str(err))
+        raise BatchFailed(results, err)
+
+    return results, sum(1 for result in results if result["status"] == "ok")
@@ -0,0 +1,106 @@
+"""Shared JSON encoding for every app's jsonify().
+
+Handlers return DB rows as they come back from the driver; the provider
+turns the values in them into JSON in the same pass that writes the
+response, so no handler needs a per-row conversion loop:
+
+    Decimal             number (was a string with Flask's default encoder)
+    date                "YYYY-MM-DD"
+    datetime            "YYYY-MM-DD HH:MM:SS", the format SQLite stores, so
+                        both backends answer alike
+    timedelta           "H:MM:SS" (MySQL TIME columns)
+    sqlite3.Row         object
+    numpy scalars       number
+
+orjson (C extension) does the encoding when it is installed, and the stdlib
+encoder with the same conversions otherwise; JSON_ENCODER=stdlib forces the
+fallback. Keys stay sorted, as with Flask's default provider.
+
+    json_provider.init_app(app)
+"""
+import json
+import os
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv("JSON_ENCODER") == "stdlib":
+    orjson = None
+
+# Exact-type lookups first: this runs once per Decimal/date in a payload
+CONVERTERS = {
+    Decimal: float,
+    datetime: lambda value: value.isoformat(" ", "seconds"),
+    date: date.isoformat,
+    time: time.isoformat,
+    timedelta: str,
+}
+
+
+def default(value):
+    """Conversion for values the encoders don't handle natively"""
+    convert = CONVERTERS.get(type(value))
+    if convert is not None:
+        return convert(value)
+    if isinstance(value, sqlite3.Row):
+        return dict(zip(value.keys(), value))
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    for kind, convert in CONVERTERS.items():  # subclasses
+        if isinstance(value, kind):
+            return convert(value)
+    return DefaultJSONProvider.default(value)  # dataclasses, UUIDs, __html__
+
+
+class FastJSONProvider(DefaultJSONProvider):
+
+    default = staticmethod(default)
+
+    def _options(self, sort_keys=None, indent=None):
+        # Dates go through default() too, for the SQLite-style timestamps
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, **kwargs):
+        """UTF-8 JSON, without a str round trip when orjson is available"""
+        if orjson is None:
+            if not kwargs.get("indent"):
+                kwargs.setdefault("separators", (",", ":"))
+            return self.dumps(obj, **kwargs).encode("utf-8")
+        return orjson.dumps(obj, default=kwargs.get("default", self.default),
+                            option=self._options(kwargs.get("sort_keys"), kwargs.get("indent")))
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"sort_keys", "indent", "default"}:
+            kwargs.setdefault("default", self.default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, **kwargs).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        body = self.dumps_bytes(obj, indent=2 if pretty else None)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    return app.json
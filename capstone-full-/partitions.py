@@ -0,0 +1,220 @@
+"""Monthly range partitions for the sales and waste tables.
+
+On MySQL both tables are partitioned by month on their date column
+(RANGE COLUMNS), one partition per month named pYYYYMM plus a catch-all
+`pmax` for dates past the last month:
+
+    sales   p202401 < '2024-02-01', p202402 < '2024-03-01', ..., pmax
+    waste   same layout on date_logged
+
+Date-filtered queries that compare the bare column with a literal
+(`sale_date >= %s`) are pruned to the partitions in range by the optimizer.
+Wrapping the column in a function (DATE(sale_date), MONTH(...)) in the WHERE
+clause defeats pruning, so filters bind a start date instead.
+
+Maintenance (daily from cron):
+
+    python partitions.py maintain
+        - splits PARTITION_AHEAD_MONTHS future months off pmax, so inserts
+          never land in pmax and month boundaries never need a data move
+        - archives closed sales months (sales_archive.py) and drops their
+          partitions instead of deleting the rows
+        - retires waste months older than WASTE_RETENTION_MONTHS, either
+          detaching them into a standalone table waste_pYYYYMM
+          (PARTITION_RETENTION=detach, the default) or dropping them
+    python partitions.py status
+
+Dropping or exchanging a partition is a metadata change whose cost does not
+depend on the rows in it. SQLite has no partitions: there the same calls
+fall back to range deletes on the (date) indexes.
+"""
+import os
+from datetime import date
+
+from storage import to_date
+
+TABLES = {"sales": "sale_date", "waste": "date_logged"}
+AHEAD_MONTHS = int(os.getenv("PARTITION_AHEAD_MONTHS", 3))
+WASTE_RETENTION_MONTHS = int(os.getenv("WASTE_RETENTION_MONTHS", 24))  # 0 = keep forever
+RETENTION_ACTION = os.getenv("PARTITION_RETENTION", "detach")  # detach | drop
+CATCH_ALL = "pmax"
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return month.strftime("p%Y%m")
+
+
+def _definition(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{_add_months(month, 1).isoformat()}')"
+
+
+def _month_of(name):
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def partitions(conn, dialect, table):
+    """Month partitions of table, oldest first (empty when not partitioned)"""
+    if dialect.name != "mysql":
+        return []
+    rows = dialect.fetchall(conn, """
+        SELECT PARTITION_NAME AS name
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    return [r["name"] for r in rows]
+
+
+def _table_exists(conn, dialect, table):
+    return bool(dialect.fetchall(conn, """
+        SELECT 1 AS found
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,)))
+
+
+def ensure_partitions(conn, dialect, table, today=None, ahead=AHEAD_MONTHS):
+    """
+    Make sure table has a partition for every month up to `ahead` months
+    from today, partitioning it first if needed. Returns the partitions added.
+    """
+    if dialect.name != "mysql":
+        return []
+    column = TABLES[table]
+    last = _add_months(_month_start(today or date.today()), ahead)
+    existing = partitions(conn, dialect, table)
+
+    if not existing:
+        oldest = dialect.fetchall(conn, f"SELECT MIN({column}) AS oldest FROM {table}")[0]["oldest"]
+        month = min(_month_start(to_date(oldest)), last) if oldest else _month_start(today or date.today())
+        months = []
+        while month <= last:
+            months.append(month)
+            month = _add_months(month, 1)
+        dialect.execute(conn, f"""
+            ALTER TABLE {table} PARTITION BY RANGE COLUMNS ({column}) (
+                {", ".join(_definition(m) for m in months)},
+                PARTITION {CATCH_ALL} VALUES LESS THAN (MAXVALUE)
+            )
+        """)
+        return [partition_name(m) for m in months]
+
+    months_held = [p for p in existing if p != CATCH_ALL]
+    month = _add_months(_month_of(months_held[-1]), 1) if months_held else _month_start(today or date.today())
+    months = []
+    while month <= last:
+        months.append(month)
+        month = _add_months(month, 1)
+    if months:
+        # pmax is empty as long as maintenance keeps ahead of the calendar,
+        # so splitting it moves no rows
+        dialect.execute(conn, f"""
+            ALTER TABLE {table} REORGANIZE PARTITION {CATCH_ALL} INTO (
+                {", ".join(_definition(m) for m in months)},
+                PARTITION {CATCH_ALL} VALUES LESS THAN (MAXVALUE)
+            )
+        """)
+    return [partition_name(m) for m in months]
+
+
+def retire_month(conn, dialect, table, month, action="drop"):
+    """
+    Remove one month of rows from table: drop its partition, or with
+    action="detach" swap it out into a standalone table <table>_pYYYYMM.
+    Falls back to a range delete (or copy + delete) without a partition.
+    Returns "partition" or "rows" for the way the month was removed.
+    """
+    column = TABLES[table]
+    name = partition_name(month)
+    bounds = (month.isoformat(), _add_months(month, 1).isoformat())
+    detached = f"{table}_{name}"
+
+    if name in partitions(conn, dialect, table):
+        # The oldest partition also holds anything older than its month
+        # (e.g. backdated rows); those must not go with it
+        strays = dialect.fetchall(conn, f"SELECT 1 AS found FROM {table} PARTITION ({name}) WHERE {column} < %s LIMIT 1",
+                                  bounds[:1])
+        if not strays:
+            if action == "detach":
+                # Each step is skipped when done already, so a run that
+                # died half way through can simply be repeated
+                if not _table_exists(conn, dialect, detached):
+                    dialect.execute(conn, f"CREATE TABLE {detached} LIKE {table}")
+                if partitions(conn, dialect, detached):
+                    dialect.execute(conn, f"ALTER TABLE {detached} REMOVE PARTITIONING")
+                if dialect.fetchall(conn, f"SELECT 1 AS found FROM {table} PARTITION ({name}) LIMIT 1"):
+                    dialect.execute(conn, f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {detached}")
+            dialect.execute(conn, f"ALTER TABLE {table} DROP PARTITION {name}")
+            return "partition"
+
+    if action == "detach":
+        dialect.execute(conn, f"CREATE TABLE {detached} AS SELECT * FROM {table} WHERE {column} >= %s AND {column} < %s",
+                        bounds)
+    dialect.execute(conn, f"DELETE FROM {table} WHERE {column} >= %s AND {column} < %s", bounds)
+    conn.commit()
+    return "rows"
+
+
+def apply_retention(conn, dialect, table, keep_months, today=None, action=RETENTION_ACTION):
+    """Retire every month of table older than `keep_months` before today's month"""
+    if keep_months <= 0:
+        return []
+    column = TABLES[table]
+    cutoff = _add_months(_month_start(today or date.today()), -keep_months)
+    held = partitions(conn, dialect, table)
+    if held:
+        months = [_month_of(p) for p in held if p != CATCH_ALL and _month_of(p) < cutoff]
+    else:
+        month = dialect.bucket_start(column, "month")
+        rows = dialect.fetchall(conn, f"""
+            SELECT DISTINCT {month} AS month FROM {table} WHERE {column} < %s ORDER BY month
+        """, (cutoff.isoformat(),))
+        months = [to_date(r["month"]) for r in rows]
+    for month in months:
+        retire_month(conn, dialect, table, month, action)
+    return [month.strftime("%Y-%m") for month in months]
+
+
+def maintain(conn, dialect, archive, today=None):
+    """One maintenance pass: future partitions, sales archiving, waste retention"""
+    report = {table: {"created": ensure_partitions(conn, dialect, table, today)} for table in TABLES}
+    report["sales"]["archived"] = archive.compact(conn, dialect, today=today)
+    report["waste"]["retired"] = apply_retention(conn, dialect, "waste", WASTE_RETENTION_MONTHS, today)
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    import storage
+    from sales_archive import archive
+
+    if sys.argv[1:] not in (["maintain"], ["status"]):
+        sys.exit("usage: python partitions.py maintain|status")
+    backend = storage.get_backend()
+    dialect = storage.get_dialect(backend)
+    router = storage.create_router(backend, {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASS", ""),
+        "database": os.getenv("DB_NAME", "gastrotrack"),
+    })
+    conn = router.connect(readonly=False)
+    try:
+        if sys.argv[1] == "maintain":
+            result = maintain(conn, dialect, archive)
+        else:
+            result = {table: partitions(conn, dialect, table) for table in TABLES}
+    finally:
+        conn.close()
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,221 @@
+"""On-demand sampling profiler for request handlers.
+
+Off by default and free while off: the only hook is a before_request check
+of one attribute. An admin starts a session for N seconds or for the next
+K requests (optionally to one route); a daemon thread then reads the stacks
+of the threads serving those requests every PROFILER_INTERVAL_MS via
+sys._current_frames() and counts them. Stacks are rooted at the route and,
+when a query is running, end in an "SQL: ..." frame read from the locals of
+the DB layer (dialect/cursor execute), so slow queries show up by text.
+
+    POST /api/admin/profiler/start   {"seconds": 30} or {"requests": 20,
+                                     "route": "/api/sales/overview"}
+    GET  /api/admin/profiler         session status
+    POST /api/admin/profiler/stop
+    GET  /api/admin/profiler/result  collapsed stacks ("a;b;c 42" lines),
+                                     for flamegraph.pl or speedscope
+
+Admin-only: requests need X-Admin-Token equal to PROFILER_TOKEN, and the
+endpoints do not exist (404) unless PROFILER_TOKEN is set.
+"""
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import abort, jsonify, request
+
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+MAX_SECONDS = 300
+MAX_REQUESTS = 10000
+SQL_LENGTH = 120
+ADMIN_PREFIX = "/api/admin/profiler"
+
+# Frames whose arguments hold the statement being run
+SQL_FRAMES = {"execute", "executemany", "fetchall", "_run"}
+SQL_LOCALS = ("operation", "query", "sql", "args")
+
+
+def _sql_of(frame):
+    if frame.f_code.co_name not in SQL_FRAMES:
+        return None
+    values = frame.f_locals
+    for name in SQL_LOCALS:
+        value = values.get(name)
+        if isinstance(value, tuple) and value:
+            value = value[0]
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def _collapse(frame, root):
+    """Root-first 'a;b;c' stack for one thread, ending in the running SQL if any"""
+    names = []
+    sql = None
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        if sql is None:
+            sql = _sql_of(frame)
+        frame = frame.f_back
+    names.append(root)
+    names.reverse()
+    if sql is not None:
+        names.append("SQL: " + re.sub(r"\s+", " ", sql).strip()[:SQL_LENGTH])
+    return ";".join(name.replace(";", ",") for name in names)
+
+
+class Session:
+
+    def __init__(self, seconds=None, requests=None, route=None, interval_ms=INTERVAL_MS):
+        self.seconds = seconds
+        self.requests = requests
+        self.route = route
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + (seconds or MAX_SECONDS)
+        self.threads = {}  # thread id -> "METHOD /rule" being profiled
+        self.completed = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self.finished_at = None
+
+    def wants(self, rule):
+        if self.route is None:
+            return not rule.startswith(ADMIN_PREFIX)
+        return self.route == rule
+
+    def report(self):
+        return {
+            "running": self.finished_at is None,
+            "route": self.route,
+            "seconds": self.seconds,
+            "requests": self.requests,
+            "requests_profiled": self.completed,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "interval_ms": self.interval * 1000,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+        }
+
+
+class SamplingProfiler:
+
+    def __init__(self, token=PROFILER_TOKEN):
+        self.token = token
+        self.session = None  # the running session; None = profiler off
+        self.last = None  # most recent session, running or finished
+        self._lock = threading.Lock()
+
+    # --- Sessions ---
+    def start(self, **options):
+        """Begin a session; False if one is already running"""
+        with self._lock:
+            if self.session is not None:
+                return False
+            self.session = self.last = Session(**options)
+        threading.Thread(target=self._sample, args=(self.last,), name="profiler", daemon=True).start()
+        return True
+
+    def stop(self):
+        with self._lock:
+            session, self.session = self.session, None
+        if session is not None and session.finished_at is None:
+            session.finished_at = time.time()
+        return self.last
+
+    def _sample(self, session):
+        own = threading.get_ident()
+        while self.session is session:
+            if time.monotonic() >= session.deadline:
+                self.stop()
+                break
+            frames = sys._current_frames()
+            sampled = [_collapse(frames[thread_id], root) for thread_id, root in list(session.threads.items())
+                       if thread_id in frames and thread_id != own]
+            del frames
+            with self._lock:  # collapsed() may be reading the counter
+                session.stacks.update(sampled)
+                session.samples += len(sampled)
+            time.sleep(session.interval)
+
+    def collapsed(self):
+        """Collapsed-stack text of the latest session, heaviest first"""
+        if self.last is None:
+            return ""
+        with self._lock:  # snapshot: a running session's sampler keeps adding stacks
+            stacks = self.last.stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    # --- Flask ---
+    def _check_admin(self):
+        if not self.token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), self.token):
+            abort(403)
+
+    def init_app(self, app):
+        @app.before_request
+        def _track():
+            session = self.session
+            if session is None or request.url_rule is None or not session.wants(request.url_rule.rule):
+                return None
+            session.threads[threading.get_ident()] = f"{request.method} {request.url_rule.rule}"
+            return None
+
+        @app.teardown_request
+        def _untrack(exc=None):
+            session = self.session
+            if session is None or session.threads.pop(threading.get_ident(), None) is None:
+                return
+            with self._lock:
+                session.completed += 1
+                done = session.requests and session.completed >= session.requests
+            if done:
+                self.stop()
+
+        @app.route("/api/admin/profiler/start", methods=["POST"])
+        def profiler_start():
+            self._check_admin()
+            data = request.get_json(silent=True) or {}
+            try:
+                seconds = float(data["seconds"]) if data.get("seconds") else None
+                count = int(data["requests"]) if data.get("requests") else None
+                interval_ms = float(data.get("interval_ms", INTERVAL_MS))
+            except (TypeError, ValueError):
+                return jsonify({"error": "seconds, requests and interval_ms must be numbers"}), 400
+            if (seconds is None) == (count is None):
+                return jsonify({"error": "Give either seconds or requests"}), 400
+            if not 0 < (seconds or 1) <= MAX_SECONDS or not 0 < (count or 1) <= MAX_REQUESTS \
+                    or not 1 <= interval_ms <= 1000:
+                return jsonify({"error": f"seconds must be 1-{MAX_SECONDS}, requests 1-{MAX_REQUESTS}, "
+                                         "interval_ms 1-1000"}), 400
+            if not self.start(seconds=seconds, requests=count, route=data.get("route"), interval_ms=interval_ms):
+                return jsonify({"error": "A profiling session is already running"}), 409
+            return jsonify(self.last.report()), 202
+
+        @app.route("/api/admin/profiler")
+        def profiler_status():
+            self._check_admin()
+            return jsonify(self.last.report() if self.last else {"running": False})
+
+        @app.route("/api/admin/profiler/stop", methods=["POST"])
+        def profiler_stop():
+            self._check_admin()
+            session = self.stop()
+            return jsonify(session.report() if session else {"running": False})
+
+        @app.route("/api/admin/profiler/result")
+        def profiler_result():
+            self._check_admin()
+            return self.collapsed(), 200, {
+                "Content-Type": "text/plain; charset=utf-8",
+                "Content-Disposition": 'attachment; filename="profile.folded"',
+            }
+
+        return self
@@ -0,0 +1,162 @@
+"""Reorder points and draft purchase orders for all active SKUs.
+
+Ingredient usage over the last `window_days` (recipe usage of sold menu
+items plus logged waste) is loaded with two grouped queries and turned into
+a SKU x day matrix. Everything after that runs as NumPy array arithmetic
+over all SKUs at once:
+
+    daily usage    mean and standard deviation per SKU
+    safety stock   z(service level) * sigma * sqrt(lead time)
+    reorder point  daily usage * lead time + safety stock
+    usable stock   stock that will be used before its expiry_date
+    order quantity top up to cover lead time + review period, capped by
+                   free capacity and by what can be used within shelf life
+"""
+import os
+import time
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+from sites import DEFAULT_SITE_ID
+from storage import to_date
+
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_LEAD_TIME_DAYS = float(os.getenv("REORDER_LEAD_TIME_DAYS", 2))
+DEFAULT_REVIEW_DAYS = float(os.getenv("REORDER_REVIEW_DAYS", 7))
+DEFAULT_SERVICE_LEVEL = 0.95
+# Shelf life of a fresh delivery, by inventory category
+SHELF_LIFE_DAYS = {
+    "perishable": float(os.getenv("SHELF_LIFE_PERISHABLE_DAYS", 5)),
+    "semi-perishable": float(os.getenv("SHELF_LIFE_SEMI_PERISHABLE_DAYS", 30)),
+}
+
+
+def load_usage(conn, dialect, window_days, site_id=DEFAULT_SITE_ID):
+    """(item_id, day, quantity) rows of one site's ingredient usage in the window"""
+    since = (date.today() - timedelta(days=window_days)).isoformat()  # bound, so partitions are pruned
+    sale_day = dialect.date("s.sale_date")
+    waste_day = dialect.date("w.date_logged")
+    # Recipes (menu_inventory) map a sold dish to the ingredients it uses.
+    # Sales are matched by item_name, as stock_ledger.deplete_for_sales does:
+    # POST /api/sales only records the name, never sales.item_id. A site's
+    # recipes point at its own inventory rows
+    sold = dialect.fetchall(conn, f"""
+        SELECT r.item_id, {sale_day} AS day, SUM(s.quantity * r.quantity_used) AS used
+        FROM sales s
+        JOIN menu_items m ON m.item_name = s.item_name
+        JOIN menu_inventory r ON r.menu_id = m.id
+        JOIN inventory i ON i.item_id = r.item_id AND i.site_id = s.site_id
+        WHERE s.site_id = %s AND s.sale_date >= %s
+        GROUP BY r.item_id, {sale_day}
+    """, (site_id, since))
+    wasted = dialect.fetchall(conn, f"""
+        SELECT w.item_id, {waste_day} AS day, SUM(w.quantity) AS used
+        FROM waste w
+        WHERE w.site_id = %s AND w.date_logged >= %s
+        GROUP BY w.item_id, {waste_day}
+    """, (site_id, since))
+    return sold + wasted
+
+
+def load_items(conn, dialect, site_id=DEFAULT_SITE_ID):
+    return dialect.fetchall(conn, """
+        SELECT item_id, item_name, stock_level, capacity,
+               COALESCE(category, 'perishable') AS category,
+               unit_cost, expiry_date, lead_time_days
+        FROM inventory
+        WHERE site_id = %s AND COALESCE(status, 'active') = 'active'
+        ORDER BY item_id
+    """, (site_id,))
+
+
+def plan_replenishment(items, usage, window_days=DEFAULT_WINDOW_DAYS, today=None,
+                       service_level=DEFAULT_SERVICE_LEVEL, review_days=DEFAULT_REVIEW_DAYS,
+                       lead_time_days=DEFAULT_LEAD_TIME_DAYS):
+    """Compute reorder points and order quantities; returns the draft PO dict"""
+    started = time.perf_counter()
+    today = today or date.today()
+    n = len(items)
+
+    ids = np.array([i["item_id"] for i in items], dtype=np.int64)
+    stock = np.array([float(i["stock_level"] or 0) for i in items])
+    capacity = np.array([float(i["capacity"] or 0) for i in items])
+    unit_cost = np.array([float(i["unit_cost"] or 0) for i in items])
+    lead = np.array([float(i["lead_time_days"]) if i.get("lead_time_days") is not None else lead_time_days
+                     for i in items])
+    shelf_life = np.array([SHELF_LIFE_DAYS.get(i["category"], SHELF_LIFE_DAYS["perishable"]) for i in items])
+    days_left = np.array([(to_date(i["expiry_date"]) - today).days if i.get("expiry_date") else np.inf
+                          for i in items], dtype=np.float64)
+
+    # SKU x day usage matrix, filled with one scatter-add
+    matrix = np.zeros((n, window_days))
+    if usage and n:
+        order = np.argsort(ids)
+        u_ids = np.array([u["item_id"] for u in usage], dtype=np.int64)
+        u_day = np.array([window_days - 1 - (today - to_date(u["day"])).days for u in usage], dtype=np.int64)
+        u_qty = np.array([float(u["used"] or 0) for u in usage])
+        pos = np.searchsorted(ids, u_ids, sorter=order)
+        pos = np.clip(pos, 0, n - 1)
+        rows = order[pos]
+        valid = (ids[rows] == u_ids) & (u_day >= 0) & (u_day < window_days)
+        np.add.at(matrix, (rows[valid], u_day[valid]), u_qty[valid])
+
+    daily = matrix.mean(axis=1)
+    sigma = matrix.std(axis=1)
+    z = NormalDist().inv_cdf(service_level)
+    safety = z * sigma * np.sqrt(lead)
+    reorder_point = daily * lead + safety
+
+    # Stock past its expiry before we can use it doesn't count
+    dated = np.isfinite(days_left)
+    usable = stock.copy()
+    usable[dated] = np.minimum(stock[dated], daily[dated] * np.clip(days_left[dated], 0, None))
+
+    target = daily * (lead + review_days) + safety
+    target = np.minimum(target, daily * shelf_life + safety)  # don't buy what will spoil
+    quantity = target - usable
+    free = capacity - stock
+    quantity = np.where(capacity > 0, np.minimum(quantity, free), quantity)
+    quantity = np.ceil(np.clip(quantity, 0, None) * 100) / 100
+    needs_order = (usable <= reorder_point) & (quantity > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cover = np.where(daily > 0, usable / daily, np.inf)
+
+    lines = []
+    for i in np.flatnonzero(needs_order):
+        lines.append({
+            "item_id": int(ids[i]),
+            "item_name": items[i]["item_name"],
+            "stock_level": round(float(stock[i]), 2),
+            "usable_stock": round(float(usable[i]), 2),
+            "daily_usage": round(float(daily[i]), 3),
+            "safety_stock": round(float(safety[i]), 2),
+            "reorder_point": round(float(reorder_point[i]), 2),
+            "days_of_cover": round(float(cover[i]), 1),
+            "order_quantity": float(quantity[i]),
+            "unit_cost": float(unit_cost[i]),
+            "line_cost": round(float(quantity[i] * unit_cost[i]), 2),
+        })
+    lines.sort(key=lambda line: line["days_of_cover"])
+
+    return {
+        "status": "draft",
+        "generated_at": today.isoformat(),
+        "window_days": window_days,
+        "service_level": service_level,
+        "review_days": review_days,
+        "skus_evaluated": n,
+        "lines": lines,
+        "without_history": {int(i) for i in ids[~matrix.any(axis=1)]},
+        "total_cost": round(sum(line["line_cost"] for line in lines), 2),
+        "compute_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def draft_purchase_order(conn, dialect, window_days=DEFAULT_WINDOW_DAYS, site_id=DEFAULT_SITE_ID, **options):
+    """Load a site's active SKUs and their recent usage, then plan the order"""
+    items = load_items(conn, dialect, site_id)
+    usage = load_usage(conn, dialect, window_days, site_id)
+    return plan_replenishment(items, usage, window_days, **options)
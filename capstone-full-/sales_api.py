@@ -1,27 +1,76 @@
-from flask import Flask, jsonify, render_template
+from flask import Flask, jsonify, render_template, request
 from flask_cors import CORS
-import mysql.connector
 import random
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import date, datetime, timedelta
 import json
 from dotenv import load_dotenv
 import os
 
+import category_stats
+import json_provider
+import sites
+import storage
+from admission import AdmissionController
+from circuit_breaker import StaleResponses
+from health import HealthMonitor, admission_report, breaker_report
+from profiler import SamplingProfiler
+from sales_archive import live_filter
+from shared_cache import SharedCache
+from static_cache import create_static_cache
+from storage import format_date, to_date
+from timeseries import parse_range, sales_series
+
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend requests
+json_provider.init_app(app)  # Decimal/date-aware jsonify, orjson when installed
+static_cache = create_static_cache(app)  # pages and assets served from memory
+# Heavy report queries are shed before they can crowd out anything else
+admission = AdmissionController().init_app(app, classes={
+    "/api/sales": "analytics",
+    "/api/sales/overview": "analytics",
+    "/api/sales/series": "analytics",
+    "/api/sales/export": "analytics",
+    "/api/sales/categories/<category_name>": "analytics",
+    "/api/sales/rollup": "analytics",
+}, route_limits={"/api/sales/overview": 2, "/api/sales/export": 1, "/api/sales/rollup": 1})
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST"),
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASS"),
+    "database": os.getenv("DB_NAME")
+}
+# MySQL by default; DB_BACKEND=sqlite runs on the embedded DB_PATH file
+DB_BACKEND = storage.get_backend()
+dialect = storage.get_dialect(DB_BACKEND)
+# Reads go to DB_REPLICA_HOSTS / DB_REPLICA_PATHS when set, writes to the primary
+db_router = storage.create_router(DB_BACKEND, DB_CONFIG).init_app(app)
+stale_responses = None
+if db_router.breaker is not None:
+    # While the DB is down: GETs replay their last good response, writes fail fast
+    stale_responses = StaleResponses(db_router.breaker).init_app(app)
+# Liveness/readiness answered from a background DB probe (see health.py)
+health = HealthMonitor(db_router).init_app(app)
+health.add_component("admission", admission_report(admission))
+health.add_component("breaker", breaker_report(db_router, stale_responses))
+health.add_component("static_cache", static_cache.stats)
+# Admin-only sampling profiler (PROFILER_TOKEN); a no-op until started
+profiler = SamplingProfiler().init_app(app)
+# Every route is also served per location under /sites/<id>/ (see sites.py)
+site_router = sites.create_site_router(DB_BACKEND, DB_CONFIG, db_router).init_app(app)
+# Report aggregates shared by all workers on the host (SHARED_CACHE_PATH);
+# sales are written by the dashboard app, whose invalidations reach us too
+shared_cache = SharedCache()
+health.add_component("shared_cache", shared_cache.stats)
 
-def get_db_connection():
-    """Get database connection"""
+def get_db_connection(readonly=None):
+    """Get database connection of the current site (replica for reads, primary for writes)"""
     try:
-        return mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            database=os.getenv("DB_NAME")
-        )
-    except mysql.connector.Error as err:
+        return site_router.connect(readonly)
+    except storage.DB_ERRORS as err:
         print(f"Database connection error: {err}")
         raise
 
@@ -126,7 +175,7 @@ def generate_sales_data():
 def get_sales_data():
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = dialect.cursor(conn)
 
         # 1) Fetch categories
         cursor.execute("SELECT id, category_name FROM menu_categories")
@@ -135,11 +184,11 @@ def get_sales_data():
         # 2) Fetch items per category
         categories = []
         for category in categories_raw:
-            cursor.execute("""
+            cursor.execute(dialect.sql("""
                 SELECT item_name AS name, color_code AS color
                 FROM menu_items
                 WHERE category_id = %s
-            """, (category["id"],))
+            """), (category["id"],))
             items = cursor.fetchall()
 
             categories.append({
@@ -147,20 +196,31 @@ def get_sales_data():
                 "items": items
             })
 
-        # 3) Fetch real sales data from the last 7 days
-        cursor.execute("""
-            SELECT DATE(sale_date) AS date, SUM(price * quantity) AS total
+        # 3) Fetch real sales data from the last 7 days (a bound start
+        # date lets MySQL prune to the partitions in range)
+        since = date.today() - timedelta(days=7)
+        source = site_router.archive()
+        condition, params = sites.site_filter()
+        live, live_params = live_filter(source=source)
+        cursor.execute(dialect.sql(f"""
+            SELECT {dialect.date("sale_date")} AS date, SUM(price * quantity) AS total
             FROM sales
-            WHERE sale_date >= CURDATE() - INTERVAL 7 DAY
-            GROUP BY DATE(sale_date)
-        """)
+            WHERE {condition} AND sale_date >= %s AND {live}
+            GROUP BY {dialect.date("sale_date")}
+        """), params + (since.isoformat(),) + live_params)
         rows = cursor.fetchall()
 
+        # Days before the archive watermark come from the columnar archive
+        totals = source.day_revenue(since, site_id=sites.current())
+        for r in rows:
+            totals[format_date(r["date"])] += float(r["total"])
+        days = sorted(totals)
+
         chart_data = {
-            "labels": [r["date"].strftime("%a") for r in rows],
+            "labels": [to_date(d).strftime("%a") for d in days],
             "datasets": [{
                 "label": "Total Sales",
-                "data": [float(r["total"]) for r in rows],
+                "data": [totals[d] for d in days],
                 "borderColor": "#007bff",
                 "backgroundColor": "rgba(0, 123, 255, 0.1)",
                 "tension": 0.4,
@@ -177,26 +237,53 @@ def get_sales_data():
         print(f"Error in get_sales_data: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route("/api/sales/overview")
-def get_sales_overview():
+@app.route("/api/sales/series")
+def get_sales_series():
+    """
+    Sales per hour/day/week/month for any date range, gap-filled and
+    downsampled to at most `points` points.
+    Query: from=YYYY-MM-DD&to=YYYY-MM-DD&bucket=day&points=500&metric=revenue
+    """
+    try:
+        start, end, bucket, points, metric = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        try:
+            return jsonify(sales_series(conn, dialect, start, end, bucket, points, metric,
+                                        site_id=sites.current(), source=site_router.archive()))
+        finally:
+            conn.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def load_sales_overview(readonly=None):
+    """Units sold per item and weekday over the last 7 days at the current site"""
+    conn = get_db_connection(readonly)
+    try:
+        cursor = dialect.cursor(conn)
 
         # Get sales for each item for the last 7 days (Mon-Sun)
-        cursor.execute("""
+        day_name = dialect.day_name("s.sale_date")
+        since = date.today() - timedelta(days=7)
+        source = site_router.archive()
+        condition, params = sites.site_filter("s.site_id")
+        live, live_params = live_filter("s.sale_date", source=source)
+        cursor.execute(dialect.sql(f"""
             SELECT 
                 mi.item_name,
                 mc.category_name,
-                DAYNAME(s.sale_date) AS day_name,
+                {day_name} AS day_name,
                 SUM(s.quantity) AS total_sold
             FROM sales s
             JOIN menu_items mi ON s.item_id = mi.id
             JOIN menu_categories mc ON mi.category_id = mc.id
-            WHERE s.sale_date >= CURDATE() - INTERVAL 7 DAY
-            GROUP BY mi.item_name, mc.category_name, DAYNAME(s.sale_date)
+            WHERE {condition} AND s.sale_date >= %s AND {live}
+            GROUP BY mi.item_name, mc.category_name, {day_name}
             ORDER BY mi.item_name;
-        """)
+        """), params + (since.isoformat(),) + live_params)
         results = cursor.fetchall()
 
         # Reformat into frontend-friendly structure
@@ -210,13 +297,97 @@ def get_sales_overview():
                 }
             data[item]["sales"][row["day_name"]] = row["total_sold"]
 
+        # Merge in any part of the window that is already archived
+        archived = source.item_weekday_totals(since, site_id=sites.current())
+        if archived:
+            cursor.execute("""
+                SELECT mi.id, mi.item_name, mc.category_name
+                FROM menu_items mi
+                JOIN menu_categories mc ON mi.category_id = mc.id
+            """)
+            names = {r["id"]: r for r in cursor.fetchall()}
+            for (item_id, day), qty in archived.items():
+                if item_id not in names:
+                    continue
+                item = names[item_id]["item_name"]
+                data.setdefault(item, {
+                    "category": names[item_id]["category_name"],
+                    "sales": {d: 0 for d in ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]}
+                })
+                data[item]["sales"][day] += qty
+
         cursor.close()
+        return data
+    finally:
         conn.close()
-        return jsonify(data)
 
+
+@app.route("/api/sales/overview")
+def get_sales_overview():
+    try:
+        return jsonify(shared_cache.get_or_compute(f"sales_api:overview:{sites.current()}",
+                                                   lambda: load_sales_overview(shared_cache.compute_readonly),
+                                                   tags=sites.tags("sales")))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+def site_sales_totals(conn, site_id, start, end):
+    """Revenue per day and quantity per item of one site in [start, end), archive included"""
+    sale_day = dialect.date("sale_date")
+    source = site_router.archive(site_id)
+    live, live_params = live_filter(source=source)
+    rows = dialect.fetchall(conn, f"""
+        SELECT {sale_day} AS day, item_name, SUM(quantity) AS quantity, SUM(price * quantity) AS revenue
+        FROM sales
+        WHERE site_id = %s AND sale_date >= %s AND sale_date < %s AND {live}
+        GROUP BY {sale_day}, item_name
+    """, (site_id, start.isoformat(), end.isoformat()) + live_params)
+
+    days = source.day_revenue(start, end, site_id=site_id)
+    items = source.item_totals(start, end, site_id=site_id)
+    for r in rows:
+        days[format_date(r["day"])] += float(r["revenue"] or 0)
+        items[r["item_name"]] += int(r["quantity"])
+    return days, items
+
+
+@app.route("/api/sales/rollup")
+def get_sales_rollup():
+    """
+    Sales of every site over from=YYYY-MM-DD&to=YYYY-MM-DD (default: the
+    last 7 days), queried in parallel and merged. Sites that can't be read
+    are listed under "errors"; the totals cover the others.
+    """
+    try:
+        start, end, _, _, _ = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        names = site_router.sites()
+        results, errors = site_router.fan_out(lambda conn, site_id: site_sales_totals(conn, site_id, start, end))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if errors and not results:
+        return jsonify({"error": "No site could be read", "errors": errors}), 503
+
+    days, items, per_site = Counter(), Counter(), []
+    for site_id, (site_days, site_items) in sorted(results.items()):
+        days.update(site_days)
+        items.update(site_items)
+        per_site.append({"site_id": site_id, "name": names.get(site_id),
+                         "revenue": round(sum(site_days.values()), 2), "quantity": sum(site_items.values())})
+    return jsonify({
+        "from": start.isoformat(),
+        "to": (end - timedelta(days=1)).isoformat(),
+        "sites": per_site,
+        "total": {"revenue": round(sum(days.values()), 2), "quantity": sum(items.values())},
+        "days": [{"date": day, "revenue": round(days[day], 2)} for day in sorted(days)],
+        "top_items": [{"item_name": name, "quantity": qty} for name, qty in items.most_common(10)],
+        "errors": {str(site_id): error for site_id, error in errors.items()},
+    })
+
 @app.route('/api/sales/realtime')
 def get_realtime_sales():
     """API endpoint for real-time sales updates"""
@@ -235,32 +406,35 @@ def get_realtime_sales():
 
 @app.route('/api/sales/categories/<category_name>')
 def get_category_details(category_name):
-    """API endpoint to get detailed data for a specific category"""
+    """
+    Drill-down for one category from the sales rollups: totals, top and
+    bottom products and the last 12 months. Query: limit=5
+    """
     try:
-        # Generate detailed category data
-        category_details = {
-            'name': category_name.title(),
-            'total_sales': random.randint(5000, 20000),
-            'items_sold': random.randint(100, 500),
-            'top_products': [
-                {'name': f'Product {i}', 'sales': random.randint(100, 1000)} 
-                for i in range(1, 6)
-            ],
-            'monthly_trend': [random.randint(500, 2000) for _ in range(12)]
-        }
-        return jsonify(category_details)
+        limit = min(max(int(request.args.get("limit", 5)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    try:
+        def load():
+            conn = get_db_connection(shared_cache.compute_readonly)
+            try:
+                return category_stats.category_details(conn, dialect, category_name, limit, site_id=site_id)
+            finally:
+                conn.close()
+        site_id = sites.current()
+        details = shared_cache.get_or_compute(f"sales_api:category:{site_id}:{category_name}:{limit}", load,
+                                              tags=sites.tags("sales"))
+        if details is None:
+            return jsonify({'error': f'Unknown category: {category_name}'}), 404
+        return jsonify(details)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/')
 def serve_sales_report():
     """Serve the sales report HTML file"""
-    try:
-        with open('Templates/sales-report.html', 'r', encoding='utf-8') as file:
-            html_content = file.read()
-        return html_content
-    except FileNotFoundError:
-        return "Sales report template not found", 404
+    return static_cache.page('sales-report.html')
 
 # Additional utility endpoints
 @app.route('/api/sales/export')
@@ -270,15 +444,6 @@ def export_sales_data():
     sales_data['exported_at'] = datetime.now().isoformat()
     return jsonify(sales_data)
 
-@app.route('/api/health')
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
-    })
-
 if __name__ == '__main__':
     print("Starting Sales API Server...")
     print("Sales Report available at: http://localhost:5000/")
@@ -0,0 +1,370 @@
+"""Columnar archive of closed sales months.
+
+Closed months of the `sales` table are compacted into one directory per
+month holding a NumPy `.npy` file per column:
+
+    sales_archive/
+        manifest.json          {"watermark": "2024-04-01", "months": ["2024-01", ...],
+                                "retiring": []}
+        2024-01/sale_ts.npy    int64 seconds since the epoch
+        2024-01/item_id.npy    int32 (-1 when unknown)
+        2024-01/item_code.npy  int32 index into items.json
+        2024-01/quantity.npy   int32
+        2024-01/price.npy      float64
+        2024-01/site_id.npy    int32 (months archived before sites: all
+                               DEFAULT_SITE_ID)
+        2024-01/items.json     item names for item_code
+
+Every sale before the watermark lives in the archive, everything from the
+watermark on lives in the database. Historical aggregations memory-map the
+columns and reduce them with vectorized NumPy scans; callers query the live
+table only from `live_start()` onwards and merge the two partial results.
+Every aggregation takes an optional site_id to scan one site's rows only.
+
+`retiring` lists months whose rows may still be in the sales table; the
+next compact() removes them, and merges any other row found before the
+watermark into its month.
+
+    python sales_archive.py compact     # archive closed months (run from cron)
+"""
+import json
+import os
+import shutil
+import threading
+from collections import Counter
+from datetime import date, datetime
+
+import numpy as np
+
+import partitions
+from sites import DEFAULT_SITE_ID
+from storage import to_date
+
+ARCHIVE_DIR = os.getenv("SALES_ARCHIVE_DIR", "sales_archive")
+LIVE_MONTHS = int(os.getenv("SALES_LIVE_MONTHS", 3))  # closed months kept in the DB
+COLUMNS = ("sale_ts", "item_id", "item_code", "quantity", "price", "site_id")
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _to_ts(value):
+    """Epoch seconds (int64) for a date/datetime or an ISO string"""
+    if isinstance(value, (date, datetime)):
+        return np.datetime64(value, "s").astype(np.int64)
+    return np.datetime64(str(value).replace(" ", "T")[:19], "s").astype(np.int64)
+
+
+class SalesArchive:
+    """Reader/writer for the month-partitioned column files"""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self._columns = {}  # month -> dict of memory-mapped arrays
+        self._lock = threading.Lock()
+
+    # --- Manifest ---
+    def manifest(self):
+        try:
+            with open(os.path.join(self.root, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"watermark": None, "months": []}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, "manifest.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.root, "manifest.json"))
+
+    def live_start(self):
+        """First date held by the live table (None = nothing archived yet)"""
+        watermark = self.manifest()["watermark"]
+        return date.fromisoformat(watermark) if watermark else None
+
+    # --- Compaction ---
+    def compact(self, conn, dialect, today=None, live_months=LIVE_MONTHS):
+        """
+        Move every closed month older than `live_months` out of the sales
+        table into column files. Returns the months archived.
+        """
+        today = today or date.today()
+        cutoff = _add_months(_month_start(today), -live_months)
+        manifest = self.manifest()
+        manifest.setdefault("retiring", [])
+        start = date.fromisoformat(manifest["watermark"]) if manifest["watermark"] else None
+        if start is not None:
+            self._reconcile(conn, dialect, manifest, start)
+        else:
+            oldest = dialect.fetchall(conn, "SELECT MIN(sale_date) AS oldest FROM sales")[0]["oldest"]
+            if oldest is None:
+                return []
+            start = _month_start(datetime.fromisoformat(str(oldest)[:10]))
+
+        archived = []
+        month = start
+        while month < cutoff:
+            next_month = _add_months(month, 1)
+            rows = dialect.fetchall(conn, """
+                SELECT sale_date, item_id, item_name, quantity, price, site_id
+                FROM sales
+                WHERE sale_date >= %s AND sale_date < %s
+            """, (month.isoformat(), next_month.isoformat()))
+            self._write_month(month, rows)
+
+            # Column files are in place before the manifest moves the
+            # watermark, and the rows are removed only after that (the
+            # month's partition is dropped where sales is partitioned).
+            manifest["months"].append(month.strftime("%Y-%m"))
+            manifest["watermark"] = next_month.isoformat()
+            self._retire(conn, dialect, manifest, month)
+            archived.append(month.strftime("%Y-%m"))
+            month = next_month
+        return archived
+
+    def _retire(self, conn, dialect, manifest, month):
+        """Drop an archived month from the sales table, remembering it until that succeeded"""
+        name = month.strftime("%Y-%m")
+        if name not in manifest["retiring"]:
+            manifest["retiring"].append(name)
+        self._write_manifest(manifest)
+        partitions.retire_month(conn, dialect, "sales", month)
+        manifest["retiring"].remove(name)
+        self._write_manifest(manifest)
+
+    def _reconcile(self, conn, dialect, manifest, start):
+        """Clear the sales table of everything before the watermark `start`"""
+        # A run that failed (or died) between moving the watermark and
+        # retiring a month left rows that are archived already
+        for name in list(manifest["retiring"]):
+            self._retire(conn, dialect, manifest, date.fromisoformat(name + "-01"))
+
+        # Anything else before the watermark was written while its month
+        # was being compacted: merge it into the month's column files
+        bucket = dialect.bucket_start("sale_date", "month")
+        months = dialect.fetchall(conn, f"""
+            SELECT DISTINCT {bucket} AS month FROM sales WHERE sale_date < %s ORDER BY month
+        """, (start.isoformat(),))
+        for row in months:
+            month = _month_start(to_date(row["month"]))
+            name = month.strftime("%Y-%m")
+            rows = dialect.fetchall(conn, """
+                SELECT sale_date, item_id, item_name, quantity, price, site_id
+                FROM sales
+                WHERE sale_date >= %s AND sale_date < %s
+            """, (month.isoformat(), _add_months(month, 1).isoformat()))
+            if name in manifest["months"]:
+                rows = self._month_rows(name) + rows
+            else:
+                manifest["months"] = sorted(manifest["months"] + [name])
+            self._write_month(month, rows)
+            self._retire(conn, dialect, manifest, month)
+
+    def _month_rows(self, name):
+        """Rows of an archived month, shaped like the sales rows compact() reads"""
+        cols = self._month(name)
+        items = cols["items"]
+        return [{
+            "sale_date": np.datetime64(int(ts), "s").astype(datetime),
+            "item_id": int(item_id) if item_id >= 0 else None,
+            "item_name": items[code] or None,
+            "quantity": int(quantity),
+            "price": float(price),
+            "site_id": int(site_id),
+        } for ts, item_id, code, quantity, price, site_id in zip(
+            cols["sale_ts"], cols["item_id"], cols["item_code"], cols["quantity"], cols["price"], cols["site_id"])]
+
+    def _write_month(self, month, rows):
+        name = month.strftime("%Y-%m")
+        final = os.path.join(self.root, name)
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        items = sorted({r["item_name"] or "" for r in rows})
+        codes = {item: i for i, item in enumerate(items)}
+        columns = {
+            "sale_ts": np.array([_to_ts(r["sale_date"]) for r in rows], dtype=np.int64),
+            "item_id": np.array([r["item_id"] if r["item_id"] is not None else -1 for r in rows], dtype=np.int32),
+            "item_code": np.array([codes[r["item_name"] or ""] for r in rows], dtype=np.int32),
+            "quantity": np.array([r["quantity"] for r in rows], dtype=np.int32),
+            "price": np.array([float(r["price"] or 0) for r in rows], dtype=np.float64),
+            "site_id": np.array([r["site_id"] for r in rows], dtype=np.int32),
+        }
+        # Sorted by time so range scans can use searchsorted
+        order = np.argsort(columns["sale_ts"], kind="stable")
+        for column, values in columns.items():
+            np.save(os.path.join(tmp, f"{column}.npy"), values[order])
+        with open(os.path.join(tmp, "items.json"), "w", encoding="utf-8") as f:
+            json.dump(items, f)
+
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        with self._lock:
+            self._columns.pop(name, None)
+
+    # --- Scans ---
+    def _month(self, name):
+        with self._lock:
+            cached = self._columns.get(name)
+        if cached is None:
+            path = os.path.join(self.root, name)
+            cached = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in COLUMNS
+                      if os.path.exists(os.path.join(path, f"{c}.npy"))}
+            cached.setdefault("site_id", np.full(len(cached["sale_ts"]), DEFAULT_SITE_ID, dtype=np.int32))
+            with open(os.path.join(path, "items.json"), encoding="utf-8") as f:
+                cached["items"] = json.load(f)
+            with self._lock:
+                self._columns[name] = cached
+        return cached
+
+    def _slices(self, start=None, end=None, site_id=None):
+        """
+        Yield (month columns, rows) for archived rows with start <= date < end,
+        rows being a slice, or an index array when limited to one site
+        """
+        lo = _to_ts(start) if start else None
+        hi = _to_ts(end) if end else None
+        for name in self.manifest()["months"]:
+            month = date.fromisoformat(name + "-01")
+            if (end and month >= end) or (start and _add_months(month, 1) <= start):
+                continue
+            cols = self._month(name)
+            ts = cols["sale_ts"]
+            first = int(np.searchsorted(ts, lo, "left")) if lo is not None else 0
+            last = int(np.searchsorted(ts, hi, "left")) if hi is not None else len(ts)
+            rows = slice(first, last)
+            if site_id is not None:
+                rows = first + np.flatnonzero(cols["site_id"][rows] == site_id)
+                if len(rows):
+                    yield cols, rows
+            elif last > first:
+                yield cols, rows
+
+    def item_totals(self, start=None, end=None, site_id=None):
+        """Quantity sold per item name"""
+        totals = Counter()
+        for cols, rows in self._slices(start, end, site_id):
+            sums = np.bincount(cols["item_code"][rows], weights=cols["quantity"][rows],
+                               minlength=len(cols["items"]))
+            for code in np.flatnonzero(sums):
+                totals[cols["items"][code]] += int(sums[code])
+        return totals
+
+    def item_month_totals(self):
+        """(quantity, revenue) per (site_id, item name, YYYY-MM) over the whole archive"""
+        totals = {}
+        for name in self.manifest()["months"]:
+            cols = self._month(name)
+            keys = cols["site_id"].astype(np.int64) * len(cols["items"]) + cols["item_code"]
+            unique, inverse = np.unique(keys, return_inverse=True)
+            qty = np.bincount(inverse, weights=cols["quantity"])
+            revenue = np.bincount(inverse, weights=cols["quantity"] * cols["price"])
+            for key, q, r in zip(unique, qty, revenue):
+                site_id, code = divmod(int(key), len(cols["items"]))
+                totals[(site_id, cols["items"][code], name)] = (int(q), float(r))
+        return totals
+
+    def item_day_totals(self, start=None, end=None, site_id=None):
+        """Quantity sold per (item name, YYYY-MM-DD)"""
+        totals = Counter()
+        for cols, rows in self._slices(start, end, site_id):
+            days = cols["sale_ts"][rows] // 86400
+            keys = days * len(cols["items"]) + cols["item_code"][rows]
+            unique, inverse = np.unique(keys, return_inverse=True)
+            sums = np.bincount(inverse, weights=cols["quantity"][rows])
+            for key, qty in zip(unique, sums):
+                day, code = divmod(int(key), len(cols["items"]))
+                label = str(np.datetime64(day, "D"))
+                totals[(cols["items"][code], label)] += int(qty)
+        return totals
+
+    def day_revenue(self, start=None, end=None, site_id=None):
+        """Sum of price * quantity per YYYY-MM-DD"""
+        totals = Counter()
+        for cols, rows in self._slices(start, end, site_id):
+            days = cols["sale_ts"][rows] // 86400
+            amounts = cols["price"][rows] * cols["quantity"][rows]
+            unique, inverse = np.unique(days, return_inverse=True)
+            for day, amount in zip(unique, np.bincount(inverse, weights=amounts)):
+                totals[str(np.datetime64(int(day), "D"))] += float(amount)
+        return totals
+
+    def item_weekday_totals(self, start=None, end=None, site_id=None):
+        """Quantity sold per (item_id, weekday name)"""
+        totals = Counter()
+        for cols, rows in self._slices(start, end, site_id):
+            weekday = (cols["sale_ts"][rows] // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+            item_ids = cols["item_id"][rows].astype(np.int64)
+            keys = item_ids * 7 + weekday
+            unique, inverse = np.unique(keys, return_inverse=True)
+            for key, qty in zip(unique, np.bincount(inverse, weights=cols["quantity"][rows])):
+                item_id, day = divmod(int(key), 7)
+                totals[(item_id, WEEKDAYS[day])] += int(qty)
+        return totals
+
+
+    def bucket_totals(self, unit, start=None, end=None, metric="revenue", site_id=None):
+        """Revenue or quantity per hour/day/week/month, keyed by bucket start datetime"""
+        totals = Counter()
+        for cols, rows in self._slices(start, end, site_id):
+            ts = cols["sale_ts"][rows]
+            if unit == "hour":
+                starts = ts // 3600 * 3600
+            elif unit == "day":
+                starts = ts // 86400 * 86400
+            elif unit == "week":
+                days = ts // 86400
+                starts = (days - (days + 3) % 7) * 86400  # back to Monday
+            else:
+                months = ts.astype("datetime64[s]").astype("datetime64[M]")
+                starts = months.astype("datetime64[s]").astype(np.int64)
+            values = cols["quantity"][rows].astype(np.float64)
+            if metric == "revenue":
+                values = values * cols["price"][rows]
+            unique, inverse = np.unique(starts, return_inverse=True)
+            for bucket, value in zip(unique, np.bincount(inverse, weights=values)):
+                totals[np.datetime64(int(bucket), "s").astype(datetime)] += float(value)
+        return totals
+
+
+archive = SalesArchive()
+
+
+def live_filter(column="sale_date", source=None):
+    """(SQL condition, params) limiting a sales query to the rows not in `source` (the archive)"""
+    start = (source or archive).live_start()
+    if start is None:
+        return "1 = 1", ()
+    return f"{column} >= %s", (start.isoformat(),)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import storage
+
+    if sys.argv[1:] != ["compact"]:
+        sys.exit("usage: python sales_archive.py compact")
+    backend = storage.get_backend()
+    dialect = storage.get_dialect(backend)
+    router = storage.create_router(backend, {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASS", ""),
+        "database": os.getenv("DB_NAME", "gastrotrack"),
+    })
+    conn = router.connect(readonly=False)
+    try:
+        months = archive.compact(conn, dialect)
+    finally:
+        conn.close()
+    print(f"Archived {len(months)} month(s): {', '.join(months) or '-'}")
@@ -0,0 +1,218 @@
+"""Server-side session storage for the Flask apps.
+
+Only an opaque session id is kept in the cookie. The session data itself
+lives in process memory or in a local SQLite file, and expired entries are
+swept out every few minutes.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask import current_app, session as current_session
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SESSION_LIFETIME = int(os.getenv("SESSION_LIFETIME", 8 * 60 * 60))  # one kitchen shift
+SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", 300))
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it was changed"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+# --- Stores ---
+class MemorySessionStore:
+    """Keep sessions in a dict; good enough for a single worker"""
+
+    def __init__(self, sweep_interval=SWEEP_INTERVAL):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    def get(self, sid):
+        self._maybe_sweep()
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.time():
+                del self._data[sid]
+                return None
+            return dict(data)
+
+    def set(self, sid, data, lifetime):
+        with self._lock:
+            self._data[sid] = (dict(data), time.time() + lifetime)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self):
+        """Drop every expired session and return how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+            for sid in expired:
+                del self._data[sid]
+        self._last_sweep = time.monotonic()
+        return len(expired)
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= self._sweep_interval:
+            self.sweep()
+
+
+class SQLiteSessionStore(MemorySessionStore):
+    """Keep sessions in a SQLite file so they survive restarts and are shared by workers"""
+
+    def __init__(self, path="sessions.db", sweep_interval=SWEEP_INTERVAL):
+        super().__init__(sweep_interval)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, sid):
+        self._maybe_sweep()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?",
+                (sid, time.time())
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def set(self, sid, data, lifetime):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                    (sid, json.dumps(dict(data)), time.time() + lifetime)
+                )
+        finally:
+            conn.close()
+
+    def delete(self, sid):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        finally:
+            conn.close()
+
+    def sweep(self):
+        conn = self._connect()
+        try:
+            with conn:
+                removed = conn.execute(
+                    "DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)
+                ).rowcount
+        finally:
+            conn.close()
+        self._last_sweep = time.monotonic()
+        return removed
+
+
+def create_session_store():
+    """Build the store selected by SESSION_STORE (memory or sqlite)"""
+    kind = os.getenv("SESSION_STORE", "memory").lower()
+    if kind == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"))
+    if kind == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {kind}")
+
+
+# --- Flask integration ---
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface backed by one of the stores above"""
+
+    def __init__(self, store, lifetime=SESSION_LIFETIME):
+        self.store = store
+        self.lifetime = lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def regenerate(self, session):
+        """Move the session to a fresh id and drop the entry stored under the old one"""
+        if not session.new:
+            self.store.delete(session.sid)
+        session.sid = secrets.token_urlsafe(32)
+        session.new = True
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.store.set(session.sid, session, self.lifetime)
+        elif not session.new:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            max_age=self.lifetime,
+            httponly=self.get_cookie_httponly(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            domain=domain,
+            path=path,
+        )
+
+
+def regenerate():
+    """
+    Give the current request's session a new id. Call it on login so an id
+    planted in the browser beforehand (session fixation) never gets a uid.
+    """
+    current_app.session_interface.regenerate(current_session._get_current_object())
+
+
+def init_app(app, store=None, lifetime=SESSION_LIFETIME):
+    """Switch a Flask app over to server-side sessions"""
+    app.session_interface = ServerSideSessionInterface(store or create_session_store(), lifetime)
+    return app.session_interface.store
@@ -0,0 +1,277 @@
+"""Host-wide cache of computed aggregates, shared by every worker process.
+
+Entries live in a local SQLite file (SHARED_CACHE_PATH, WAL + mmap), so all
+workers of all three apps on a host read the same copy:
+
+    get_or_compute(key, compute, ttl, tags)
+        fresh entry        returned as is
+        expired entry      one worker takes a lease on the key and
+                           recomputes; the others serve the old value for
+                           up to SHARED_CACHE_STALE seconds meanwhile
+        missing entry      one worker computes, the others wait (polling)
+                           for it, and compute themselves after
+                           SHARED_CACHE_WAIT seconds
+    invalidate(*tags)      drops every entry carrying one of the tags and
+                           bumps the tag versions; a value computed while
+                           the tag moved is not stored, so a write racing a
+                           recompute can't leave stale data behind
+
+Because the file is the broadcast medium, an invalidation by any worker
+(e.g. the dashboard logging a sale) is seen by the next read in every other
+worker. Apps invalidate their tags after each successful write request:
+
+    shared_cache = SharedCache().init_app(app, write_tags=("inventory",))
+
+A cached value outlives the request that computed it, so apps compute on
+the primary (readonly=compute_readonly): a value read from a lagging replica
+right after an invalidation would otherwise be stored for the whole TTL.
+
+Values are stored as JSON (Decimal/date handled as in json_provider), so
+they come back the way jsonify would send them. With SHARED_CACHE_PATH
+unset the cache is disabled and get_or_compute() just calls compute().
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import request
+
+from json_provider import default as json_default
+
+CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+DEFAULT_TTL = float(os.getenv("SHARED_CACHE_TTL", 30))  # seconds
+STALE_SECONDS = float(os.getenv("SHARED_CACHE_STALE", 60))
+WAIT_SECONDS = float(os.getenv("SHARED_CACHE_WAIT", 5))
+LEASE_SECONDS = float(os.getenv("SHARED_CACHE_LEASE", 30))  # a crashed worker's lease runs out
+POLL_SECONDS = 0.01
+SWEEP_EVERY = 100  # stores between sweeps of long-expired entries
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_stale ON cache_entries (stale_until);
+CREATE TABLE IF NOT EXISTS cache_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key);
+CREATE TABLE IF NOT EXISTS cache_tag_versions (
+    tag TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache_leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedCache:
+
+    def __init__(self, path=CACHE_PATH, stale_seconds=STALE_SECONDS, wait_seconds=WAIT_SECONDS,
+                 lease_seconds=LEASE_SECONDS, clock=time.time):
+        self.path = path
+        self.stale_seconds = stale_seconds
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self._local = threading.local()
+        self._pid = None
+        self._counter_lock = threading.Lock()
+        self.counters = {"hits": 0, "stale": 0, "misses": 0, "waits": 0, "computes": 0,
+                         "discarded": 0, "invalidations": 0, "failed_invalidations": 0}
+        if self.enabled:
+            self._conn().executescript(SCHEMA)
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    @property
+    def compute_readonly(self):
+        """readonly= for connections computing cached values: the primary while the cache is on"""
+        return False if self.enabled else None
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=67108864")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    # --- Reads ---
+    def _read(self, key):
+        return self._conn().execute(
+            "SELECT value, expires_at, stale_until FROM cache_entries WHERE key = ?", (key,)).fetchone()
+
+    def peek(self, key):
+        """A fresh value for key, or None; never computes"""
+        if not self.enabled:
+            return None
+        row = self._read(key)
+        if row is None or self.clock() >= row[1]:
+            return None
+        self._count("hits")
+        return json.loads(row[0])
+
+    def get_or_compute(self, key, compute, ttl=DEFAULT_TTL, tags=()):
+        """Cached value of compute() under key; at most one worker computes it at a time"""
+        if not self.enabled:
+            return compute()
+        row = self._read(key)
+        if row is not None and self.clock() < row[1]:
+            self._count("hits")
+            return json.loads(row[0])
+
+        self._count("misses")
+        versions = self._versions(tags)
+        lease = self._acquire(key)
+        if lease:
+            return self._compute(key, compute, ttl, tags, versions, lease)
+        if row is not None and self.clock() < row[2]:
+            self._count("stale")
+            return json.loads(row[0])
+
+        # Someone else is computing it: wait for their result
+        deadline = self.clock() + self.wait_seconds
+        while self.clock() < deadline:
+            time.sleep(POLL_SECONDS)
+            row = self._read(key)
+            if row is not None and self.clock() < row[1]:
+                self._count("waits")
+                return json.loads(row[0])
+            lease = self._acquire(key)  # their lease ran out or was released without a value
+            if lease:
+                return self._compute(key, compute, ttl, tags, self._versions(tags), lease)
+        self._count("computes")
+        return json.loads(self._encode(compute()))
+
+    # --- Writes ---
+    def _encode(self, value):
+        return json.dumps(value, default=json_default, separators=(",", ":"))
+
+    def _versions(self, tags):
+        if not tags:
+            return {}
+        placeholders = ", ".join("?" * len(tags))
+        rows = self._conn().execute(
+            f"SELECT tag, version FROM cache_tag_versions WHERE tag IN ({placeholders})", tuple(tags)).fetchall()
+        return dict(rows)
+
+    def _acquire(self, key):
+        """Take the recompute lease on key; returns the owner token or None"""
+        now = self.clock()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT expires_at FROM cache_leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                return None
+            owner = secrets.token_hex(8)
+            conn.execute("INSERT OR REPLACE INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                         (key, owner, now + self.lease_seconds))
+        return owner
+
+    def _compute(self, key, compute, ttl, tags, versions, lease):
+        try:
+            row = self._read(key)  # the previous lease holder may have stored it since we looked
+            if row is not None and self.clock() < row[1]:
+                self._count("waits")
+                return json.loads(row[0])
+            self._count("computes")
+            text = self._encode(compute())
+            self._store(key, text, ttl, tags, versions)
+        finally:
+            self._conn().execute("DELETE FROM cache_leases WHERE key = ? AND owner = ?", (key, lease))
+        return json.loads(text)
+
+    def _store(self, key, text, ttl, tags, versions):
+        now = self.clock()
+        with self._transaction() as conn:
+            if self._versions(tags) != versions:
+                self._count("discarded")  # invalidated while computing
+                return False
+            conn.execute("""
+                INSERT OR REPLACE INTO cache_entries (key, value, expires_at, stale_until)
+                VALUES (?, ?, ?, ?)
+            """, (key, text, now + ttl, now + ttl + self.stale_seconds))
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+            conn.executemany("INSERT INTO cache_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in set(tags)])
+            if secrets.randbelow(SWEEP_EVERY) == 0:
+                self._sweep(conn, now)
+        return True
+
+    def _sweep(self, conn, now):
+        conn.execute("DELETE FROM cache_entries WHERE stale_until < ?", (now,))
+        conn.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)")
+
+    def invalidate(self, *tags):
+        """Drop every entry tagged with any of tags, in every worker; returns entries dropped"""
+        if not self.enabled or not tags:
+            return 0
+        placeholders = ", ".join("?" * len(tags))
+        with self._transaction() as conn:
+            conn.executemany("""
+                INSERT INTO cache_tag_versions (tag, version) VALUES (?, 1)
+                ON CONFLICT (tag) DO UPDATE SET version = version + 1
+            """, [(tag,) for tag in tags])
+            keys = [(key,) for (key,) in conn.execute(
+                f"SELECT DISTINCT key FROM cache_tags WHERE tag IN ({placeholders})", tags)]
+            # Only the tagged entries and their own tag rows: index lookups, no table scans
+            dropped = sum(conn.execute("DELETE FROM cache_entries WHERE key = ?", key).rowcount for key in keys)
+            conn.executemany("DELETE FROM cache_tags WHERE key = ?", keys)
+        self._count("invalidations")
+        return dropped
+
+    def stats(self):
+        """This worker's counters (the entries themselves are shared)"""
+        with self._counter_lock:
+            return dict(self.counters, enabled=self.enabled)
+
+    def init_app(self, app, write_tags=()):
+        """
+        Invalidate write_tags after every successful write request; a
+        callable is asked for the tags of each request (e.g. scoped to a site)
+        """
+        @app.after_request
+        def _invalidate(response):
+            if write_tags and request.method in WRITE_METHODS and response.status_code < 400:
+                try:
+                    self.invalidate(*(write_tags() if callable(write_tags) else write_tags))
+                except sqlite3.Error as err:
+                    # The write is already committed; entries expire within their TTL anyway
+                    self._count("failed_invalidations")
+                    print(f"Shared cache invalidation failed: {err}")
+            return response
+        return self
@@ -0,0 +1,190 @@
+"""Several restaurant locations (sites) served by one deployment.
+
+Sales, waste and inventory rows carry a site_id, and every request works on
+one site. Requests under /sites/<id>/ (e.g. GET /sites/2/api/inventory)
+reach the usual handlers with that site as current(); anything else is
+DEFAULT_SITE_ID. The prefix is moved into SCRIPT_NAME, so routing,
+admission classes and url_for work unchanged while caches keyed by the full
+URL keep sites apart.
+
+Site-scoped queries add site_filter(), which leads the (site_id, ...)
+indexes. A site can also live in a database of its own:
+
+    SITE_DB_HOSTS="2=db-east.internal,3=db-west.internal:3307"   (MySQL)
+    SITE_DB_PATHS="2=/data/site2.db"                             (SQLite)
+
+Sites not listed share the default database. The list of sites is the
+`sites` table of the default database. A site database has its own sales
+archive under SALES_ARCHIVE_DIR/site-<id>; run the archive and partition
+jobs against it with DB_HOST/DB_PATH and SALES_ARCHIVE_DIR pointed there.
+
+Cross-site reports use fan_out(): one call per site on a thread pool, each
+over that site's own read connection, returning the partial aggregates for
+the caller to merge.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_request_context, jsonify, request
+
+import storage
+from circuit_breaker import CircuitOpen
+
+DEFAULT_SITE_ID = int(os.getenv("DEFAULT_SITE_ID", 1))
+SITE_DB_HOSTS = os.getenv("SITE_DB_HOSTS", "")
+SITE_DB_PATHS = os.getenv("SITE_DB_PATHS", "")
+DIRECTORY_TTL = float(os.getenv("SITE_DIRECTORY_TTL", 60))  # seconds between reloads of the sites table
+FANOUT_WORKERS = int(os.getenv("SITE_FANOUT_WORKERS", 8))
+ENVIRON_KEY = "gastrotrack.site_id"
+SITE_PREFIX = re.compile(r"/sites/(\d+)(?=/|$)")
+
+
+def current():
+    """Site of the current request (DEFAULT_SITE_ID outside a request)"""
+    if not has_request_context():
+        return DEFAULT_SITE_ID
+    return request.environ.get(ENVIRON_KEY, DEFAULT_SITE_ID)
+
+
+def site_filter(column="site_id", site_id=None):
+    """(SQL condition, params) limiting a query to one site, the current one by default"""
+    return f"{column} = %s", (current() if site_id is None else site_id,)
+
+
+def tags(*names, site_id=None):
+    """Shared-cache tags scoped to one site, e.g. ("sales@2",)"""
+    site_id = current() if site_id is None else site_id
+    return tuple(f"{name}@{site_id}" for name in names)
+
+
+def parse_map(value):
+    """{site_id: target} from "2=db-east.internal,3=db-west.internal:3307" """
+    targets = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        site_id, _, target = entry.partition("=")
+        targets[int(site_id)] = target.strip()
+    return targets
+
+
+class SitePrefix:
+    """WSGI middleware serving /sites/<id>/<path> as <path> for site <id>"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        match = SITE_PREFIX.match(environ.get("PATH_INFO", ""))
+        if match:
+            environ[ENVIRON_KEY] = int(match.group(1))
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + match.group(0)
+            environ["PATH_INFO"] = environ["PATH_INFO"][match.end():] or "/"
+        return self.wsgi_app(environ, start_response)
+
+
+class SiteRouter:
+    """Connections, sales archives and fan-out per site"""
+
+    def __init__(self, dialect, default, routers=None, directory_ttl=DIRECTORY_TTL):
+        self.dialect = dialect
+        self.default = default  # DatabaseRouter of the shared database
+        self.routers = dict(routers or {})  # site_id -> DatabaseRouter of the site's own database
+        self.directory_ttl = directory_ttl
+        self._directory = None
+        self._loaded_at = 0.0
+        self._archives = {}
+        self._lock = threading.Lock()
+
+    def router(self, site_id=None):
+        return self.routers.get(current() if site_id is None else site_id, self.default)
+
+    def connect(self, readonly=None, site_id=None):
+        return self.router(site_id).connect(readonly)
+
+    def archive(self, site_id=None):
+        """Sales archive of the database the site lives in"""
+        from sales_archive import ARCHIVE_DIR, SalesArchive, archive
+
+        site_id = current() if site_id is None else site_id
+        if site_id not in self.routers:
+            return archive
+        with self._lock:
+            if site_id not in self._archives:
+                self._archives[site_id] = SalesArchive(os.path.join(ARCHIVE_DIR, f"site-{site_id}"))
+            return self._archives[site_id]
+
+    def sites(self):
+        """{site_id: name} from the sites table, reloaded every directory_ttl seconds"""
+        if self._directory is None or time.monotonic() - self._loaded_at >= self.directory_ttl:
+            conn = self.default.connect(readonly=True)
+            try:
+                rows = self.dialect.fetchall(conn, "SELECT site_id, name FROM sites ORDER BY site_id")
+            finally:
+                conn.close()
+            self._directory = {row["site_id"]: row["name"] for row in rows}
+            self._loaded_at = time.monotonic()
+        return self._directory
+
+    def fan_out(self, fn, site_ids=None, max_workers=FANOUT_WORKERS):
+        """
+        Run fn(conn, site_id) for every site in parallel, each over a read
+        connection to the site's database. Returns ({site_id: result},
+        {site_id: error message}) so one unreachable site doesn't sink the
+        whole report.
+        """
+        site_ids = list(self.sites() if site_ids is None else site_ids)
+
+        def run(site_id):
+            conn = self.connect(readonly=True, site_id=site_id)
+            try:
+                return fn(conn, site_id)
+            finally:
+                conn.close()
+
+        results, errors = {}, {}
+        if not site_ids:
+            return results, errors
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(site_ids))) as pool:
+            futures = {site_id: pool.submit(run, site_id) for site_id in site_ids}
+            for site_id, future in futures.items():
+                try:
+                    results[site_id] = future.result()
+                except Exception as e:
+                    errors[site_id] = str(e)
+        return results, errors
+
+    def init_app(self, app):
+        """Serve every route under /sites/<id>/ as well; unknown sites get a 404"""
+        app.wsgi_app = SitePrefix(app.wsgi_app)
+
+        @app.before_request
+        def _check_site():
+            site_id = request.environ.get(ENVIRON_KEY)
+            if site_id is None:
+                return None
+            try:
+                known = self.sites()
+            except storage.DB_ERRORS + (CircuitOpen,):
+                return None  # can't tell while the directory is unreachable
+            if site_id not in known:
+                return jsonify({"error": f"Unknown site {site_id}"}), 404
+            return None
+        return self
+
+
+def create_site_router(backend, mysql_config, default):
+    """SiteRouter giving the sites in SITE_DB_HOSTS / SITE_DB_PATHS their own database"""
+    routers = {}
+    if backend == "mysql":
+        for site_id, target in parse_map(SITE_DB_HOSTS).items():
+            host, _, port = target.partition(":")
+            config = dict(mysql_config, host=host)
+            if port:
+                config["port"] = int(port)
+            routers[site_id] = storage.create_router(backend, config, replicas="")
+    else:
+        for site_id, path in parse_map(SITE_DB_PATHS).items():
+            routers[site_id] = storage.create_router(backend, sqlite_path=path, replicas="")
+    return SiteRouter(storage.get_dialect(backend), default, routers)
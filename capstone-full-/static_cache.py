@@ -0,0 +1,168 @@
+"""In-memory cache for the HTML pages and CSS/JS assets.
+
+Files are read and gzip-compressed once at startup and then served straight
+from memory. Every asset gets a content-hash fingerprint
+(`/assets/dashboard.3f9a1c2b7d.css`) that can be cached forever, and page
+references to local assets are rewritten to the fingerprinted URLs. HTML
+itself is revalidated with an ETag so a returning tablet only gets a 304.
+In debug mode files are re-read when their modification time changes.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+from flask import Response, abort, request
+
+ASSET_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_GZIP_SIZE = 512  # not worth compressing below this
+ASSET_REF_RE = re.compile(r'(?P<attr>href|src)="(?P<name>[\w.-]+\.(?:css|js))"')
+
+
+class CachedFile:
+    """One file held in memory with its fingerprint and gzip body"""
+
+    def __init__(self, path, body, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:10]
+        self.gzipped = gzip.compress(body, 9) if len(body) >= MIN_GZIP_SIZE else None
+        self.content_type = ASSET_TYPES[os.path.splitext(path)[1]]
+
+
+class StaticCache:
+    """Serve pages and assets from `root` out of memory"""
+
+    def __init__(self, root, auto_reload=False, url_prefix="/assets"):
+        self.root = root
+        self.auto_reload = auto_reload
+        self.url_prefix = url_prefix
+        self._files = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    # --- Loading ---
+    def load(self):
+        """(Re)load every asset, then every page so references can be rewritten"""
+        names = sorted(
+            n for n in os.listdir(self.root)
+            if os.path.splitext(n)[1] in ASSET_TYPES
+        )
+        files = {}
+        for name in names:
+            if not name.endswith(".html"):
+                files[name] = self._read(name)
+        for name in names:
+            if name.endswith(".html"):
+                files[name] = self._read(name, files)
+        with self._lock:
+            self._files = files
+
+    def stats(self):
+        """Files held in memory and their size, for the readiness report"""
+        with self._lock:
+            files = list(self._files.values())
+        return {"files": len(files), "bytes": sum(len(f.body) for f in files)}
+
+    def _read(self, name, assets=None):
+        path = os.path.join(self.root, name)
+        with open(path, "rb") as f:
+            body = f.read()
+        if assets is not None:
+            body = self._rewrite(body.decode("utf-8"), assets).encode("utf-8")
+        return CachedFile(path, body, os.path.getmtime(path))
+
+    def _rewrite(self, html, assets):
+        def fingerprint(match):
+            cached = assets.get(match.group("name"))
+            if cached is None:
+                return match.group(0)
+            return f'{match.group("attr")}="{self._url(match.group("name"), cached)}"'
+        return ASSET_REF_RE.sub(fingerprint, html)
+
+    def _url(self, name, cached):
+        stem, ext = os.path.splitext(name)
+        return f"{self.url_prefix}/{stem}.{cached.etag}{ext}"
+
+    def _stale(self):
+        for cached in self._files.values():
+            try:
+                if os.path.getmtime(cached.path) != cached.mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _get(self, name):
+        if self.auto_reload and self._stale():
+            self.load()
+        with self._lock:
+            return self._files.get(name)
+
+    # --- Serving ---
+    def asset_url(self, name):
+        """Fingerprinted URL for a CSS/JS file"""
+        cached = self._get(name)
+        if cached is None:
+            raise KeyError(name)
+        return self._url(name, cached)
+
+    def page(self, name):
+        """Response for an HTML page, revalidated with its ETag"""
+        cached = self._get(name)
+        if cached is None:
+            abort(404)
+        return self._respond(cached, REVALIDATE)
+
+    def asset(self, filename):
+        """Response for `/assets/<stem>.<hash>.<ext>` or the plain file name"""
+        stem, ext = os.path.splitext(filename)
+        base, _, digest = stem.rpartition(".")
+        cached = self._get(base + ext) if base else None
+        if cached is not None and digest == cached.etag:
+            return self._respond(cached, IMMUTABLE)
+        # Outdated fingerprint (a page cached before a deploy) or a plain
+        # file name: serve the current file but make the browser check back
+        if cached is None:
+            cached = self._get(filename)
+        if cached is None or ext == ".html":
+            abort(404)
+        return self._respond(cached, REVALIDATE)
+
+    def _respond(self, cached, cache_control):
+        headers = {
+            "Cache-Control": cache_control,
+            "ETag": f'"{cached.etag}"',
+            "Vary": "Accept-Encoding",
+        }
+        if cached.etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        body = cached.body
+        if cached.gzipped is not None and "gzip" in request.accept_encodings:
+            body = cached.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, content_type=cached.content_type, headers=headers)
+
+    def init_app(self, app):
+        """Register the /assets route on a Flask app"""
+        app.add_url_rule(
+            f"{self.url_prefix}/<path:filename>", "static_assets",
+            lambda filename: self.asset(filename)
+        )
+        return self
+
+
+def create_static_cache(app, root=None):
+    """StaticCache for the app directory; reloads on change when debugging"""
+    root = root or os.path.dirname(os.path.abspath(__file__))
+    auto_reload = app.debug or os.getenv("FLASK_DEBUG") == "1"
+    return StaticCache(root, auto_reload=auto_reload).init_app(app)
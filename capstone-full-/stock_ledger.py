@@ -0,0 +1,214 @@
+"""Append-only stock movement ledger.
+
+Every change to `inventory.stock_level` is also written to `stock_movements`
+as a signed quantity (restock +, sale depletion -, waste -, manual adjust
++/-) in the same transaction, so the ledger and the stock column never
+disagree. `stock_snapshots` holds the stock of every item at a point in
+time; taking one a day (python stock_ledger.py snapshot, from cron) means
+"stock on date X" is the latest snapshot before X plus at most a day of
+movements instead of a replay of the whole history.
+
+Restocks, sales and waste are relative (stock_level = stock_level + delta)
+so concurrent ones commute without row locks. Every write bumps
+inventory.version, which absolute edits use for compare-and-set.
+
+The foreign keys to inventory are ON DELETE RESTRICT: an ingredient with
+history can be disabled but not deleted.
+
+All functions take an open connection and leave the commit to the caller.
+"""
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from sites import DEFAULT_SITE_ID
+
+KINDS = ("restock", "sale", "waste", "adjust")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+Movement = namedtuple("Movement", "item_id kind quantity note", defaults=(None,))
+
+
+def _stamp(at=None):
+    return (at or datetime.now()).strftime(TIMESTAMP_FORMAT)
+
+
+def record(conn, dialect, movements, at=None):
+    """
+    Append movements with one batched insert and apply their net effect to
+    inventory.stock_level with one batched update. Returns the count written.
+    """
+    movements = [m for m in movements if m.quantity]
+    for m in movements:
+        if m.kind not in KINDS:
+            raise ValueError(f"Unknown movement kind: {m.kind}")
+    if not movements:
+        return 0
+
+    stamp = record_only(conn, dialect, movements, at)
+    net = Counter()
+    for m in movements:
+        net[m.item_id] += float(m.quantity)
+    dialect.executemany(conn, """
+        UPDATE inventory
+        SET stock_level = stock_level + %s, version = version + 1, updated_at = %s
+        WHERE item_id = %s
+    """, [(delta, stamp, item_id) for item_id, delta in net.items()])
+    return len(movements)
+
+
+def record_only(conn, dialect, movements, at=None):
+    """Append movements whose effect the caller has already applied to inventory"""
+    stamp = _stamp(at)
+    dialect.executemany(conn, """
+        INSERT INTO stock_movements (item_id, kind, quantity, note, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(m.item_id, m.kind, m.quantity, m.note, stamp) for m in movements])
+    return stamp
+
+
+def set_level(conn, dialect, item_id, level, note=None, at=None):
+    """Set an absolute stock level, recording the difference as an adjustment"""
+    return set_levels(conn, dialect, [(item_id, level, note)], at)
+
+
+def set_levels(conn, dialect, levels, at=None):
+    """Batched set_level for (item_id, level, note) rows; returns rows updated"""
+    stamp = _stamp(at)
+    dialect.executemany(conn, """
+        INSERT INTO stock_movements (item_id, kind, quantity, note, created_at)
+        SELECT item_id, 'adjust', %s - stock_level, %s, %s
+        FROM inventory
+        WHERE item_id = %s AND stock_level <> %s
+    """, [(level, note, stamp, item_id, level) for item_id, level, note in levels])
+    return dialect.executemany(conn, """
+        UPDATE inventory SET stock_level = %s, version = version + 1, updated_at = %s WHERE item_id = %s
+    """, [(level, stamp, item_id) for item_id, level, _ in levels])
+
+
+def deplete_for_sales(conn, dialect, sales, at=None, site_id=DEFAULT_SITE_ID):
+    """
+    Record the ingredient usage of dishes sold at one site. `sales` are
+    (item_name, quantity, ...) rows; recipes come from menu_inventory and
+    deplete that site's inventory. Depletion stops at zero stock, the
+    shortfall goes into the movement note.
+    """
+    sold = Counter()
+    for sale in sales:
+        sold[sale[0]] += int(sale[1])
+    if not sold:
+        return 0
+
+    placeholders = ", ".join(["%s"] * len(sold))
+    recipes = dialect.fetchall(conn, f"""
+        SELECT m.item_name, r.item_id, r.quantity_used, i.stock_level
+        FROM menu_items m
+        JOIN menu_inventory r ON r.menu_id = m.id
+        JOIN inventory i ON i.item_id = r.item_id
+        WHERE i.site_id = %s AND m.item_name IN ({placeholders})
+    """, (site_id,) + tuple(sold))
+
+    used = Counter()
+    stock = {}
+    for row in recipes:
+        used[row["item_id"]] += float(row["quantity_used"]) * sold[row["item_name"]]
+        stock[row["item_id"]] = float(row["stock_level"] or 0)
+
+    movements = []
+    for item_id, quantity in used.items():
+        applied = min(quantity, stock[item_id])
+        note = f"short by {quantity - applied:g}" if applied < quantity else None
+        movements.append(Movement(item_id, "sale", -round(applied, 2), note))
+    return record(conn, dialect, movements, at)
+
+
+def history(conn, dialect, item_id, limit=100):
+    """Latest movements of one item, newest first"""
+    return dialect.fetchall(conn, """
+        SELECT movement_id, kind, quantity, note, created_at
+        FROM stock_movements
+        WHERE item_id = %s
+        ORDER BY created_at DESC, movement_id DESC
+        LIMIT %s
+    """, (item_id, int(limit)))
+
+
+# --- Snapshots ---
+def snapshot(conn, dialect, at=None):
+    """
+    Store every item's stock as of `at`: the current level minus whatever
+    moved after `at`. Returns the number of items captured.
+    """
+    stamp = _stamp(at)
+    dialect.execute(conn, "DELETE FROM stock_snapshots WHERE snapshot_at = %s", (stamp,))
+    rowcount, _ = dialect.execute(conn, """
+        INSERT INTO stock_snapshots (item_id, snapshot_at, stock_level)
+        SELECT i.item_id, %s, i.stock_level - COALESCE(SUM(m.quantity), 0)
+        FROM inventory i
+        LEFT JOIN stock_movements m ON m.item_id = i.item_id AND m.created_at > %s
+        GROUP BY i.item_id, i.stock_level
+    """, (stamp, stamp))
+    return rowcount
+
+
+def stock_at(conn, dialect, at, item_id=None, site_id=DEFAULT_SITE_ID):
+    """
+    {item_id: stock level} of one site's items as of `at`: the latest
+    snapshot at or before `at` plus the movements between the two. Only
+    items with no snapshot that old are worked back from the current level.
+    """
+    stamp = _stamp(at)
+    only_item = "AND s.item_id = %s" if item_id is not None else ""
+    params = (stamp, stamp, site_id) + ((item_id,) if item_id is not None else ())
+    rows = dialect.fetchall(conn, f"""
+        SELECT s.item_id, s.stock_level + COALESCE(SUM(m.quantity), 0) AS stock_level
+        FROM stock_snapshots s
+        JOIN (
+            SELECT item_id, MAX(snapshot_at) AS snapshot_at
+            FROM stock_snapshots
+            WHERE snapshot_at <= %s
+            GROUP BY item_id
+        ) latest ON latest.item_id = s.item_id AND latest.snapshot_at = s.snapshot_at
+        LEFT JOIN stock_movements m
+            ON m.item_id = s.item_id AND m.created_at > s.snapshot_at AND m.created_at <= %s
+        WHERE s.item_id IN (SELECT item_id FROM inventory WHERE site_id = %s) {only_item}
+        GROUP BY s.item_id, s.stock_level
+    """, params)
+    levels = {row["item_id"]: float(row["stock_level"]) for row in rows}
+
+    only_item = "AND i.item_id = %s" if item_id is not None else ""
+    rows = dialect.fetchall(conn, f"""
+        SELECT i.item_id, i.stock_level - COALESCE(SUM(m.quantity), 0) AS stock_level
+        FROM inventory i
+        LEFT JOIN stock_movements m ON m.item_id = i.item_id AND m.created_at > %s
+        WHERE i.site_id = %s {only_item}
+        AND NOT EXISTS (SELECT 1 FROM stock_snapshots s WHERE s.item_id = i.item_id AND s.snapshot_at <= %s)
+        GROUP BY i.item_id, i.stock_level
+    """, params[1:] + (stamp,))
+    for row in rows:
+        levels[row["item_id"]] = float(row["stock_level"])
+    return {item: round(level, 2) for item, level in levels.items()}
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    import storage
+
+    if sys.argv[1:] != ["snapshot"]:
+        sys.exit("usage: python stock_ledger.py snapshot")
+    backend = storage.get_backend()
+    dialect = storage.get_dialect(backend)
+    router = storage.create_router(backend, {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASS", ""),
+        "database": os.getenv("DB_NAME", "gastrotrack"),
+    })
+    conn = router.connect(readonly=False)
+    try:
+        count = snapshot(conn, dialect)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Snapshot of {count} item(s) at {_stamp()}")
@@ -0,0 +1,357 @@
+"""Storage backends and SQL dialects.
+
+Every app can run on MySQL or on an embedded SQLite file, selected with
+DB_BACKEND=mysql|sqlite. Routes write their SQL once with `%s` placeholders
+and build the non-portable parts (date math, day/month names, random order)
+through the dialect, which also knows how to get dict rows out of a
+connection.
+
+The SQLite backend is tuned for many concurrent readers and one writer:
+WAL journal, memory-mapped I/O, a busy timeout instead of immediate
+"database is locked" errors, and one long-lived connection per thread so
+sqlite3's prepared statement cache is reused across requests.
+"""
+import os
+import sqlite3
+import threading
+import urllib.parse
+from datetime import date, datetime
+
+SQLITE_PATH = os.getenv("DB_PATH", "gastrotrack.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+SQLITE_STATEMENT_CACHE = 256
+SQLITE_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gastrotrackdb_sqlite.sql")
+
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July",
+               "August", "September", "October", "November", "December"]
+DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+def to_date(value):
+    """Return a date for DATE/DATETIME values (SQLite hands back strings)"""
+    if value is None or (isinstance(value, date) and not isinstance(value, datetime)):
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def format_date(value):
+    """YYYY-MM-DD string for a DATE value from either backend"""
+    value = to_date(value)
+    return value.strftime("%Y-%m-%d") if value else value
+
+
+# --- Dialects ---
+class MySQLDialect:
+    name = "mysql"
+
+    def sql(self, query):
+        return query
+
+    def cursor(self, conn):
+        return conn.cursor(dictionary=True)
+
+    def fetchall(self, conn, query, params=()):
+        cursor = self.cursor(conn)
+        try:
+            cursor.execute(self.sql(query), params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def execute(self, conn, query, params=()):
+        """Run a statement and return (rowcount, lastrowid)"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(self.sql(query), params)
+            return cursor.rowcount, cursor.lastrowid
+        finally:
+            cursor.close()
+
+    def executemany(self, conn, query, rows):
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(self.sql(query), rows)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def now(self):
+        return "NOW()"
+
+    def today(self):
+        return "CURDATE()"
+
+    def days_ago(self, days):
+        return f"CURDATE() - INTERVAL {int(days)} DAY"
+
+    def date(self, column):
+        return f"DATE({column})"
+
+    def days_until(self, column):
+        return f"DATEDIFF({column}, CURDATE())"
+
+    def month_name(self, column):
+        return f"MONTHNAME({column})"
+
+    def day_name(self, column):
+        return f"DAYNAME({column})"
+
+    def random(self):
+        return "RAND()"
+
+    def bucket_start(self, column, unit):
+        """Start of the hour/day/week (Monday)/month containing column"""
+        return {
+            "hour": f"DATE_ADD(DATE({column}), INTERVAL HOUR({column}) HOUR)",
+            "day": f"DATE({column})",
+            "week": f"DATE({column}) - INTERVAL WEEKDAY({column}) DAY",
+            "month": f"DATE({column}) - INTERVAL (DAYOFMONTH({column}) - 1) DAY",
+        }[unit]
+
+    def upsert_add(self, table, keys, totals, replace=()):
+        """INSERT of one row that adds `totals` into an existing row with the same key"""
+        columns = (*keys, *replace, *totals)
+        updates = [f"{c} = {c} + VALUES({c})" for c in totals] + [f"{c} = VALUES({c})" for c in replace]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+
+class SQLiteDialect(MySQLDialect):
+    name = "sqlite"
+
+    def sql(self, query):
+        return query.replace("%s", "?")
+
+    def cursor(self, conn):
+        cursor = conn.cursor()
+        cursor.row_factory = _dict_row
+        return cursor
+
+    def now(self):
+        return "datetime('now', 'localtime')"
+
+    def today(self):
+        return "date('now', 'localtime')"
+
+    def days_ago(self, days):
+        return f"date('now', 'localtime', '-{int(days)} days')"
+
+    def date(self, column):
+        return f"date({column})"
+
+    def days_until(self, column):
+        return f"CAST(julianday({column}) - julianday(date('now', 'localtime')) AS INTEGER)"
+
+    def month_name(self, column):
+        cases = " ".join(f"WHEN '{i:02d}' THEN '{name}'" for i, name in enumerate(MONTH_NAMES, 1))
+        return f"(CASE strftime('%m', {column}) {cases} END)"
+
+    def day_name(self, column):
+        cases = " ".join(f"WHEN '{i}' THEN '{name}'" for i, name in enumerate(DAY_NAMES))
+        return f"(CASE strftime('%w', {column}) {cases} END)"
+
+    def random(self):
+        return "RANDOM()"
+
+    def bucket_start(self, column, unit):
+        return {
+            "hour": f"strftime('%Y-%m-%d %H:00:00', {column})",
+            "day": f"date({column})",
+            "week": f"date({column}, 'weekday 0', '-6 days')",
+            "month": f"date({column}, 'start of month')",
+        }[unit]
+
+    def upsert_add(self, table, keys, totals, replace=()):
+        columns = (*keys, *replace, *totals)
+        updates = [f"{c} = {c} + excluded.{c}" for c in totals] + [f"{c} = excluded.{c}" for c in replace]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}")
+
+
+DIALECTS = {"mysql": MySQLDialect(), "sqlite": SQLiteDialect()}
+
+
+def get_backend(default="mysql"):
+    backend = os.getenv("DB_BACKEND", default).lower()
+    if backend not in DIALECTS:
+        raise ValueError(f"Unknown DB_BACKEND: {backend}")
+    return backend
+
+
+def get_dialect(backend):
+    return DIALECTS[backend]
+
+
+def db_errors():
+    """Exception classes raised by the database drivers"""
+    errors = (sqlite3.Error,)
+    try:
+        import mysql.connector
+        errors += (mysql.connector.Error,)
+    except ImportError:
+        pass
+    return errors
+
+
+DB_ERRORS = db_errors()
+
+
+def integrity_errors():
+    """Exception classes raised when a constraint (e.g. a RESTRICT foreign key) rejects a write"""
+    errors = (sqlite3.IntegrityError,)
+    try:
+        import mysql.connector
+        errors += (mysql.connector.IntegrityError,)
+    except ImportError:
+        pass
+    return errors
+
+
+INTEGRITY_ERRORS = integrity_errors()
+
+
+# --- SQLite connections ---
+class _ThreadConnection:
+    """
+    A per-thread sqlite3 connection that stays open between requests so its
+    prepared statement cache is reused. close() only ends the transaction.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def is_connected(self):
+        return True
+
+
+_local = threading.local()
+_connect_hooks = []
+_progress_hooks = []
+PROGRESS_STEPS = 1000  # SQLite VM instructions between progress callbacks
+
+
+def on_connect(hook):
+    """Call hook(conn) on every SQLite connection opened from now on (e.g. to trace its queries)"""
+    _connect_hooks.append(hook)
+
+
+def on_progress(hook):
+    """Call hook() every PROGRESS_STEPS VM instructions on SQLite connections opened from now on"""
+    _progress_hooks.append(hook)
+
+
+def set_progress_handler(conn, handler=None):
+    """
+    Make handler() (true = interrupt the statement) the progress handler of
+    a SQLite connection. SQLite keeps a single one per connection, so it
+    also runs the on_progress hooks.
+    """
+    hooks = list(_progress_hooks)
+    if handler is None and not hooks:
+        conn.set_progress_handler(None, 0)
+        return
+
+    def progress():
+        for hook in hooks:
+            hook()
+        return handler() if handler is not None else 0
+    conn.set_progress_handler(progress, PROGRESS_STEPS)
+
+
+def tune_sqlite(conn, readonly=False):
+    """Apply the read-concurrency pragmas to a fresh connection"""
+    if not readonly:
+        # A read-only file keeps the journal mode its writer chose
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, safe with WAL
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def connect_sqlite(path=SQLITE_PATH, reuse=True, readonly=False):
+    """
+    Open (or reuse this thread's) tuned connection to a SQLite file.
+    readonly=True opens an existing file with mode=ro: a missing file
+    raises instead of being created empty, and writes fail.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    target = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro" if readonly else path
+    if reuse and target in connections:
+        return connections[target]
+
+    conn = sqlite3.connect(
+        target,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=SQLITE_STATEMENT_CACHE,
+        detect_types=0,
+        uri=readonly,
+    )
+    conn.row_factory = _dict_row
+    tune_sqlite(conn, readonly)
+    for hook in _connect_hooks:
+        hook(conn)
+    if _progress_hooks:
+        set_progress_handler(conn)
+    if not reuse:
+        return conn
+    connections[target] = _ThreadConnection(conn)
+    return connections[target]
+
+
+def init_sqlite_schema(conn):
+    """Create the SQLite tables and indexes if they don't exist yet"""
+    with open(SQLITE_SCHEMA_FILE, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.commit()
+
+
+# --- Routing ---
+def create_router(backend, mysql_config=None, sqlite_path=SQLITE_PATH, replicas=None):
+    """
+    DatabaseRouter for the chosen backend. MySQL replicas come from
+    DB_REPLICA_HOSTS, SQLite replicas from DB_REPLICA_PATHS, unless
+    `replicas` lists them ("" for none). The primary sits behind a circuit
+    breaker.
+    """
+    from circuit_breaker import CircuitBreaker
+    from db_router import DatabaseRouter, Replica, mysql_router, sqlite_replica_lag
+
+    # DB_BREAKER=0 turns the circuit breaker (circuit_breaker.py) off
+    breaker = CircuitBreaker(backend) if os.getenv("DB_BREAKER", "1") != "0" else None
+    if backend == "mysql":
+        return mysql_router(mysql_config, replica_hosts=replicas, breaker=breaker)
+
+    if replicas is None:
+        replicas = os.getenv("DB_REPLICA_PATHS", "")
+    replica_paths = [p for p in replicas.split(",") if p]
+    return DatabaseRouter(
+        lambda: connect_sqlite(sqlite_path),
+        [Replica(path, lambda path=path: connect_sqlite(path, readonly=True),
+                 sqlite_replica_lag(sqlite_path, path)) for path in replica_paths],
+        breaker=breaker
+    )
@@ -0,0 +1,85 @@
+import unittest
+import threading
+import time
+
+from flask import Flask
+
+from admission import AdmissionController, Limiter
+
+CLASSES = {
+    "critical": (2, 4, 1000, 1),
+    "interactive": (2, 2, 100, 1),
+    "analytics": (1, 0, 0, 5),
+}
+
+
+class TestLimiter(unittest.TestCase):
+
+    def test_queue_then_timeout(self):
+        limiter = Limiter("x", 1, max_queue=1, timeout_ms=50)
+        self.assertTrue(limiter.acquire())
+        started = time.monotonic()
+        self.assertFalse(limiter.acquire())  # waits in the queue, then gives up
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+        threading.Timer(0.02, limiter.release).start()
+        self.assertTrue(limiter.acquire())  # woken by the release
+        stats = limiter.stats()
+        self.assertEqual((stats["admitted"], stats["rejected"], stats["timed_out"]), (2, 1, 1))
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        app = Flask(__name__)
+        self.admission = AdmissionController(CLASSES).init_app(
+            app, classes={"/report": "analytics"}, route_limits={"/report": 1})
+
+        @app.route("/report")
+        def report():
+            self.entered.set()
+            self.release.wait(2)
+            return "report"
+
+        @app.route("/sale", methods=["POST"])
+        def sale():
+            return "ok"
+
+        self.client = app.test_client()
+
+    def test_classification(self):
+        self.assertEqual(self.admission.classify("POST", "/sale"), "critical")
+        self.assertEqual(self.admission.classify("GET", "/sale"), "interactive")
+        self.assertEqual(self.admission.classify("GET", "/report"), "analytics")
+
+    def test_sheds_analytics_but_not_writes(self):
+        worker = threading.Thread(target=lambda: self.client.get("/report"))
+        worker.start()
+        self.assertTrue(self.entered.wait(2))
+
+        shed = self.client.get("/report")
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual(shed.headers["Retry-After"], "5")
+        self.assertEqual(self.client.post("/sale").status_code, 200)
+
+        self.release.set()
+        worker.join()
+        stats = self.client.get("/api/admission/stats").get_json()
+        self.assertEqual(stats["classes"]["critical"]["admitted"], 1)
+        self.assertEqual(stats["routes"]["/report"]["rejected"], 1)
+        self.assertEqual(stats["classes"]["analytics"]["in_flight"], 0)
+
+    def test_lower_class_does_not_queue_behind_waiting_writes(self):
+        critical = self.admission.classes["critical"]
+        critical.queued = 1  # a write is waiting for capacity
+        held = self.admission.classes["interactive"]
+        self.assertTrue(held.acquire() and held.acquire())
+        result = self.admission.admit("GET", "/sale")
+        self.assertEqual(result.name, "interactive")  # shed instead of queued
+        critical.queued = 0
+
+
+if __name__ == "__main__":
+    unittest.main()
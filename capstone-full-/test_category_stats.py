@@ -0,0 +1,95 @@
+import unittest
+import os
+import tempfile
+from datetime import date
+
+import category_stats
+import storage
+from sales_archive import SalesArchive
+
+TODAY = date(2024, 5, 15)
+
+
+class TestCategoryStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dialect = storage.get_dialect("sqlite")
+        self.conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "stats.db"), reuse=False)
+        storage.init_sqlite_schema(self.conn)
+        self.conn.execute("INSERT INTO menu_categories (id, category_name) VALUES (1, 'Drinks'), (2, 'Food')")
+        self.dialect.executemany(self.conn, "INSERT INTO menu_items (id, item_name, category_id) VALUES (%s, %s, %s)",
+                                 [(1, "Latte", 1), (2, "Tea", 1), (3, "Mocha", 1), (4, "PBJ", 2)])
+        self.sales = [
+            ("Latte", 5, "2024-01-03", 4.5),
+            ("Tea", 1, "2024-01-20", 3.0),
+            ("Mocha", 2, "2024-02-10", 5.0),
+            ("PBJ", 4, "2024-05-02", 6.0),
+            ("Latte", 3, "2024-05-02", 4.5),
+            ("Soup", 1, "2024-05-03", 7.0),  # not on the menu: ranked, but no category
+        ]
+        self.dialect.executemany(self.conn, """
+            INSERT INTO sales (item_name, quantity, sale_date, price) VALUES (%s, %s, %s, %s)
+        """, self.sales)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def ranked(self, **kwargs):
+        return [(r["item_name"], r["total_qty"]) for r in category_stats.ranked_items(self.conn, self.dialect, **kwargs)]
+
+    def test_record_sales_keeps_rollups_current(self):
+        category_stats.record_sales(self.conn, self.dialect, self.sales[:4])
+        category_stats.record_sales(self.conn, self.dialect, self.sales[4:])
+        self.conn.commit()
+
+        self.assertEqual(self.ranked(limit=2), [("Latte", 8), ("PBJ", 4)])
+        self.assertEqual(self.ranked(limit=2, best=False), [("Tea", 1), ("Soup", 1)])
+        self.assertEqual(self.ranked(limit=2, category_id=1, best=False), [("Mocha", 2), ("Tea", 1)])
+
+        details = category_stats.category_details(self.conn, self.dialect, "Drinks", limit=2, today=TODAY)
+        self.assertEqual((details["items_sold"], details["total_sales"], details["products_sold"]), (11, 49.0, 3))
+        self.assertEqual([p["name"] for p in details["top_products"]], ["Latte", "Mocha"])
+        self.assertEqual(details["monthly_labels"][0], "2023-06")
+        self.assertEqual(details["monthly_labels"][-1], "2024-05")
+        self.assertEqual(details["monthly_quantity"][-5:], [6, 2, 0, 0, 3])
+        self.assertEqual(details["monthly_trend"][-1], 13.5)
+        self.assertIsNone(category_stats.category_details(self.conn, self.dialect, "Desserts"))
+
+        # Another site's sales land in its own rollup rows
+        category_stats.record_sales(self.conn, self.dialect, [("Tea", 50, "2024-05-04", 3.0)], site_id=2)
+        self.assertEqual(self.ranked(limit=1, site_id=2), [("Tea", 50)])
+        self.assertEqual(self.ranked(limit=1), [("Latte", 8)])
+
+    def test_rebuild_matches_incremental_across_archive(self):
+        archive = SalesArchive(os.path.join(self.tmpdir.name, "archive"))
+        archive.compact(self.conn, self.dialect, today=TODAY, live_months=2)
+        self.assertEqual(archive.live_start(), date(2024, 3, 1))
+
+        category_stats.rebuild(self.conn, self.dialect, archive)
+        self.conn.commit()
+        rebuilt = self.dialect.fetchall(self.conn, "SELECT * FROM category_monthly_sales ORDER BY category_id, month")
+        items = self.dialect.fetchall(self.conn, "SELECT * FROM item_sales_totals ORDER BY item_name")
+
+        self.conn.execute("DELETE FROM category_monthly_sales")
+        self.conn.execute("DELETE FROM item_sales_totals")
+        category_stats.record_sales(self.conn, self.dialect, self.sales)
+        self.assertEqual(self.dialect.fetchall(self.conn, "SELECT * FROM category_monthly_sales ORDER BY category_id, month"),
+                         rebuilt)
+        self.assertEqual(self.dialect.fetchall(self.conn, "SELECT * FROM item_sales_totals ORDER BY item_name"), items)
+
+    def test_drill_down_uses_indexes(self):
+        plan = self.conn.execute(self.dialect.sql("""
+            EXPLAIN QUERY PLAN
+            SELECT item_name, quantity, revenue FROM item_sales_totals
+            WHERE site_id = %s AND category_id = %s ORDER BY quantity DESC, item_name DESC LIMIT 5
+        """), (1, 1)).fetchall()
+        detail = " ".join(row["detail"] for row in plan)
+        self.assertIn("idx_item_sales_totals_site_category_qty", detail)
+        self.assertNotIn("TEMP B-TREE", detail)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from unittest.mock import patch
+
+from flask import Flask, jsonify
+
+import circuit_breaker
+import storage
+from circuit_breaker import CircuitBreaker, CircuitOpen, StaleResponses
+from db_router import DatabaseRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_open_half_open_closed(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(breaker.allow())  # the probe
+        self.assertFalse(breaker.allow())  # only one at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")  # failed probe reopens
+
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.stats()["trips"], 2)
+
+    def test_slow_sqlite_query_is_interrupted(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        conn = breaker.connect(lambda: sqlite3.connect(":memory:"))
+        slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+        with patch.object(circuit_breaker, "QUERY_TIMEOUT_MS", 50):
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute(slow)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpen):
+            breaker.connect(lambda: sqlite3.connect(":memory:"))
+
+
+class TestStaleResponses(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "app.db")
+        conn = storage.connect_sqlite(self.path, reuse=False)
+        conn.execute("CREATE TABLE t (n INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.commit()
+        conn.close()
+
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=self.clock)
+        self.down = False
+        router = DatabaseRouter(self.connect, breaker=self.breaker)
+        app = Flask(__name__)
+        StaleResponses(self.breaker).init_app(app)
+
+        @app.route("/api/count")
+        def count():
+            try:
+                conn = router.connect()
+                rows = conn.execute("SELECT COUNT(*) AS n FROM t").fetchall()
+                conn.close()
+            except Exception as err:
+                return jsonify({"error": str(err)}), 500
+            return jsonify(rows[0])
+
+        @app.route("/api/count", methods=["POST"])
+        def add():
+            return jsonify({"ok": True})
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        if self.down:
+            raise sqlite3.OperationalError("unable to open database file")
+        return storage.connect_sqlite(self.path, reuse=False)
+
+    def test_stale_while_open_then_recovers(self):
+        self.assertEqual(self.client.get("/api/count").get_json(), {"n": 1})
+        self.down = True
+
+        failed = self.client.get("/api/count")  # first failure already falls back
+        self.assertEqual(failed.headers.get("X-Stale"), "true")
+        self.client.get("/api/count")
+        self.assertEqual(self.breaker.state, "open")
+
+        stale = self.client.get("/api/count")
+        self.assertEqual((stale.status_code, stale.get_json()), (200, {"n": 1}))
+        self.assertIn("Response is Stale", stale.headers["Warning"])
+        self.assertEqual(self.client.get("/api/count?x=1").status_code, 503)  # nothing cached
+        write = self.client.post("/api/count")
+        self.assertEqual((write.status_code, write.headers["Retry-After"]), (503, "5"))
+
+        self.down = False
+        self.clock.now = 5  # half-open: next request probes
+        fresh = self.client.get("/api/count")
+        self.assertIsNone(fresh.headers.get("X-Stale"))
+        self.assertEqual(self.breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
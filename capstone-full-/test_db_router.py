@@ -0,0 +1,144 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+import time
+from flask import Flask, jsonify
+
+import storage
+from db_router import DatabaseRouter, Replica
+
+
+class TestDatabaseRouter(unittest.TestCase):
+    """Primary and replica are two local SQLite files with the same schema"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.primary_path = os.path.join(self.tmpdir.name, "primary.db")
+        self.replica_path = os.path.join(self.tmpdir.name, "replica.db")
+        for path, source in ((self.primary_path, "primary"), (self.replica_path, "replica")):
+            conn = sqlite3.connect(path)
+            conn.execute("CREATE TABLE source (name TEXT)")
+            conn.execute("INSERT INTO source VALUES (?)", (source,))
+            conn.commit()
+            conn.close()
+
+        self.replica_lag = 0.0
+        self.router = DatabaseRouter(
+            lambda: sqlite3.connect(self.primary_path),
+            [Replica("replica", lambda: sqlite3.connect(self.replica_path), lambda: self.replica_lag)],
+            max_lag=5, lag_check_interval=0
+        )
+
+        self.app = Flask(__name__)
+        self.router.init_app(self.app)
+
+        @self.app.route("/read", methods=["GET"])
+        @self.app.route("/write", methods=["POST"])
+        def which():
+            conn = self.router.connect()
+            name = conn.execute("SELECT name FROM source").fetchone()[0]
+            conn.close()
+            return jsonify(name)
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(self.client.get("/read").get_json(), "replica")
+        self.assertEqual(self.client.post("/write").get_json(), "primary")
+
+    def test_reads_after_write_stay_on_primary(self):
+        """Test a client reads its own write right after a POST"""
+        self.client.post("/write")
+        self.assertEqual(self.client.get("/read").get_json(), "primary")
+        # A different client is not pinned
+        self.assertEqual(self.app.test_client().get("/read").get_json(), "replica")
+
+    def test_lagging_replica_is_skipped(self):
+        self.replica_lag = 30.0
+        self.assertEqual(self.client.get("/read").get_json(), "primary")
+        self.assertEqual(self.router.status(), {"replica": 30.0})
+
+    def test_lag_probe_runs_outside_the_lock(self):
+        def lag():
+            self.assertFalse(self.router._lock.locked())
+            return 0.0
+        self.router.replicas[0].lag = lag
+        self.assertEqual(self.client.get("/read").get_json(), "replica")
+
+    def test_lag_reading_is_cached_between_checks(self):
+        calls = []
+        self.router.replicas[0].lag = lambda: calls.append(1) or 0.0
+        self.router.lag_check_interval = 60
+        for _ in range(3):
+            self.assertEqual(self.client.get("/read").get_json(), "replica")
+        self.assertEqual(len(calls), 1)
+
+    def test_outside_request_uses_primary(self):
+        conn = self.router.connect()
+        self.assertEqual(conn.execute("SELECT name FROM source").fetchone()[0], "primary")
+        conn.close()
+        conn = self.router.connect(readonly=True)
+        self.assertEqual(conn.execute("SELECT name FROM source").fetchone()[0], "replica")
+        conn.close()
+
+
+class TestSQLiteReplicas(unittest.TestCase):
+    """Replicas built by storage.create_router from DB_REPLICA_PATHS"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.primary_path = os.path.join(self.tmpdir.name, "primary.db")
+        self.replica_path = os.path.join(self.tmpdir.name, "replica.db")
+        for path, source in ((self.primary_path, "primary"), (self.replica_path, "replica")):
+            conn = sqlite3.connect(path)
+            conn.execute("CREATE TABLE source (name TEXT)")
+            conn.execute("INSERT INTO source VALUES (?)", (source,))
+            conn.commit()
+            conn.close()
+        self.app = Flask(__name__)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read(self, router):
+        with self.app.test_request_context("/read"):
+            conn = router.connect()
+            return conn.execute("SELECT name FROM source").fetchone()["name"]
+
+    def router(self, replica_path):
+        router = storage.create_router("sqlite", sqlite_path=self.primary_path, replicas=replica_path)
+        router.lag_check_interval = 0
+        return router
+
+    def test_replica_is_read_only(self):
+        router = self.router(self.replica_path)
+        self.assertEqual(self.read(router), "replica")
+        conn = router.connect(readonly=True)
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO source VALUES ('write')")
+
+    def test_missing_replica_is_not_created(self):
+        missing = os.path.join(self.tmpdir.name, "missing.db")
+        router = self.router(missing)
+        self.assertEqual(self.read(router), "primary")
+        self.assertEqual(router.status(), {missing: None})
+        self.assertFalse(os.path.exists(missing))
+
+    def test_lag_is_how_far_the_primary_wrote_past_the_replica(self):
+        router = self.router(self.replica_path)
+        now = time.time()
+        os.utime(self.replica_path, (now - 60, now - 60))
+        os.utime(self.primary_path, (now, now))
+        self.assertEqual(self.read(router), "primary")
+        self.assertAlmostEqual(router.status()[self.replica_path], 60.0, places=1)
+
+        os.utime(self.replica_path, (now, now))  # refreshed from the primary
+        self.assertEqual(self.read(router), "replica")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sqlite3
+
+from flask import Flask
+
+from db_router import DatabaseRouter
+from health import HealthMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHealthMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.connects = 0
+        self.down = False
+        self.clock = FakeClock()
+        self.monitor = HealthMonitor(DatabaseRouter(self.connect), interval=5, max_probe_age=15, clock=self.clock)
+        self.monitor.start = lambda: self.monitor  # no background thread in tests
+        app = Flask(__name__)
+        self.monitor.init_app(app)
+        self.client = app.test_client()
+
+    def connect(self):
+        self.connects += 1
+        if self.down:
+            raise sqlite3.OperationalError("unable to open database file")
+        return sqlite3.connect(":memory:")
+
+    def test_liveness_does_no_io(self):
+        self.assertEqual(self.client.get("/api/health/live").status_code, 200)
+        self.assertEqual(self.connects, 0)
+
+    def test_readiness_reads_cached_probe(self):
+        self.assertEqual(self.client.get("/api/health/ready").status_code, 503)  # not probed yet
+        self.monitor.probe_once()
+        for _ in range(20):
+            response = self.client.get("/api/health/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()["database"]["ok"])
+        self.assertEqual(self.connects, 1)  # 20 probes, one connection
+
+        self.clock.now += 16
+        self.assertIn("database probe is stale", self.client.get("/api/health").get_json()["reasons"])
+
+        self.down = True
+        self.monitor.probe_once()
+        self.assertEqual(self.client.get("/api/health/ready").get_json()["reasons"], ["database probe failed"])
+
+    def test_components(self):
+        self.monitor.probe_once()
+        self.monitor.add_component("cache", lambda: {"entries": 3})
+        self.assertEqual(self.client.get("/api/health/ready").get_json()["components"]["cache"], {"entries": 3})
+        self.monitor.add_component("queue", lambda: {"ready": False})
+        self.assertEqual(self.client.get("/api/health/ready").status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestRouteBudgets(unittest.TestCase):
+    """Every route of the three apps against a seeded database (see integration.py)"""
+
+    @classmethod
+    def setUpClass(cls):
+        # A fresh interpreter: the apps read DB_BACKEND/DB_PATH when imported.
+        # Time budgets get some headroom as other tests may run alongside
+        time_factor = os.getenv("INTEGRATION_TIME_FACTOR", "2")
+        process = subprocess.run([sys.executable, "integration.py", "--json", "--time-factor", time_factor],
+                                 cwd=HERE, capture_output=True, text=True, timeout=300)
+        try:
+            cls.report = json.loads(process.stdout)
+        except ValueError:
+            raise AssertionError(f"integration.py failed:\n{process.stderr}")
+
+    def test_every_route_has_a_check(self):
+        self.assertEqual(self.report["uncovered"], [])
+
+    def test_routes_within_budget(self):
+        for result in self.report["results"]:
+            with self.subTest(f"{result['app']} {result['method']} {result['path']}"):
+                self.assertEqual(result["failures"], [], result)
+
+    def test_seeded_enough_to_matter(self):
+        self.assertGreater(self.report["seeded"]["sales"], 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import unittest
+import os
+import tempfile
+import threading
+
+import stock_ledger
+import storage
+from inventory_batch import BatchError, BatchFailed, VersionConflict, WriteContention, apply_batch, update_item
+from stock_ledger import Movement
+
+
+class TestInventoryBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dialect = storage.get_dialect("sqlite")
+        self.conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "batch.db"), reuse=False)
+        storage.init_sqlite_schema(self.conn)
+        self.dialect.executemany(self.conn, "INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (%s, %s, %s, 10)",
+                                 [(i, f"Item {i}", 1) for i in range(1, 61)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def apply(self, operations, atomic=True):
+        return apply_batch(self.conn, self.dialect, operations, atomic, db_errors=storage.DB_ERRORS)
+
+    def stock(self, item_id):
+        row = self.conn.execute("SELECT stock_level, status FROM inventory WHERE item_id = ?", (item_id,)).fetchone()
+        return row and (row["stock_level"], row["status"])
+
+    def test_delivery_restock_and_mixed_operations(self):
+        operations = [{"op": "restock", "item_id": i, "quantity": 2} for i in range(1, 60)]
+        operations += [{"op": "disable", "item_id": 1}, {"op": "update", "item_id": 2, "stock_level": 9},
+                       {"op": "delete", "item_id": 60}]
+        results, applied = self.apply(operations)
+        self.assertEqual(applied, 62)
+        self.assertEqual(self.stock(1), (3, "disabled"))
+        self.assertEqual(self.stock(2), (9, "active"))
+        self.assertIsNone(self.stock(60))
+        movements = self.conn.execute("SELECT COUNT(*) AS n FROM stock_movements").fetchone()["n"]
+        self.assertEqual(movements, 60)  # 59 restocks + 1 adjustment
+
+        # Items with ledger history can't be deleted
+        results, applied = self.apply([{"op": "delete", "item_id": 3}], atomic=False)
+        self.assertEqual((applied, results[0]["status"]), (0, "error"))
+        self.assertEqual(self.stock(3), (3, "active"))
+
+    def test_atomic_rejects_whole_batch(self):
+        results, applied = self.apply([{"op": "restock", "item_id": 1, "quantity": 2},
+                                       {"op": "restock", "item_id": 999, "quantity": 2}])
+        self.assertEqual(applied, 0)
+        self.assertEqual([r["status"] for r in results], ["not_applied", "error"])
+        self.assertEqual(self.stock(1), (1, "active"))
+
+        with self.assertRaises(BatchFailed) as failed:
+            self.apply([{"op": "restock", "item_id": 1, "quantity": 2},
+                        {"op": "update", "item_id": 2, "category": "frozen"}])
+        self.assertEqual([r["status"] for r in failed.exception.results], ["not_applied", "error"])
+        self.assertEqual(self.stock(1), (1, "active"))
+
+    def test_best_effort_isolates_failures(self):
+        results, applied = self.apply([
+            {"op": "update", "item_id": 1, "category": "semi-perishable"},
+            {"op": "update", "item_id": 2, "category": "frozen"},  # CHECK constraint
+            {"op": "update", "item_id": 3, "stock_level": 4},
+            {"op": "restock", "item_id": 999, "quantity": 1},
+        ], atomic=False)
+        self.assertEqual(applied, 2)
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "ok", "error"])
+        self.assertEqual(self.stock(3), (4, "active"))
+
+    def test_malformed_batch(self):
+        with self.assertRaises(BatchError):
+            self.apply([])
+        with self.assertRaises(BatchError):
+            self.apply({"op": "restock"})
+
+
+class TestOptimisticConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cas.db")
+        self.dialect = storage.get_dialect("sqlite")
+        conn = self.connect()
+        storage.init_sqlite_schema(conn)
+        conn.execute("INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (1, 'Milk', 0, 10)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def connect(self):
+        return storage.connect_sqlite(self.path, reuse=False)
+
+    def row(self):
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT stock_level, capacity, version FROM inventory WHERE item_id = 1").fetchone()
+        finally:
+            conn.close()
+
+    def run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_stale_version_is_rejected(self):
+        conn = self.connect()
+        self.assertEqual(update_item(conn, self.dialect, 1, {"stock_level": 4}, version=1), 2)
+        conn.commit()
+        with self.assertRaises(VersionConflict) as conflict:
+            update_item(conn, self.dialect, 1, {"stock_level": 9}, version=1)
+        conn.rollback()
+        conn.close()
+        self.assertEqual(conflict.exception.current["version"], 2)
+        self.assertEqual(self.row()["stock_level"], 4)
+        self.assertIsNone(update_item(self.connect(), self.dialect, 99, {"capacity": 1}, version=1))
+
+    def test_unversioned_update_never_conflicts(self):
+        class Racing(storage.SQLiteDialect):
+            def execute(self, conn, query, params=()):
+                if query.lstrip().startswith("UPDATE inventory"):
+                    return 0, None  # another writer got there first, every time
+                return super().execute(conn, query, params)
+
+        conn = self.connect()
+        with self.assertRaises(WriteContention):
+            update_item(conn, Racing(), 1, {"capacity": 5, "stock_level": 7})
+        conn.commit()
+        # Each lost attempt was rolled back, its ledger adjustment with it
+        self.assertEqual(conn.execute("SELECT COUNT(*) AS n FROM stock_movements").fetchone()["n"], 0)
+        conn.close()
+
+    def test_ledger_delta_comes_from_the_replaced_row(self):
+        conn = self.connect()
+        self.assertEqual(update_item(conn, self.dialect, 1, {"stock_level": 6, "note": "recount"}), 2)
+        self.assertEqual(update_item(conn, self.dialect, 1, {"stock_level": 6}), 3)  # unchanged: no movement
+        conn.commit()
+        [movement] = stock_ledger.history(conn, self.dialect, 1)
+        conn.close()
+        self.assertEqual((movement["kind"], movement["quantity"], movement["note"]), ("adjust", 6, "recount"))
+
+    def test_parallel_restocks_commute(self):
+        def restock():
+            conn = self.connect()
+            for _ in range(25):
+                stock_ledger.record(conn, self.dialect, [Movement(1, "restock", 1)])
+                conn.commit()
+            conn.close()
+
+        self.run_threads(restock)
+        self.assertEqual(self.row()["stock_level"], 200)
+        conn = self.connect()
+        self.assertEqual(stock_ledger.stock_at(conn, self.dialect, None, item_id=1), {1: 200})
+        conn.close()
+
+    def test_compare_and_set_loses_no_updates(self):
+        def bump_capacity():
+            conn = self.connect()
+            for _ in range(10):
+                while True:  # read-modify-write, retried on conflict
+                    row = self.dialect.fetchall(conn, "SELECT capacity, version FROM inventory WHERE item_id = 1")[0]
+                    try:
+                        update_item(conn, self.dialect, 1, {"capacity": row["capacity"] + 1}, row["version"])
+                        conn.commit()
+                        break
+                    except VersionConflict:
+                        conn.rollback()
+            conn.close()
+
+        self.run_threads(bump_capacity)
+        row = self.row()
+        self.assertEqual(row["capacity"], 90)
+        self.assertEqual(row["version"], 81)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from flask import Flask, jsonify
+
+import json_provider
+
+ROW = {
+    "stock_level": Decimal("7.50"),
+    "expiry_date": date(2024, 1, 31),
+    "created_at": datetime(2024, 1, 2, 9, 30, 5),
+    "prep_time": timedelta(minutes=90),
+    "count": np.int64(3),
+    "name": "Milk",
+}
+EXPECTED = {
+    "stock_level": 7.5,
+    "expiry_date": "2024-01-31",
+    "created_at": "2024-01-02 09:30:05",
+    "prep_time": "1:30:00",
+    "count": 3,
+    "name": "Milk",
+}
+
+
+class TestJSONProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.fast = json_provider.orjson
+        self.app = Flask(__name__)
+        json_provider.init_app(self.app)
+
+        conn = sqlite3.connect(":memory:")
+        conn.row_factory = sqlite3.Row
+        sqlite_row = conn.execute("SELECT 1 AS item_id, 'Milk' AS item_name").fetchone()
+        conn.close()
+
+        @self.app.route("/rows")
+        def rows():
+            return jsonify([ROW, sqlite_row])
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        json_provider.orjson = self.fast
+
+    def check(self):
+        response = self.client.get("/rows")
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.get_json(), [EXPECTED, {"item_id": 1, "item_name": "Milk"}])
+        return response.get_data()
+
+    def test_stdlib_and_orjson_agree(self):
+        json_provider.orjson = None
+        stdlib = self.check()
+        if self.fast is None:
+            self.skipTest("orjson not installed")
+        json_provider.orjson = self.fast
+        self.assertEqual(self.check(), stdlib)
+
+    def test_unknown_types_still_fail(self):
+        with self.app.app_context():
+            with self.assertRaises(TypeError):
+                self.app.json.dumps({"value": object()})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+import os
+import re
+import tempfile
+from datetime import date, datetime
+
+import partitions
+import storage
+
+
+class RecordingMySQL(storage.MySQLDialect):
+    """MySQL dialect answering the catalog queries from a list of partition names"""
+
+    def __init__(self, held=(), oldest=None, strays=False, tables=(), empty=()):
+        self.held = list(held)
+        self.oldest = oldest
+        self.strays = strays
+        self.tables = set(tables)  # detached tables already there (and no longer partitioned)
+        self.empty = set(empty)  # partitions without rows
+        self.statements = []
+
+    def fetchall(self, conn, query, params=()):
+        if "information_schema.PARTITIONS" in query:
+            return [] if params[0] in self.tables else [{"name": name} for name in self.held]
+        if "information_schema.TABLES" in query:
+            return [{"found": 1}] if params[0] in self.tables else []
+        if "MIN(" in query:
+            return [{"oldest": self.oldest}]
+        if " < " not in query:
+            return [] if re.search(r"PARTITION \((\w+)\)", query).group(1) in self.empty else [{"found": 1}]
+        return [{"found": 1}] if self.strays else []
+
+    def execute(self, conn, query, params=()):
+        self.statements.append(re.sub(r"\s+", " ", query).strip())
+        return 0, None
+
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+
+class TestMySQLPartitions(unittest.TestCase):
+
+    def test_partition_existing_table_from_oldest_row(self):
+        dialect = RecordingMySQL(oldest=datetime(2024, 1, 15, 9, 30))
+        created = partitions.ensure_partitions(FakeConnection(), dialect, "sales", today=date(2024, 5, 10), ahead=3)
+        self.assertEqual(created, ["p202401", "p202402", "p202403", "p202404", "p202405", "p202406",
+                                   "p202407", "p202408"])
+        statement, = dialect.statements
+        self.assertTrue(statement.startswith("ALTER TABLE sales PARTITION BY RANGE COLUMNS (sale_date) ("))
+        self.assertIn("PARTITION p202401 VALUES LESS THAN ('2024-02-01')", statement)
+        self.assertTrue(statement.endswith("PARTITION p202408 VALUES LESS THAN ('2024-09-01'), "
+                                           "PARTITION pmax VALUES LESS THAN (MAXVALUE) )"))
+
+    def test_future_months_split_off_pmax(self):
+        dialect = RecordingMySQL(held=["p202404", "p202405", "p202406", "pmax"])
+        created = partitions.ensure_partitions(FakeConnection(), dialect, "waste", today=date(2024, 5, 10), ahead=3)
+        self.assertEqual(created, ["p202407", "p202408"])
+        self.assertEqual(dialect.statements, [
+            "ALTER TABLE waste REORGANIZE PARTITION pmax INTO ( "
+            "PARTITION p202407 VALUES LESS THAN ('2024-08-01'), "
+            "PARTITION p202408 VALUES LESS THAN ('2024-09-01'), "
+            "PARTITION pmax VALUES LESS THAN (MAXVALUE) )"
+        ])
+
+        dialect.held[-1:] = ["p202407", "p202408", "pmax"]
+        dialect.statements.clear()
+        self.assertEqual(partitions.ensure_partitions(FakeConnection(), dialect, "waste",
+                                                      today=date(2024, 5, 10), ahead=3), [])
+        self.assertEqual(dialect.statements, [])
+
+    def test_retention_detaches_whole_partitions(self):
+        dialect = RecordingMySQL(held=["p202303", "p202304", "p202305", "pmax"])
+        retired = partitions.apply_retention(FakeConnection(), dialect, "waste", 12,
+                                             today=date(2024, 5, 10), action="detach")
+        self.assertEqual(retired, ["2023-03", "2023-04"])
+        self.assertEqual(dialect.statements[:4], [
+            "CREATE TABLE waste_p202303 LIKE waste",
+            "ALTER TABLE waste_p202303 REMOVE PARTITIONING",
+            "ALTER TABLE waste EXCHANGE PARTITION p202303 WITH TABLE waste_p202303",
+            "ALTER TABLE waste DROP PARTITION p202303",
+        ])
+        self.assertFalse(any(s.startswith("DELETE") for s in dialect.statements))
+
+    def test_detach_resumes_after_a_partial_run(self):
+        dialect = RecordingMySQL(held=["p202303", "pmax"], tables=["waste_p202303"], empty=["p202303"])
+        self.assertEqual(partitions.retire_month(FakeConnection(), dialect, "waste", date(2023, 3, 1), "detach"),
+                         "partition")
+        self.assertEqual(dialect.statements, ["ALTER TABLE waste DROP PARTITION p202303"])
+
+    def test_backdated_rows_keep_the_oldest_partition(self):
+        dialect = RecordingMySQL(held=["p202401", "pmax"], strays=True)
+        self.assertEqual(partitions.retire_month(FakeConnection(), dialect, "sales", date(2024, 1, 1)), "rows")
+        self.assertEqual(dialect.statements,
+                         ["DELETE FROM sales WHERE sale_date >= %s AND sale_date < %s"])
+
+
+class TestSQLiteFallback(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dialect = storage.get_dialect("sqlite")
+        self.conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "waste.db"), reuse=False)
+        storage.init_sqlite_schema(self.conn)
+        self.conn.execute("INSERT INTO inventory (item_id, item_name) VALUES (1, 'Milk')")
+        self.dialect.executemany(self.conn, "INSERT INTO waste (item_id, quantity, date_logged) VALUES (%s, %s, %s)", [
+            (1, 2, "2022-12-30 10:00:00"),
+            (1, 1, "2023-02-01 08:00:00"),
+            (1, 4, "2024-05-01 08:00:00"),
+        ])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def test_retention_moves_old_months_out(self):
+        self.assertEqual(partitions.ensure_partitions(self.conn, self.dialect, "waste"), [])
+        retired = partitions.apply_retention(self.conn, self.dialect, "waste", 12,
+                                             today=date(2024, 5, 10), action="detach")
+        self.assertEqual(retired, ["2022-12", "2023-02"])
+        left = self.dialect.fetchall(self.conn, "SELECT date_logged FROM waste")
+        self.assertEqual([r["date_logged"] for r in left], ["2024-05-01 08:00:00"])
+        moved = self.dialect.fetchall(self.conn, "SELECT quantity FROM waste_p202212")
+        self.assertEqual(moved, [{"quantity": 2}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import threading
+import time
+
+from flask import Flask
+
+from profiler import SamplingProfiler
+
+HEADERS = {"X-Admin-Token": "secret"}
+
+
+def execute(query):
+    """Stands in for a cursor execute blocked on the database"""
+    time.sleep(0.15)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        self.profiler = SamplingProfiler(token="secret").init_app(app)
+
+        @app.route("/slow")
+        def slow():
+            execute("SELECT item_name,\n       SUM(quantity) FROM sales")
+            return "done"
+
+        @app.route("/fast")
+        def fast():
+            return "done"
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.profiler.stop()
+
+    def test_next_requests_to_one_route(self):
+        started = self.client.post("/api/admin/profiler/start", headers=HEADERS,
+                                   json={"requests": 1, "route": "/slow", "interval_ms": 2})
+        self.assertEqual(started.status_code, 202)
+        self.assertEqual(self.client.post("/api/admin/profiler/start", headers=HEADERS,
+                                          json={"seconds": 5}).status_code, 409)
+
+        self.client.get("/fast")  # other routes are not sampled
+        self.client.get("/slow")
+        status = self.client.get("/api/admin/profiler", headers=HEADERS).get_json()
+        self.assertFalse(status["running"])  # stopped after the one request
+        self.assertEqual(status["requests_profiled"], 1)
+        self.assertGreater(status["samples"], 10)
+
+        folded = self.client.get("/api/admin/profiler/result", headers=HEADERS).get_data(as_text=True)
+        heaviest = folded.splitlines()[0]
+        stack, count = heaviest.rsplit(" ", 1)
+        self.assertTrue(stack.startswith("GET /slow;"))
+        self.assertIn("slow (test_profiler.py);execute (test_profiler.py)", stack)
+        self.assertTrue(stack.endswith(";SQL: SELECT item_name, SUM(quantity) FROM sales"))
+        self.assertNotIn("/fast", folded)
+        self.assertGreater(int(count), 0)
+
+    def test_time_limited_session_ends_itself(self):
+        self.profiler.start(seconds=0.05, interval_ms=5)
+        time.sleep(0.2)
+        self.assertIsNone(self.profiler.session)
+        self.assertFalse(self.profiler.last.report()["running"])
+
+    def test_result_while_running(self):
+        """Test the result can be read while the sampler is still adding stacks"""
+        self.profiler.start(requests=1, route="/slow", interval_ms=1)
+        reader = threading.Thread(target=self.client.get, args=("/slow",))
+        reader.start()
+        while reader.is_alive():
+            self.profiler.collapsed()
+        reader.join()
+        self.assertTrue(self.profiler.collapsed().startswith("GET /slow;"))
+
+    def test_admin_only(self):
+        self.assertEqual(self.client.get("/api/admin/profiler").status_code, 403)
+        self.assertEqual(self.client.post("/api/admin/profiler/start", headers=HEADERS,
+                                          json={"seconds": 1, "requests": 1}).status_code, 400)
+        self.profiler.token = ""
+        self.assertEqual(self.client.get("/api/admin/profiler", headers=HEADERS).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
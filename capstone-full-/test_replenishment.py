@@ -0,0 +1,119 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+import storage
+from replenishment import draft_purchase_order, plan_replenishment
+
+TODAY = date(2024, 3, 1)
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Sales logged through dashboard's POST /api/sales, then read back as usage.
+# A fresh interpreter, as the app reads DB_PATH when imported.
+POSTED_SALES = """
+import json, sys
+from datetime import date
+import storage
+conn = storage.connect_sqlite(sys.argv[1], reuse=False)
+storage.init_sqlite_schema(conn)
+conn.execute("INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (1, 'Milk', 100, 100)")
+conn.execute("INSERT INTO menu_items (id, item_name) VALUES (1, 'Latte')")
+conn.execute("INSERT INTO menu_inventory (menu_id, item_id, quantity_used) VALUES (1, 1, 5)")
+conn.commit()
+import dashboard
+from replenishment import load_usage
+client = dashboard.app.test_client()
+statuses = [client.post("/api/sales", json={"dish": "Latte", "qty": 1, "date": date.today().isoformat()}).status_code for _ in range(5)]
+json.dump({"statuses": statuses, "usage": load_usage(conn, storage.get_dialect("sqlite"), 28)}, sys.stdout)
+"""
+
+
+def item(item_id, stock, capacity=100, category="semi-perishable", expiry=None, lead=None):
+    return {"item_id": item_id, "item_name": f"Item {item_id}", "stock_level": stock, "capacity": capacity,
+            "category": category, "unit_cost": 2.0, "expiry_date": expiry, "lead_time_days": lead}
+
+
+def steady_usage(item_id, per_day, days=28):
+    return [{"item_id": item_id, "day": (TODAY - timedelta(days=d)).isoformat(), "used": per_day}
+            for d in range(days)]
+
+
+class TestPlanReplenishment(unittest.TestCase):
+
+    def test_orders_below_reorder_point_only(self):
+        items = [item(1, 5), item(2, 80)]
+        usage = steady_usage(1, 4) + steady_usage(2, 4)
+        plan = plan_replenishment(items, usage, today=TODAY, lead_time_days=2, review_days=7)
+        self.assertEqual([line["item_id"] for line in plan["lines"]], [1])
+        line = plan["lines"][0]
+        self.assertEqual(line["daily_usage"], 4.0)
+        self.assertEqual(line["reorder_point"], 8.0)  # steady usage -> no safety stock
+        self.assertEqual(line["order_quantity"], 31.0)  # 4 * (2 + 7) - 5
+        self.assertEqual(plan["total_cost"], 62.0)
+
+    def test_capacity_and_shelf_life_cap_the_order(self):
+        items = [item(1, 0, capacity=10), item(2, 0, category="perishable")]
+        plan = plan_replenishment(items, steady_usage(1, 4) + steady_usage(2, 4), today=TODAY,
+                                  lead_time_days=2, review_days=7)
+        quantities = {line["item_id"]: line["order_quantity"] for line in plan["lines"]}
+        self.assertEqual(quantities[1], 10.0)  # only room for 10
+        self.assertEqual(quantities[2], 20.0)  # 5 days of shelf life
+
+    def test_stock_expiring_before_use_is_not_counted(self):
+        items = [item(1, 50, expiry=(TODAY + timedelta(days=1)).isoformat())]
+        plan = plan_replenishment(items, steady_usage(1, 4), today=TODAY, lead_time_days=2)
+        self.assertEqual(plan["lines"][0]["usable_stock"], 4.0)
+
+    def test_thousands_of_skus_well_under_a_second(self):
+        rng = np.random.default_rng(7)
+        items = [item(i, float(rng.uniform(0, 50))) for i in range(1, 5001)]
+        usage = [{"item_id": i, "day": (TODAY - timedelta(days=d)).isoformat(), "used": float(rng.poisson(3))}
+                 for i in range(1, 5001) for d in range(0, 28, 2)]
+        started = time.perf_counter()
+        plan = plan_replenishment(items, usage, today=TODAY)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(plan["skus_evaluated"], 5000)
+        self.assertTrue(plan["lines"])
+
+
+class TestDraftPurchaseOrder(unittest.TestCase):
+
+    def test_usage_from_recipes_and_waste(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dialect = storage.get_dialect("sqlite")
+            conn = storage.connect_sqlite(os.path.join(tmp, "inventory.db"), reuse=False)
+            storage.init_sqlite_schema(conn)
+            conn.execute("INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (1, 'Milk', 1, 50)")
+            conn.execute("INSERT INTO menu_items (id, item_name) VALUES (1, 'Latte')")
+            conn.execute("INSERT INTO menu_inventory (menu_id, item_id, quantity_used) VALUES (1, 1, 0.5)")
+            conn.execute("INSERT INTO sales (item_id, item_name, quantity, sale_date) "
+                         "VALUES (1, 'Latte', 28, datetime('now', 'localtime'))")
+            conn.execute("INSERT INTO waste (item_id, quantity, date_logged) "
+                         "VALUES (1, 14, datetime('now', 'localtime'))")
+            conn.commit()
+            plan = draft_purchase_order(conn, dialect)
+            conn.close()
+        self.assertEqual(plan["lines"][0]["daily_usage"], 1.0)  # (28 * 0.5 + 14) / 28 days
+
+    def test_usage_of_sales_posted_to_the_dashboard(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "dashboard.db")
+            env = dict(os.environ, DB_BACKEND="sqlite", DB_PATH=db_path, DB_REPLICA_PATHS="", SITE_DB_PATHS="",
+                       SHARED_CACHE_PATH="", SALES_BUFFERED_INGEST="0", SALES_ARCHIVE_DIR=os.path.join(tmp, "archive"))
+            process = subprocess.run([sys.executable, "-c", POSTED_SALES, db_path], cwd=HERE, env=env,
+                                     capture_output=True, text=True, timeout=60)
+            self.assertEqual(process.returncode, 0, process.stderr)
+        report = json.loads(process.stdout)
+        self.assertEqual(report["statuses"], [200] * 5)
+        self.assertEqual([(row["item_id"], row["used"]) for row in report["usage"]], [(1, 25)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, datetime
+from unittest import mock
+
+import partitions
+import storage
+from sales_archive import SalesArchive
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BACKDATED_POST = """
+import json, sys
+from datetime import date
+import storage
+from sales_archive import archive
+conn = storage.connect_sqlite(sys.argv[1], reuse=False)
+storage.init_sqlite_schema(conn)
+conn.execute("INSERT INTO sales (item_name, quantity, price, sale_date) VALUES ('Latte', 3, 4.5, '2024-01-03')")
+conn.commit()
+archive.compact(conn, storage.get_dialect("sqlite"), today=date(2024, 5, 15), live_months=2)
+import dashboard
+client = dashboard.app.test_client()
+posted = client.post("/api/sales", json={"dish": "Latte", "qty": 7, "date": "2024-01-03"})
+series = client.get("/api/sales/series?from=2024-01-03&to=2024-01-03&metric=quantity")
+json.dump({"status": posted.status_code, "errors": posted.get_json().get("errors"),
+           "series": series.get_json()["datasets"][0]["data"]}, sys.stdout)
+"""
+
+
+class TestSalesArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dialect = storage.get_dialect("sqlite")
+        self.conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "sales.db"), reuse=False)
+        storage.init_sqlite_schema(self.conn)
+        self.conn.execute("INSERT INTO menu_items (id, item_name) VALUES (1, 'Latte'), (2, 'PBJ')")
+        self.rows = [
+            (1, "Latte", 2, 4.5, "2024-01-03 09:15:00"),
+            (2, "PBJ", 1, 6.0, "2024-01-31 23:59:00"),
+            (1, "Latte", 3, 4.5, "2024-02-10 12:00:00"),
+            (1, "Latte", 1, 4.5, "2024-05-02 08:00:00"),  # still live
+        ]
+        self.dialect.executemany(self.conn, """
+            INSERT INTO sales (item_id, item_name, quantity, price, sale_date) VALUES (%s, %s, %s, %s, %s)
+        """, self.rows)
+        self.conn.commit()
+        self.archive = SalesArchive(os.path.join(self.tmpdir.name, "archive"))
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def compact(self):
+        return self.archive.compact(self.conn, self.dialect, today=date(2024, 5, 15), live_months=2)
+
+    def test_compact_moves_closed_months(self):
+        self.assertEqual(self.compact(), ["2024-01", "2024-02"])
+        self.assertEqual(self.archive.live_start(), date(2024, 3, 1))
+        live = self.dialect.fetchall(self.conn, "SELECT sale_date FROM sales")
+        self.assertEqual([r["sale_date"] for r in live], ["2024-05-02 08:00:00"])
+        # Nothing left to do on a second run
+        self.assertEqual(self.compact(), [])
+
+    def test_failed_retire_is_retried(self):
+        retire = partitions.retire_month
+
+        def fail_february(conn, dialect, table, month):
+            if month == date(2024, 2, 1):
+                raise RuntimeError("lock wait timeout")
+            return retire(conn, dialect, table, month)
+
+        with mock.patch("partitions.retire_month", side_effect=fail_february):
+            with self.assertRaises(RuntimeError):
+                self.compact()
+        self.assertEqual(self.archive.manifest()["retiring"], ["2024-02"])
+
+        with mock.patch("partitions.retire_month", side_effect=retire) as retried:
+            self.assertEqual(self.compact(), [])
+        self.assertEqual(retried.call_count, 1)
+        self.assertEqual(self.archive.manifest()["retiring"], [])
+        live = self.dialect.fetchall(self.conn, "SELECT sale_date FROM sales")
+        self.assertEqual([r["sale_date"] for r in live], ["2024-05-02 08:00:00"])
+        self.assertEqual(self.archive.item_totals(), Counter({"Latte": 5, "PBJ": 1}))
+
+    def test_rows_written_before_the_watermark_are_merged(self):
+        self.compact()
+        self.dialect.execute(self.conn, """
+            INSERT INTO sales (item_id, item_name, quantity, price, sale_date) VALUES (2, 'PBJ', 7, 6.0, '2024-01-31')
+        """)
+        self.dialect.execute(self.conn, """
+            INSERT INTO sales (item_id, item_name, quantity, price, sale_date) VALUES (1, 'Latte', 4, 4.5, '2023-12-24')
+        """)
+        self.assertEqual(self.compact(), [])
+        self.assertEqual(self.archive.manifest()["months"], ["2023-12", "2024-01", "2024-02"])
+        self.assertEqual(self.archive.item_day_totals()[("PBJ", "2024-01-31")], 8)
+        self.assertEqual(self.archive.item_totals(), Counter({"Latte": 9, "PBJ": 8}))
+        self.assertEqual(self.archive.day_revenue()["2024-01-03"], 9.0)
+        live = self.dialect.fetchall(self.conn, "SELECT COUNT(*) AS n FROM sales")
+        self.assertEqual(live[0]["n"], 1)
+
+    def test_aggregates_match_source_rows(self):
+        self.compact()
+        self.assertEqual(self.archive.item_totals(), Counter({"Latte": 5, "PBJ": 1}))
+        self.assertEqual(self.archive.item_day_totals()[("PBJ", "2024-01-31")], 1)
+        self.assertEqual(self.archive.day_revenue()["2024-02-10"], 13.5)
+        self.assertEqual(self.archive.item_weekday_totals()[(1, "Wednesday")], 2)  # 2024-01-03
+        months = self.archive.bucket_totals("month", metric="quantity")
+        self.assertEqual(months, Counter({datetime(2024, 1, 1): 3, datetime(2024, 2, 1): 3}))
+        weeks = self.archive.bucket_totals("week", end=date(2024, 1, 8))
+        self.assertEqual(weeks, Counter({datetime(2024, 1, 1): 9.0}))
+
+    def test_range_scans(self):
+        """Test [start, end) filtering inside and across month files"""
+        self.compact()
+        self.assertEqual(self.archive.item_totals(date(2024, 1, 4), date(2024, 2, 1)), Counter({"PBJ": 1}))
+        self.assertEqual(self.archive.item_totals(date(2024, 2, 1)), Counter({"Latte": 3}))
+
+    def test_dashboard_rejects_sales_dated_before_the_watermark(self):
+        db_path = os.path.join(self.tmpdir.name, "dashboard.db")
+        env = dict(os.environ, DB_BACKEND="sqlite", DB_PATH=db_path, DB_REPLICA_PATHS="", SITE_DB_PATHS="",
+                   SHARED_CACHE_PATH="", SALES_BUFFERED_INGEST="0",
+                   SALES_ARCHIVE_DIR=os.path.join(self.tmpdir.name, "dashboard-archive"))
+        process = subprocess.run([sys.executable, "-c", BACKDATED_POST, db_path], cwd=HERE, env=env,
+                                 capture_output=True, text=True, timeout=60)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        report = json.loads(process.stdout)
+        self.assertEqual(report["status"], 400)
+        self.assertEqual(report["errors"], ["Sales before 2024-03-01 are archived and can't be added"])
+        self.assertEqual(report["series"], [3.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
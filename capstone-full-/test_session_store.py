@@ -0,0 +1,126 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import MagicMock
+from flask import Flask, session
+
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore
+from user_cache import UserIndex, find_login_user, require_role
+
+
+class TestSessionStores(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.stores = [
+            MemorySessionStore(),
+            SQLiteSessionStore(os.path.join(self.tmpdir.name, "sessions.db"))
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_set_get_delete(self):
+        """Test a session round-trips through every store"""
+        for store in self.stores:
+            store.set("abc", {"uid": "1"}, 60)
+            self.assertEqual(store.get("abc"), {"uid": "1"})
+            store.delete("abc")
+            self.assertIsNone(store.get("abc"))
+
+    def test_expired_sessions_are_swept(self):
+        """Test expired sessions are hidden and then removed by sweep"""
+        for store in self.stores:
+            store.set("old", {"uid": "1"}, -1)
+            store.set("new", {"uid": "2"}, 60)
+            self.assertIsNone(store.get("old"))
+            store.sweep()
+            self.assertEqual(store.get("new"), {"uid": "2"})
+
+
+class TestServerSideSessions(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.secret_key = "test"
+        self.store = session_store.init_app(self.app, MemorySessionStore())
+        self.index = UserIndex()
+
+        @self.app.route("/login")
+        def login():
+            self.index.remember({"id": 7, "username": "chef", "role": "Staff"})
+            session_store.regenerate()
+            session["uid"] = "7"
+            return "ok"
+
+        @self.app.route("/visit")
+        def visit():
+            session["seen"] = True
+            return "ok"
+
+        @self.app.route("/admin")
+        @require_role(self.index, "Admin")
+        def admin():
+            return "secret"
+
+        @self.app.route("/staff")
+        @require_role(self.index)
+        def staff():
+            return session["uid"]
+
+        self.client = self.app.test_client()
+
+    def test_cookie_only_carries_session_id(self):
+        """Test session data stays on the server"""
+        response = self.client.get("/login")
+        cookie = response.headers["Set-Cookie"]
+        self.assertNotIn("uid", cookie)
+        sid = cookie.split(";")[0].split("=", 1)[1]
+        self.assertEqual(self.store.get(sid), {"uid": "7"})
+
+    def test_login_issues_a_new_session_id(self):
+        """Test an id handed out before login is not the one that gets the uid"""
+        before = self.client.get("/visit").headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+        after = self.client.get("/login").headers["Set-Cookie"].split(";")[0].split("=", 1)[1]
+        self.assertNotEqual(before, after)
+        self.assertIsNone(self.store.get(before))
+        self.assertEqual(self.store.get(after), {"seen": True, "uid": "7"})
+        self.assertEqual(self.client.get("/staff").get_data(as_text=True), "7")
+
+    def test_role_checks_use_cached_profile(self):
+        """Test role checks without a loader or DB"""
+        self.assertEqual(self.client.get("/staff").status_code, 401)
+        self.client.get("/login")
+        self.assertEqual(self.client.get("/staff").get_data(as_text=True), "7")
+        self.assertEqual(self.client.get("/admin").status_code, 403)
+
+
+class TestUserIndex(unittest.TestCase):
+
+    def test_loader_called_once_per_ttl(self):
+        """Test profiles are loaded once and then served from cache"""
+        loader = MagicMock(return_value={"id": 3, "username": "ana", "display_name": None, "role": "Admin"})
+        index = UserIndex(loader)
+        self.assertEqual(index.role_of("3"), "Admin")
+        self.assertEqual(index.get(3)["display_name"], "ana")
+        loader.assert_called_once_with("3")
+
+    def test_login_lookup_tries_username_then_email(self):
+        """Test the login lookup avoids OR across username and email"""
+        cursor = MagicMock()
+        cursor.fetchone.side_effect = [None, {"id": 3}]
+        self.assertEqual(find_login_user(cursor, "ana@example.com"), {"id": 3})
+        (by_name, by_name_params), (by_email, by_email_params) = [c[0] for c in cursor.execute.call_args_list]
+        self.assertIn("username = %s", by_name)
+        self.assertIn("email = %s", by_email)
+        self.assertNotIn(" OR ", by_name + by_email)
+        self.assertEqual(by_name_params, by_email_params)
+
+        cursor = MagicMock()
+        cursor.fetchone.return_value = {"id": 4}
+        find_login_user(cursor, "ana")
+        cursor.execute.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+import sqlite3
+import time
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from flask import Flask
+
+from shared_cache import SharedCache
+
+
+def compute_in_worker(path, log, results):
+    """One 'worker process' asking for the same expensive aggregate"""
+    cache = SharedCache(path)
+
+    def compute():
+        with open(log, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.3)
+        return {"total": Decimal("12.50"), "day": date(2024, 1, 2)}
+    results.put(cache.get_or_compute("sales:summary", compute, ttl=60, tags=("sales",)))
+
+
+def invalidate_in_worker(path):
+    SharedCache(path).invalidate("inventory")
+
+
+class TestSharedCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.db")
+        self.now = 1000.0
+        self.cache = SharedCache(self.path, stale_seconds=60, wait_seconds=1, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_one_process_computes_for_all(self):
+        ctx = multiprocessing.get_context("fork")
+        log = os.path.join(self.tmpdir.name, "computed.log")
+        results = ctx.Queue()
+        workers = [ctx.Process(target=compute_in_worker, args=(self.path, log, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        values = [results.get(timeout=10) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        with open(log) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(values, [{"total": 12.5, "day": "2024-01-02"}] * 4)
+
+    def test_expired_entry_served_stale_while_recomputing(self):
+        self.cache.get_or_compute("stock", lambda: 1, ttl=10)
+        self.now += 30  # expired, still inside the stale window
+        self.assertTrue(self.cache._acquire("stock"))  # another worker is recomputing
+        self.assertEqual(self.cache.get_or_compute("stock", lambda: 2, ttl=10), 1)
+        self.assertEqual(self.cache.stats()["stale"], 1)
+
+        self.now += 60  # past the stale window and the other worker's lease
+        self.assertEqual(self.cache.get_or_compute("stock", lambda: 3, ttl=10), 3)
+
+    def test_invalidation_reaches_other_processes(self):
+        self.cache.get_or_compute("stock", lambda: [1, 2], ttl=60, tags=("inventory",))
+        self.cache.get_or_compute("sales", lambda: [3], ttl=60, tags=("sales",))
+
+        worker = multiprocessing.get_context("fork").Process(target=invalidate_in_worker, args=(self.path,))
+        worker.start()
+        worker.join()
+        self.assertIsNone(self.cache.peek("stock"))
+        self.assertEqual(self.cache.peek("sales"), [3])
+
+    def test_write_during_compute_is_not_cached(self):
+        def compute():
+            self.cache.invalidate("inventory")  # a restock lands mid-computation
+            return "before restock"
+
+        self.assertEqual(self.cache.get_or_compute("stock", compute, tags=("inventory",)), "before restock")
+        self.assertIsNone(self.cache.peek("stock"))
+        self.assertEqual(self.cache.stats()["discarded"], 1)
+
+    def test_invalidation_drops_only_its_tag_rows(self):
+        self.cache.get_or_compute("stock", lambda: 1, ttl=60, tags=("inventory", "sales"))
+        self.cache.get_or_compute("sales", lambda: 2, ttl=60, tags=("sales",))
+        self.cache.get_or_compute("menu", lambda: 3, ttl=60, tags=("menu",))
+        self.assertEqual(self.cache.invalidate("inventory"), 1)
+        rows = self.cache._conn().execute("SELECT tag, key FROM cache_tags ORDER BY tag, key").fetchall()
+        self.assertEqual(rows, [("menu", "menu"), ("sales", "sales")])
+
+    def test_failed_invalidation_keeps_the_write_response(self):
+        app = Flask(__name__)
+        app.add_url_rule("/write", "write", lambda: "saved", methods=["POST"])
+        self.cache.init_app(app, write_tags=("inventory",))
+        with patch.object(self.cache, "invalidate", side_effect=sqlite3.OperationalError("database is locked")):
+            response = app.test_client().post("/write")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cache.stats()["failed_invalidations"], 1)
+
+    def test_disabled_without_path(self):
+        cache = SharedCache("")
+        calls = []
+        for _ in range(2):
+            cache.get_or_compute("k", lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.invalidate("sales"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
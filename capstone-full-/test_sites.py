@@ -0,0 +1,137 @@
+import unittest
+import os
+import tempfile
+from datetime import date, datetime
+
+from flask import Flask, jsonify, request
+
+import sites
+import stock_ledger
+import storage
+from inventory_batch import apply_batch
+from replenishment import load_items
+from sales_archive import SalesArchive
+from sites import SiteRouter
+
+
+class BrokenRouter:
+    def connect(self, readonly=None):
+        raise RuntimeError("site database unreachable")
+
+
+class SitesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dialect = storage.get_dialect("sqlite")
+        self.main_path = os.path.join(self.tmpdir.name, "main.db")
+        self.east_path = os.path.join(self.tmpdir.name, "east.db")
+        for path in (self.main_path, self.east_path):
+            conn = storage.connect_sqlite(path, reuse=False)
+            storage.init_sqlite_schema(conn)
+            conn.close()
+        self.conn = storage.connect_sqlite(self.main_path, reuse=False)
+        self.conn.execute("INSERT INTO sites (site_id, name) VALUES (2, 'Harbour'), (3, 'East')")
+        self.conn.execute("""
+            INSERT INTO inventory (item_id, site_id, item_name, stock_level, capacity)
+            VALUES (1, 1, 'Milk', 10, 20), (2, 2, 'Milk', 4, 20)
+        """)
+        self.conn.execute("INSERT INTO menu_items (id, item_name) VALUES (7, 'Latte')")
+        self.conn.execute("INSERT INTO menu_inventory (menu_id, item_id, quantity_used) VALUES (7, 1, 1), (7, 2, 1)")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def router(self, path):
+        return storage.create_router("sqlite", sqlite_path=path, replicas="")
+
+
+class TestSitePrefix(SitesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        app = Flask(__name__)
+
+        @app.route("/api/whoami")
+        def whoami():
+            return jsonify({"site_id": sites.current(), "root": request.script_root})
+
+        SiteRouter(self.dialect, self.router(self.main_path)).init_app(app)
+        self.client = app.test_client()
+
+    def test_prefix_selects_the_site(self):
+        self.assertEqual(self.client.get("/api/whoami").get_json(), {"site_id": 1, "root": ""})
+        self.assertEqual(self.client.get("/sites/2/api/whoami").get_json(), {"site_id": 2, "root": "/sites/2"})
+
+    def test_unknown_site_is_404(self):
+        response = self.client.get("/sites/9/api/whoami")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"error": "Unknown site 9"})
+
+
+class TestSiteScoping(SitesTestCase):
+
+    def test_depletion_and_stock_stay_within_the_site(self):
+        at = datetime(2024, 5, 1, 12, 0)
+        stock_ledger.deplete_for_sales(self.conn, self.dialect, [("Latte", 3, "2024-05-01")], at=at, site_id=2)
+        self.conn.commit()
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, at, site_id=2), {2: 1})
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, at), {1: 10})
+
+    def test_batch_treats_other_sites_items_as_missing(self):
+        results, applied = apply_batch(self.conn, self.dialect, [
+            {"op": "restock", "item_id": 1, "quantity": 5},
+            {"op": "restock", "item_id": 2, "quantity": 5},
+        ], atomic=False, site_id=2)
+        self.assertEqual(applied, 1)
+        self.assertEqual([r["status"] for r in results], ["error", "ok"])
+        self.assertEqual([item["item_id"] for item in load_items(self.conn, self.dialect, site_id=2)], [2])
+
+    def test_archive_filters_by_site(self):
+        self.dialect.executemany(self.conn, """
+            INSERT INTO sales (site_id, item_id, item_name, quantity, price, sale_date) VALUES (%s, %s, %s, %s, %s, %s)
+        """, [(1, 7, "Latte", 2, 4.5, "2024-01-03 09:00:00"), (2, 7, "Latte", 5, 4.0, "2024-01-04 09:00:00")])
+        self.conn.commit()
+        archive = SalesArchive(os.path.join(self.tmpdir.name, "archive"))
+        archive.compact(self.conn, self.dialect, today=date(2024, 5, 15), live_months=2)
+        self.assertEqual(archive.item_totals(site_id=2), {"Latte": 5})
+        self.assertEqual(archive.day_revenue(site_id=1), {"2024-01-03": 9.0})
+        self.assertEqual(archive.item_totals(), {"Latte": 7})
+
+
+class TestSiteRouter(SitesTestCase):
+
+    def test_sites_with_their_own_database(self):
+        site_router = SiteRouter(self.dialect, self.router(self.main_path), {3: self.router(self.east_path)})
+        conn = site_router.connect(readonly=False, site_id=3)
+        self.dialect.execute(conn, "INSERT INTO sales (site_id, item_name, quantity, price, sale_date) "
+                                   "VALUES (3, 'Latte', 4, 4.0, '2024-05-01')")
+        conn.commit()
+        conn.close()
+
+        self.assertIs(site_router.archive(2), site_router.archive(1))
+        self.assertTrue(site_router.archive(3).root.endswith("site-3"))
+
+        def quantity(conn, site_id):
+            row = self.dialect.fetchall(conn, "SELECT COALESCE(SUM(quantity), 0) AS qty FROM sales WHERE site_id = %s",
+                                        (site_id,))[0]
+            return row["qty"]
+        results, errors = site_router.fan_out(quantity)
+        self.assertEqual(results, {1: 0, 2: 0, 3: 4})
+        self.assertEqual(errors, {})
+
+    def test_fan_out_reports_unreachable_sites(self):
+        site_router = SiteRouter(self.dialect, self.router(self.main_path), {3: BrokenRouter()})
+        results, errors = site_router.fan_out(lambda conn, site_id: site_id * 10)
+        self.assertEqual(results, {1: 10, 2: 20})
+        self.assertEqual(errors, {3: "site database unreachable"})
+
+    def test_parse_map(self):
+        self.assertEqual(sites.parse_map("2=db-east.internal, 3=db-west.internal:3307,"),
+                         {2: "db-east.internal", 3: "db-west.internal:3307"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+from flask import Flask
+
+from static_cache import StaticCache
+
+
+class TestStaticCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.write("app.css", "body { color: red; }\n" * 100)
+        self.write("page.html", '<link rel="stylesheet" href="app.css"><h1>Hi</h1>')
+        self.app = Flask(__name__)
+        self.cache = StaticCache(self.tmpdir.name).init_app(self.app)
+        self.app.add_url_rule("/", "page", lambda: self.cache.page("page.html"))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.tmpdir.name, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_page_links_fingerprinted_assets(self):
+        """Test page references are rewritten to immutable asset URLs"""
+        url = self.cache.asset_url("app.css")
+        page = self.client.get("/")
+        self.assertIn(url, page.get_data(as_text=True))
+        self.assertEqual(page.headers["Cache-Control"], "no-cache")
+
+        asset = self.client.get(url)
+        self.assertEqual(asset.status_code, 200)
+        self.assertIn("immutable", asset.headers["Cache-Control"])
+
+    def test_etag_revalidation(self):
+        """Test a repeat visit gets a 304 with no body"""
+        etag = self.client.get("/").headers["ETag"]
+        response = self.client.get("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+    def test_gzip_when_accepted(self):
+        """Test assets are served pre-compressed"""
+        response = self.client.get(self.cache.asset_url("app.css"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+
+    def test_auto_reload_on_change(self):
+        """Test files are re-read when modified in debug mode"""
+        self.cache.auto_reload = True
+        old_url = self.cache.asset_url("app.css")
+        self.write("app.css", "body { color: blue; }")
+        os.utime(os.path.join(self.tmpdir.name, "app.css"), (0, 0))
+        self.assertNotEqual(self.cache.asset_url("app.css"), old_url)
+
+    def test_outdated_fingerprint_serves_current_file(self):
+        """Test a URL from before a deploy still loads, but is revalidated"""
+        self.assertNotEqual(self.cache.asset_url("app.css"), "/assets/app.0123456789.css")
+        response = self.client.get("/assets/app.0123456789.css")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        self.assertEqual(self.client.get("/assets/missing.0123456789.css").status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
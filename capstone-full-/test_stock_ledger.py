@@ -0,0 +1,94 @@
+import unittest
+import os
+import tempfile
+from datetime import datetime
+
+import stock_ledger
+import storage
+from stock_ledger import Movement
+
+
+class TestStockLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dialect = storage.get_dialect("sqlite")
+        self.conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "ledger.db"), reuse=False)
+        storage.init_sqlite_schema(self.conn)
+        self.conn.execute("INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (1, 'Milk', 5, 50)")
+        self.conn.execute("INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (2, 'Egg', 10, 50)")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def stock(self, item_id):
+        return self.conn.execute("SELECT stock_level FROM inventory WHERE item_id = ?", (item_id,)).fetchone()["stock_level"]
+
+    def test_record_appends_and_updates_stock(self):
+        written = stock_ledger.record(self.conn, self.dialect, [
+            Movement(1, "restock", 10), Movement(1, "waste", -2), Movement(2, "restock", 0),
+        ])
+        self.conn.commit()
+        self.assertEqual(written, 2)
+        self.assertEqual(self.stock(1), 13)
+        self.assertEqual([m["kind"] for m in stock_ledger.history(self.conn, self.dialect, 1)], ["waste", "restock"])
+        with self.assertRaises(ValueError):
+            stock_ledger.record(self.conn, self.dialect, [Movement(1, "theft", -1)])
+
+    def test_set_level_records_difference(self):
+        stock_ledger.set_level(self.conn, self.dialect, 2, 7, "recount")
+        self.conn.commit()
+        self.assertEqual(self.stock(2), 7)
+        [movement] = stock_ledger.history(self.conn, self.dialect, 2)
+        self.assertEqual((movement["kind"], movement["quantity"], movement["note"]), ("adjust", -3, "recount"))
+
+    def test_sale_depletion_from_recipes(self):
+        self.conn.execute("INSERT INTO menu_items (id, item_name) VALUES (1, 'Latte')")
+        self.conn.execute("INSERT INTO menu_inventory (menu_id, item_id, quantity_used) VALUES (1, 1, 0.5)")
+        stock_ledger.deplete_for_sales(self.conn, self.dialect, [("Latte", 4, "2024-01-01"), ("Latte", 2, "2024-01-01")])
+        self.assertEqual(self.stock(1), 2)
+        stock_ledger.deplete_for_sales(self.conn, self.dialect, [("Latte", 10, "2024-01-01")])
+        self.assertEqual(self.stock(1), 0)  # never below zero
+        self.assertEqual(stock_ledger.history(self.conn, self.dialect, 1, 1)[0]["note"], "short by 3")
+
+    def test_point_in_time_from_snapshot_plus_replay(self):
+        day = lambda d, h=12: datetime(2024, 1, d, h)
+        stock_ledger.snapshot(self.conn, self.dialect, at=day(1))
+        stock_ledger.record(self.conn, self.dialect, [Movement(1, "restock", 10)], at=day(2))
+        stock_ledger.snapshot(self.conn, self.dialect, at=day(3))
+        stock_ledger.record(self.conn, self.dialect, [Movement(1, "waste", -4)], at=day(4))
+        stock_ledger.record(self.conn, self.dialect, [Movement(1, "restock", 1)], at=day(5))
+        self.conn.commit()
+
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, day(1, 23)), {1: 5, 2: 10})
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, day(4, 23), item_id=1), {1: 11})
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, day(6))[1], self.stock(1))
+        # Before the first snapshot: worked back from the current level
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, datetime(2023, 12, 31))[1], 5)
+
+    def test_point_in_time_works_back_only_items_without_snapshot(self):
+        stock_ledger.snapshot(self.conn, self.dialect, at=datetime(2024, 1, 1))
+        self.conn.execute("INSERT INTO inventory (item_id, item_name, stock_level, capacity) VALUES (3, 'Oat', 4, 50)")
+        stock_ledger.record(self.conn, self.dialect, [Movement(1, "restock", 2), Movement(3, "restock", 4)],
+                            at=datetime(2024, 1, 2))
+        self.conn.commit()
+        statements = []
+        self.conn.set_trace_callback(statements.append)
+        self.assertEqual(stock_ledger.stock_at(self.conn, self.dialect, datetime(2024, 1, 3)), {1: 7, 2: 10, 3: 8})
+        self.conn.set_trace_callback(None)
+        self.assertIn("NOT EXISTS", statements[-1])
+
+    def test_history_outlives_delete_attempts(self):
+        stock_ledger.record(self.conn, self.dialect, [Movement(1, "restock", 10)])
+        self.conn.commit()
+        with self.assertRaises(storage.INTEGRITY_ERRORS):
+            self.conn.execute("DELETE FROM inventory WHERE item_id = 1")
+        self.conn.rollback()
+        self.assertEqual(len(stock_ledger.history(self.conn, self.dialect, 1)), 1)
+        self.conn.execute("DELETE FROM inventory WHERE item_id = 2")  # no history, so it may go
+
+
+if __name__ == "__main__":
+    unittest.main()
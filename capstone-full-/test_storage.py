@@ -0,0 +1,76 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from datetime import date
+
+import storage
+
+
+class TestSQLiteDialect(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "test.db"), reuse=False)
+        storage.init_sqlite_schema(self.conn)
+        self.dialect = storage.get_dialect("sqlite")
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def scalar(self, expression, *params):
+        row = self.dialect.fetchall(self.conn, f"SELECT {expression} AS v", params)[0]
+        return row["v"]
+
+    def test_connection_is_tuned(self):
+        self.assertEqual(self.scalar("1"), 1)
+        journal = self.conn.execute("PRAGMA journal_mode").fetchone()["journal_mode"]
+        self.assertEqual(journal, "wal")
+        self.assertEqual(self.conn.execute("PRAGMA busy_timeout").fetchone()["timeout"],
+                         storage.SQLITE_BUSY_TIMEOUT_MS)
+
+    def test_mysql_functions_have_sqlite_equivalents(self):
+        """Test MONTHNAME/DAYNAME/DATEDIFF replacements"""
+        self.assertEqual(self.scalar(self.dialect.month_name("%s"), "2024-03-05 10:00:00"), "March")
+        self.assertEqual(self.scalar(self.dialect.day_name("%s"), "2024-03-05"), "Tuesday")
+        self.assertEqual(self.scalar(self.dialect.days_until(self.dialect.today())), 0)
+        self.assertEqual(self.scalar(self.dialect.days_until(self.dialect.days_ago(7))), -7)
+
+    def test_placeholders_and_dict_rows(self):
+        self.dialect.execute(self.conn, "INSERT INTO sales (item_name, quantity, sale_date) VALUES (%s, %s, %s)",
+                             ("Latte", 2, "2024-01-01"))
+        rows = self.dialect.fetchall(self.conn, "SELECT item_name, quantity FROM sales WHERE item_name = %s", ("Latte",))
+        self.assertEqual(rows, [{"item_name": "Latte", "quantity": 2}])
+
+    def test_to_date_accepts_strings_and_dates(self):
+        self.assertEqual(storage.to_date("2024-01-02 08:30:00"), date(2024, 1, 2))
+        self.assertEqual(storage.to_date(date(2024, 1, 2)), date(2024, 1, 2))
+        self.assertEqual(storage.format_date("2024-01-02"), "2024-01-02")
+
+    def test_thread_connection_is_reused(self):
+        path = os.path.join(self.tmpdir.name, "reuse.db")
+        first = storage.connect_sqlite(path)
+        first.close()
+        self.assertIs(storage.connect_sqlite(path), first)
+
+    def test_progress_hooks_share_the_connection_handler(self):
+        ticks = []
+        storage.on_progress(lambda: ticks.append(1))
+        self.addCleanup(storage._progress_hooks.clear)
+        conn = storage.connect_sqlite(os.path.join(self.tmpdir.name, "progress.db"), reuse=False)
+        self.addCleanup(conn.close)
+        count = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 10000) SELECT COUNT(*) FROM n"
+        conn.execute(count).fetchone()
+        self.assertGreater(len(ticks), 10)
+
+        # A second handler (the circuit breaker's deadline) keeps the hooks running
+        ticks.clear()
+        storage.set_progress_handler(conn, lambda: len(ticks) >= 5)
+        with self.assertRaises(sqlite3.OperationalError):  # interrupted
+            conn.execute(count).fetchone()
+        self.assertEqual(len(ticks), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import threading
+import time
+from unittest.mock import patch
+
+from write_buffer import CommitTimeout, GroupCommitBuffer, QueueFull
+
+
+class TestGroupCommitBuffer(unittest.TestCase):
+
+    def test_concurrent_rows_share_commits(self):
+        """Test rows submitted together are flushed in one batch"""
+        batches = []
+        buffer = GroupCommitBuffer(batches.append, max_rows=50, max_latency_ms=50)
+        threads = [threading.Thread(target=buffer.submit, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        buffer.close()
+
+        self.assertEqual(sorted(r for batch in batches for r in batch), list(range(20)))
+        self.assertLess(len(batches), 20)
+        stats = buffer.stats()
+        self.assertEqual(stats["rows_flushed"], 20)
+        self.assertEqual(stats["flushes"], len(batches))
+
+    def test_max_rows_caps_batch_size(self):
+        batches = []
+        buffer = GroupCommitBuffer(batches.append, max_rows=3, max_latency_ms=100)
+        threads = [threading.Thread(target=buffer.submit, args=(i,)) for i in range(9)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        buffer.close()
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+
+    def test_flush_error_reaches_every_caller(self):
+        def fail(rows):
+            raise RuntimeError("disk full")
+        buffer = GroupCommitBuffer(fail, max_latency_ms=1)
+        with self.assertRaises(RuntimeError):
+            buffer.submit("row")
+        buffer.close()
+        self.assertEqual(buffer.stats()["failed_flushes"], 1)
+
+    def test_failing_partition_fails_only_its_rows(self):
+        written = []
+
+        def flush(rows):
+            if rows[0][0] == "east":
+                raise RuntimeError("east database unreachable")
+            written.extend(rows)
+        buffer = GroupCommitBuffer(flush, max_latency_ms=50, partition=lambda row: row[0])
+        outcomes = {}
+
+        def submit(row):
+            try:
+                outcomes[row] = buffer.submit(row)
+            except RuntimeError as err:
+                outcomes[row] = str(err)
+        threads = [threading.Thread(target=submit, args=(row,))
+                   for row in [("main", 1), ("east", 2), ("main", 3)]]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        buffer.close()
+
+        self.assertEqual(sorted(written), [("main", 1), ("main", 3)])
+        self.assertEqual(outcomes, {("main", 1): True, ("east", 2): "east database unreachable",
+                                    ("main", 3): True})
+
+    def test_full_queue_rejects(self):
+        """Test a bounded queue pushes back instead of growing"""
+        release = threading.Event()
+        buffer = GroupCommitBuffer(lambda rows: release.wait(), max_rows=1,
+                                   max_latency_ms=0, max_queue=1, enqueue_timeout=0.05)
+        threading.Thread(target=buffer.submit, args=(1,), daemon=True).start()
+        time.sleep(0.05)  # worker is now blocked flushing row 1
+        threading.Thread(target=buffer.submit, args=(2,), daemon=True).start()
+        time.sleep(0.05)  # row 2 fills the queue
+        with self.assertRaises(QueueFull):
+            buffer.submit(3)
+        self.assertEqual(buffer.stats()["rejected"], 1)
+        release.set()
+        buffer.close()
+
+    def test_close_gives_up_on_a_stuck_worker(self):
+        """Test close() returns even when the queue stays full, failing the rows still queued"""
+        release = threading.Event()
+        buffer = GroupCommitBuffer(lambda rows: release.wait(), max_rows=1,
+                                   max_latency_ms=0, max_queue=1, enqueue_timeout=0.05)
+        outcomes = {}
+
+        def submit(row):
+            try:
+                outcomes[row] = buffer.submit(row)
+            except RuntimeError as err:
+                outcomes[row] = str(err)
+        first = threading.Thread(target=submit, args=(1,), daemon=True)
+        first.start()
+        time.sleep(0.05)
+        second = threading.Thread(target=submit, args=(2,), daemon=True)
+        second.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        with patch("builtins.print"):
+            buffer.close(timeout=0.1)
+        self.assertLess(time.monotonic() - started, 1)
+        second.join(1)
+        self.assertEqual(outcomes, {2: "buffer closed before the row was written"})
+        with self.assertRaises(RuntimeError):
+            buffer.submit(3)
+        release.set()
+        first.join(1)
+        self.assertEqual(outcomes[1], True)
+
+    def test_partition_error_fails_the_batch_not_the_worker(self):
+        def partition(row):
+            if row == "bad":
+                raise KeyError(row)
+            return "main"
+        buffer = GroupCommitBuffer(lambda rows: None, max_latency_ms=1, partition=partition)
+        with self.assertRaises(KeyError):
+            buffer.submit("bad")
+        self.assertTrue(buffer.submit("good", timeout=1))
+        buffer.close()
+
+    def test_submit_wait_is_bounded(self):
+        release = threading.Event()
+        buffer = GroupCommitBuffer(lambda rows: release.wait(), max_latency_ms=0, submit_timeout=0.05)
+        with self.assertRaises(CommitTimeout):
+            buffer.submit(1)
+        release.set()
+        buffer.close()
+
+    def test_stats_keys_are_stable(self):
+        """Test stats() reports the same keys before and after flushes"""
+        buffer = GroupCommitBuffer(lambda rows: None)
+        before = buffer.stats()
+        buffer.submit(1)
+        buffer.close()
+        self.assertEqual(set(before), set(buffer.stats()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""Sales time series over arbitrary ranges and bucket sizes.
+
+`sales_series()` aggregates sales per hour/day/week/month between two
+dates, fills empty buckets with zeros so the x axis is continuous, and, when
+the range has more buckets than the chart's point budget, downsamples with
+Largest-Triangle-Three-Buckets (LTTB). LTTB keeps the points that shape the
+line (peaks, dips) rather than averaging them away, so a multi-year hourly
+chart ships a few hundred points instead of tens of thousands.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from sales_archive import archive, live_filter
+from sites import DEFAULT_SITE_ID
+from storage import to_date
+
+BUCKETS = ("hour", "day", "week", "month")
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+# Buckets are materialised (gap filling) before downsampling, so the range
+# is capped: ~11 years of hours, any span of days/weeks/months a user needs
+MAX_BUCKETS = 100000
+BUCKET_HOURS = {"hour": 1, "day": 24, "week": 24 * 7, "month": 24 * 28}
+LABEL_FORMATS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "week": "%Y-%m-%d", "month": "%Y-%m"}
+
+
+def parse_range(args, default_days=7):
+    """
+    Read from/to (YYYY-MM-DD, `to` inclusive), bucket, points and metric
+    from request args. Raises ValueError with a user-facing message.
+    """
+    bucket = args.get("bucket", "day")
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    metric = args.get("metric", "revenue")
+    if metric not in ("revenue", "quantity"):
+        raise ValueError("metric must be revenue or quantity")
+
+    try:
+        end = date.fromisoformat(args["to"]) if args.get("to") else date.today()
+        start = date.fromisoformat(args["from"]) if args.get("from") else end - timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValueError("Invalid date format (use YYYY-MM-DD)")
+    if start > end:
+        raise ValueError("from must not be after to")
+    check_bucket_count(start, end + timedelta(days=1), bucket)
+
+    try:
+        points = int(args.get("points", DEFAULT_POINTS))
+    except ValueError:
+        raise ValueError("points must be a number")
+    points = max(3, min(points, MAX_POINTS))
+    return start, end + timedelta(days=1), bucket, points, metric
+
+
+def check_bucket_count(start, end, unit):
+    """Raise ValueError when [start, end) spans more than MAX_BUCKETS buckets"""
+    hours = (end - start).days * 24
+    if hours // BUCKET_HOURS[unit] > MAX_BUCKETS:
+        raise ValueError(f"Range too long for {unit} buckets (at most {MAX_BUCKETS})")
+
+
+def bucket_floor(moment, unit):
+    """Start of the bucket containing `moment`"""
+    if unit == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime(moment.year, moment.month, moment.day)
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_range(start, end, unit):
+    """Every bucket start from the bucket holding `start` up to (not incl.) `end`"""
+    check_bucket_count(start, end, unit)
+    current = bucket_floor(datetime(start.year, start.month, start.day), unit)
+    end = datetime(end.year, end.month, end.day)
+    buckets = []
+    while current < end:
+        buckets.append(current)
+        if unit == "hour":
+            current += timedelta(hours=1)
+        elif unit == "day":
+            current += timedelta(days=1)
+        elif unit == "week":
+            current += timedelta(weeks=1)
+        else:
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return buckets
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and len(value) > 10:
+        return datetime.fromisoformat(value)
+    day = to_date(value)
+    return datetime(day.year, day.month, day.day)
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+    Always keeps the first and last point.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)  # n-2 middle points in threshold-2 buckets
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean() if nhi > nlo else x[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def sales_series(conn, dialect, start, end, bucket="day", points=DEFAULT_POINTS, metric="revenue",
+                 site_id=DEFAULT_SITE_ID, source=archive):
+    """Dense, optionally downsampled sales series of one site for [start, end)"""
+    bucket_sql = dialect.bucket_start("sale_date", bucket)
+    value_sql = "SUM(price * quantity)" if metric == "revenue" else "SUM(quantity)"
+    live, live_params = live_filter(source=source)
+    rows = dialect.fetchall(conn, f"""
+        SELECT {bucket_sql} AS bucket, {value_sql} AS total
+        FROM sales
+        WHERE site_id = %s AND sale_date >= %s AND sale_date < %s AND {live}
+        GROUP BY {bucket_sql}
+    """, (site_id, start.isoformat(), end.isoformat()) + live_params)
+
+    # Closed months are answered from the columnar archive
+    totals = source.bucket_totals(bucket, start, end, metric, site_id=site_id)
+    for row in rows:
+        totals[_as_datetime(row["bucket"])] += float(row["total"] or 0)
+
+    buckets = bucket_range(start, end, bucket)
+    values = np.array([totals.get(b, 0.0) for b in buckets], dtype=np.float64)
+    keep = lttb(np.arange(len(buckets)), values, points)
+
+    fmt = LABEL_FORMATS[bucket]
+    return {
+        "bucket": bucket,
+        "metric": metric,
+        "from": start.isoformat(),
+        "to": (end - timedelta(days=1)).isoformat(),
+        "source_points": len(buckets),
+        "downsampled": len(keep) < len(buckets),
+        "labels": [buckets[i].strftime(fmt) for i in keep],
+        "datasets": [{
+            "label": "Total Sales" if metric == "revenue" else "Items Sold",
+            "data": [round(float(values[i]), 2) for i in keep],
+        }],
+    }
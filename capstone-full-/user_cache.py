@@ -0,0 +1,108 @@
+"""Cached user/role lookups.
+
+Logins and role checks read user profiles from a small in-process index so
+that an API request only touches the users table when the profile is missing
+or stale.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, session
+
+USER_CACHE_TTL = 600  # seconds before a cached profile is re-read
+
+# Two index-friendly lookups instead of `username=%s OR email=%s`: each is a
+# single probe on its own unique index, and the email one is only sent when
+# no username matched.
+USER_BY_USERNAME_SQL = """
+    SELECT id, username, password_hash, display_name, role
+    FROM users WHERE username = %s
+"""
+
+USER_BY_EMAIL_SQL = """
+    SELECT id, username, password_hash, display_name, role
+    FROM users WHERE email = %s
+"""
+
+USER_BY_ID_SQL = """
+    SELECT id, username, display_name, role
+    FROM users WHERE id = %s
+"""
+
+
+def find_login_user(cursor, login):
+    """Return the users row matching a username or email, or None"""
+    cursor.execute(USER_BY_USERNAME_SQL, (login,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(USER_BY_EMAIL_SQL, (login,))
+        row = cursor.fetchone()
+    return row
+
+
+def _profile(row):
+    return {
+        "id": str(row["id"]),
+        "username": row["username"],
+        "display_name": row.get("display_name") or row["username"],
+        "role": row.get("role") or "Staff",
+    }
+
+
+class UserIndex:
+    """Thread-safe TTL cache of user profiles keyed by user id"""
+
+    def __init__(self, loader=None, ttl=USER_CACHE_TTL):
+        self._loader = loader  # loader(uid) -> users row or None
+        self._ttl = ttl
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def remember(self, row):
+        """Store a users row (or profile dict) and return its profile"""
+        profile = _profile(row)
+        with self._lock:
+            self._profiles[profile["id"]] = (profile, time.monotonic() + self._ttl)
+        return profile
+
+    def get(self, uid):
+        """Return the cached profile for uid, loading it on a miss"""
+        if uid is None:
+            return None
+        uid = str(uid)
+        with self._lock:
+            entry = self._profiles.get(uid)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        if self._loader is None:
+            return None
+        row = self._loader(uid)
+        return self.remember(row) if row else None
+
+    def role_of(self, uid):
+        profile = self.get(uid)
+        return profile["role"] if profile else None
+
+    def invalidate(self, uid=None):
+        """Forget one user, or everybody when uid is None"""
+        with self._lock:
+            if uid is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(str(uid), None)
+
+
+def require_role(index, *roles):
+    """Decorator: only let logged-in users with one of `roles` through"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            role = index.role_of(session.get("uid"))
+            if role is None:
+                return jsonify({"error": "Login required"}), 401
+            if roles and role not in roles:
+                return jsonify({"error": "Forbidden"}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
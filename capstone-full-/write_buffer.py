@@ -0,0 +1,193 @@
+"""Group-commit buffer for high-frequency inserts.
+
+Callers hand rows to `submit()`, which blocks until the row is durably
+written. A background thread drains the queue and writes everything that
+arrived within `max_latency_ms` (up to `max_rows`) in one transaction, so
+many requests share a single commit/fsync. The queue is bounded: when it
+is full `submit()` raises QueueFull, which routes turn into a 503. A caller
+waits at most `submit_timeout` seconds for its commit (CommitTimeout), and
+rows still queued when `close()` gives up fail instead of waiting forever.
+
+With `partition`, rows are flushed in one transaction per partition key
+(e.g. per site database), and a failing partition only fails its own
+callers; the rows of the others are committed and acknowledged.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class QueueFull(Exception):
+    """The buffer is at max_queue rows; the caller should back off"""
+
+
+class CommitTimeout(Exception):
+    """The row was queued but its commit wasn't confirmed in time; it may still be written"""
+
+
+class GroupCommitBuffer:
+    """Batch rows from many threads into shared commits"""
+
+    def __init__(self, flush_rows, max_rows=100, max_latency_ms=10, max_queue=1000,
+                 enqueue_timeout=0.5, submit_timeout=30.0, name="group-commit", partition=None):
+        self.flush_rows = flush_rows  # flush_rows(rows) writes all rows in one transaction
+        self.partition = partition  # partition(row) -> key of the transaction the row belongs to
+        self.max_rows = max_rows
+        self.max_latency = max_latency_ms / 1000.0
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "flushes": 0,
+            "rows_flushed": 0,
+            "failed_flushes": 0,
+            "rejected": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+            "max_flush_rows": 0,
+        }
+        self._closed = False
+        self._enqueuing = 0  # submits between the closed check and their put
+        self._closing = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, row, timeout=None):
+        """Queue a row and wait until it has been committed (default: submit_timeout seconds)"""
+        future = Future()
+        with self._closing:
+            if self._closed:
+                raise RuntimeError("buffer is closed")
+            self._enqueuing += 1
+        try:
+            self._queue.put((row, future), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["rejected"] += 1
+            raise QueueFull(f"write queue is full ({self.max_queue} rows)")
+        finally:
+            with self._closing:
+                self._enqueuing -= 1
+                self._closing.notify_all()
+        try:
+            return future.result(self.submit_timeout if timeout is None else timeout)
+        except FutureTimeout:
+            raise CommitTimeout(f"row not committed within {self.submit_timeout if timeout is None else timeout}s")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_latency
+            stop = False
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._flush(batch)
+            except Exception as err:
+                # e.g. partition() raised: fail the batch, keep the worker alive
+                self._fail(batch, err)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        if self.partition is None:
+            self._flush_group(batch)
+            return
+        groups = {}
+        for item in batch:
+            groups.setdefault(self.partition(item[0]), []).append(item)
+        for group in groups.values():
+            self._flush_group(group)
+
+    def _flush_group(self, batch):
+        started = time.perf_counter()
+        try:
+            self.flush_rows([row for row, _ in batch])
+        except Exception as err:
+            self._fail(batch, err)
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._stats["flushes"] += 1
+            self._stats["rows_flushed"] += len(batch)
+            self._stats["last_flush_rows"] = len(batch)
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["max_flush_rows"] = max(self._stats["max_flush_rows"], len(batch))
+        for _, future in batch:
+            future.set_result(True)
+
+    def _fail(self, batch, err):
+        with self._stats_lock:
+            self._stats["failed_flushes"] += 1
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(err)
+
+    def stats(self):
+        """Flush size, flush latency and queue depth counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        flushes = stats["flushes"]
+        # Same keys on every call, whether or not anything was flushed yet
+        stats["avg_flush_rows"] = round(stats["rows_flushed"] / flushes, 2) if flushes else 0.0
+        stats["avg_flush_ms"] = round(stats["total_flush_ms"] / flushes, 3) if flushes else 0.0
+        stats["total_flush_ms"] = round(stats["total_flush_ms"], 3)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_queue"] = self.max_queue
+        stats["max_rows"] = self.max_rows
+        stats["max_latency_ms"] = self.max_latency * 1000
+        return stats
+
+    def close(self, timeout=5.0):
+        """Flush whatever is queued and stop the worker, waiting at most `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        with self._closing:
+            if self._closed:
+                return
+            self._closed = True
+            # Rows already on their way in go before the sentinel
+            self._closing.wait_for(lambda: not self._enqueuing, timeout)
+        try:
+            self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Full:
+            # Worker stuck in a flush with the queue full; it is a daemon
+            # thread, so it won't hold up interpreter exit either
+            print(f"{self._worker.name}: not stopped, {self._queue.qsize()} rows still queued")
+            self._fail_queued()
+            return
+        self._worker.join(max(0.0, deadline - time.monotonic()))
+        if self._worker.is_alive():
+            self._fail_queued()
+
+    def _fail_queued(self):
+        """Fail every row the stuck worker hasn't picked up, leaving the sentinel in place"""
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        rows = [item for item in items if item is not None]
+        if len(rows) < len(items):
+            self._queue.put_nowait(None)
+        if rows:
+            self._fail(rows, RuntimeError("buffer closed before the row was written"))